@@ -56,14 +56,40 @@ def create_app():
     from app.routes.tesoreria import tesoreria_bp
     app.register_blueprint(tesoreria_bp, url_prefix='/api/tesoreria')
 
+    # Registrar blueprint de búsqueda de texto completo (WhatsApp + Gmail)
+    from app.routes.busqueda import busqueda_bp
+    app.register_blueprint(busqueda_bp, url_prefix='/api/busqueda')
+
+    # Registrar blueprint de archivos del storage local (URLs firmadas)
+    from app.routes.archivos import archivos_bp
+    app.register_blueprint(archivos_bp, url_prefix='/api/archivos')
+
+    # Registrar blueprint del canal push (Server-Sent Events)
+    from app.routes.stream import stream_bp
+    app.register_blueprint(stream_bp, url_prefix='/api/stream')
+
     # Importar modelos para que SQLAlchemy los conozca
     from app import models  # Modelos del CRM
     from app import models_whatsapp  # Modelos de WhatsApp
+    from app import models_whatsapp_stats  # Contadores de /webhook/stats
     from app import models_precheck  # Modelos de Pre-Check
     from app import models_sla  # Modelos de SLA
+    from app import models_reportes  # Rollup diario de reportes
+    from app import models_revision  # Registro de cambios del tablero (ETag, /cambios)
+    from app import models_stream  # Broker del canal push (PUBSUB_BACKEND=tabla)
+    from app.utils import pubsub  # Listeners que publican en el canal push
 
     # Crear tablas
     with app.app_context():
         db.create_all()
 
+        # Índice invertido FTS5 en SQLite (en MySQL son índices FULLTEXT)
+        from app.utils.busqueda import configurar_busqueda
+        configurar_busqueda(db.engine)
+
+    # Workers de la cola del webhook: drenan lo que quedó pendiente del deploy anterior
+    if app.config.get('WHATSAPP_INGESTA') == 'async' and app.config.get('WHATSAPP_WORKERS_AL_INICIAR'):
+        from app.utils.whatsapp_cola import iniciar_workers
+        iniciar_workers(app)
+
     return app
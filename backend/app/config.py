@@ -24,3 +24,16 @@ class Config:
     SQLALCHEMY_DATABASE_URI = SQLALCHEMY_DATABASE_URI
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     CORS_ORIGINS = os.getenv('CORS_ORIGINS', 'http://localhost:5173').split(',')
+    # Canal push /api/stream: 'tabla' (broker en la DB, sirve con varias instancias de Cloud Run)
+    # o 'memoria' (solo si el servicio corre con max-instances=1)
+    PUBSUB_BACKEND = os.getenv('PUBSUB_BACKEND', 'tabla')
+    # Webhook de WhatsApp: 'async' encola y responde 202, 'sync' procesa dentro del request
+    WHATSAPP_INGESTA = os.getenv('WHATSAPP_INGESTA', 'async')
+    WHATSAPP_WORKERS = int(os.getenv('WHATSAPP_WORKERS', '2'))
+    # Arrancar los workers de la cola al crear la app (si no, esperan al primer webhook)
+    WHATSAPP_WORKERS_AL_INICIAR = os.getenv('WHATSAPP_WORKERS_AL_INICIAR', 'true').lower() == 'true'
+    # Tamaño máximo de un comprobante de pago (se rechaza antes de leer el cuerpo)
+    COMPROBANTE_MAX_MB = int(os.getenv('COMPROBANTE_MAX_MB', '10'))
+    # Storage de comprobantes: 'gcs' (producción), 'local' (directorio, servido por /api/archivos) o 'fake' (tests)
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'gcs')
+    STORAGE_LOCAL_DIR = os.getenv('STORAGE_LOCAL_DIR', 'storage_local')
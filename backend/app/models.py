@@ -1,7 +1,9 @@
 from app import db
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import event
 from app.utils.timezone import ahora_argentina
+from app.utils.sla import calcular_vencimientos_sla
 
 # Tabla de Locales
 class Local(db.Model):
@@ -90,6 +92,13 @@ class Cliente(db.Model):
 # Tabla de Eventos (el core del CRM)
 class Evento(db.Model):
     __tablename__ = 'eventos'
+    __table_args__ = (
+        # Índices compuestos para filtros de reportes/Kanban (ver migrations/add_eventos_reporting_indexes.py)
+        db.Index('idx_eventos_estado_created_at', 'estado', 'created_at'),
+        db.Index('idx_eventos_estado_fecha_evento', 'estado', 'fecha_evento'),
+        db.Index('idx_eventos_local_created_at', 'local_id', 'created_at'),
+        db.Index('idx_eventos_comercial_estado', 'comercial_id', 'estado'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
@@ -139,6 +148,10 @@ class Evento(db.Model):
     updated_at = db.Column(db.DateTime, default=ahora_argentina, onupdate=ahora_argentina)
     fecha_ultimo_cambio_estado = db.Column(db.DateTime, nullable=True)  # Para cálculo rápido de SLA
 
+    # Vencimientos SLA precalculados (NULL si el estado no tiene SLA), ver recalcular_sla()
+    sla_alerta_at = db.Column(db.DateTime, nullable=True, index=True)
+    sla_critico_at = db.Column(db.DateTime, nullable=True, index=True)
+
     actividades = db.relationship('Actividad', backref='evento', lazy='dynamic', order_by='desc(Actividad.created_at)')
     transiciones = db.relationship('EventoTransicion', backref='evento', lazy='dynamic', order_by='EventoTransicion.created_at')
 
@@ -153,6 +166,7 @@ class Evento(db.Model):
 
         self.estado = nuevo_estado
         self.fecha_ultimo_cambio_estado = ahora_argentina()
+        self.recalcular_sla()
 
         # Limpiar etiquetas al pasar a estados finales
         if nuevo_estado in ['APROBADO', 'RECHAZADO', 'ELIMINADO']:
@@ -170,6 +184,11 @@ class Evento(db.Model):
         db.session.add(transicion)
         return True
 
+    def recalcular_sla(self):
+        """Actualiza sla_alerta_at / sla_critico_at según estado y último cambio"""
+        fecha_ref = self.fecha_ultimo_cambio_estado or self.created_at or ahora_argentina()
+        self.sla_alerta_at, self.sla_critico_at = calcular_vencimientos_sla(self.estado, fecha_ref)
+
     def generar_titulo_auto(self):
         """Genera título automático: PAX 20 — Costa 7070 — Social"""
         partes = []
@@ -237,6 +256,14 @@ class Evento(db.Model):
 
         return result
 
+# Los vencimientos SLA se recalculan en cada INSERT/UPDATE, así quedan bien
+# aunque el estado se asigne directo (evento.estado = ...) sin cambiar_estado()
+@event.listens_for(Evento, 'before_insert')
+@event.listens_for(Evento, 'before_update')
+def _recalcular_sla_evento(mapper, connection, target):
+    target.recalcular_sla()
+
+
 # Tabla de Actividades (historial flexible)
 class Actividad(db.Model):
     __tablename__ = 'actividades'
@@ -287,6 +314,10 @@ class RespuestaMail(db.Model):
 # Tabla de Conversaciones de Mail (historial completo de threads de Gmail)
 class ConversacionMail(db.Model):
     __tablename__ = 'conversacion_mail'
+    __table_args__ = (
+        # Búsqueda de texto completo (app/utils/busqueda.py); en SQLite se usa FTS5
+        db.Index('ft_conversacion_mail_asunto_mensaje', 'asunto', 'mensaje', mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
+    )
 
     message_id = db.Column(db.String(100), primary_key=True)  # ID único de Gmail
     thread_id = db.Column(db.String(100), nullable=False, index=True)  # Relaciona con eventos.thread_id
@@ -114,6 +114,8 @@ class PrecheckPago(db.Model):
     fecha_acreditacion = db.Column(db.Date, nullable=True)
     comprobante_url = db.Column(db.String(500), nullable=True)  # URL en GCP bucket
     comprobante_nombre = db.Column(db.String(255), nullable=True)  # Nombre original del archivo
+    comprobante_preview = db.Column(db.String(500), nullable=True)  # Blob path del JPEG reducido (solo imágenes)
+    comprobante_thumb = db.Column(db.String(500), nullable=True)  # Blob path de la miniatura (solo imágenes)
     notas = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=ahora_argentina)
     updated_at = db.Column(db.DateTime, default=ahora_argentina, onupdate=ahora_argentina)
@@ -142,6 +144,8 @@ class PrecheckPago(db.Model):
             'fecha_acreditacion': self.fecha_acreditacion.isoformat() if self.fecha_acreditacion else None,
             'comprobante_url': self.comprobante_url,
             'comprobante_nombre': self.comprobante_nombre,
+            'comprobante_preview': self.comprobante_preview,
+            'comprobante_thumb': self.comprobante_thumb,
             'notas': self.notas,
             'estado': self.estado,
             'numero_oppen': self.numero_oppen,
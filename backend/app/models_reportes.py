@@ -0,0 +1,233 @@
+"""
+Modelo SQLAlchemy para el rollup diario de reportes.
+Tabla: reporte_diario (agregado materializado de eventos por día)
+
+Cada fila acumula cantidad de eventos y suma de presupuestos para una
+combinación (fecha, tipo_fecha, local, comercial, canal, estado).
+Se mantiene incrementalmente en cada flush que toca eventos y puede
+reconstruirse completa con reconstruir_reporte_diario().
+"""
+from decimal import Decimal
+from sqlalchemy import event, func, literal, select, insert as sql_insert
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+from app import db
+from app.utils.timezone import ahora_argentina
+
+
+# tipo_fecha: 'creacion' (eventos.created_at) o 'evento' (eventos.fecha_evento)
+TIPOS_FECHA = ('creacion', 'evento')
+
+# Valores centinela para dimensiones NULL (permiten una clave única real)
+SIN_LOCAL = 0
+SIN_COMERCIAL = 0
+SIN_CANAL = ''
+
+
+class ReporteDiario(db.Model):
+    """
+    Rollup diario de eventos para el dashboard de reportes.
+    local_id/comercial_id = 0 y canal_origen = '' representan "sin dato".
+    """
+    __tablename__ = 'reporte_diario'
+    __table_args__ = (
+        db.UniqueConstraint('fecha', 'tipo_fecha', 'local_id', 'comercial_id', 'canal_origen', 'estado',
+                            name='uq_reporte_diario_clave'),
+        db.Index('idx_reporte_diario_tipo_fecha', 'tipo_fecha', 'fecha'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    fecha = db.Column(db.Date, nullable=False)
+    tipo_fecha = db.Column(db.String(10), nullable=False)
+    local_id = db.Column(db.Integer, nullable=False, default=SIN_LOCAL)
+    comercial_id = db.Column(db.Integer, nullable=False, default=SIN_COMERCIAL)
+    canal_origen = db.Column(db.String(30), nullable=False, default=SIN_CANAL)
+    estado = db.Column(db.String(30), nullable=False)
+    cantidad = db.Column(db.Integer, nullable=False, default=0)
+    presupuesto_total = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=ahora_argentina, onupdate=ahora_argentina)
+
+
+def _fecha_por_tipo(created_at, fecha_evento):
+    """Fechas del evento para cada tipo_fecha (omite las que son NULL)"""
+    fechas = {}
+    if created_at:
+        fechas['creacion'] = created_at.date() if hasattr(created_at, 'date') else created_at
+    if fecha_evento:
+        fechas['evento'] = fecha_evento
+    return fechas
+
+
+def _claves(valores):
+    """Claves del rollup que ocupa un evento con estos valores de columnas"""
+    claves = []
+    for tipo_fecha, fecha in _fecha_por_tipo(valores['created_at'], valores['fecha_evento']).items():
+        claves.append((
+            fecha,
+            tipo_fecha,
+            valores['local_id'] or SIN_LOCAL,
+            valores['comercial_id'] or SIN_COMERCIAL,
+            valores['canal_origen'] or SIN_CANAL,
+            valores['estado'] or '',
+        ))
+    return claves
+
+
+CAMPOS_ROLLUP = ('created_at', 'fecha_evento', 'local_id', 'comercial_id', 'canal_origen', 'estado', 'presupuesto')
+
+
+def _valores_actuales(evento):
+    return {campo: getattr(evento, campo) for campo in CAMPOS_ROLLUP}
+
+
+def _valores_anteriores(evento):
+    """Valores previos al flush, a partir del historial de atributos"""
+    valores = {}
+    for campo in CAMPOS_ROLLUP:
+        hist = get_history(evento, campo)
+        if hist.deleted:
+            valores[campo] = hist.deleted[0]
+        elif hist.unchanged:
+            valores[campo] = hist.unchanged[0]
+        else:
+            valores[campo] = None
+    return valores
+
+
+def _registrar_historial_activo():
+    """
+    Con active_history, asignar un campo de un evento expirado (por ejemplo
+    después de un commit) carga antes el valor previo; si no, get_history no
+    lo tiene y el delta se restaría de una clave equivocada.
+    """
+    from app.models import Evento
+
+    def _sin_cambios(target, value, oldvalue, initiator):
+        return value
+
+    for campo in CAMPOS_ROLLUP:
+        event.listen(getattr(Evento, campo), 'set', _sin_cambios, active_history=True, retval=True)
+
+
+_registrar_historial_activo()
+
+
+def _acumular(deltas, valores, signo):
+    presupuesto = Decimal(str(valores['presupuesto'])) if valores['presupuesto'] else Decimal('0')
+    for clave in _claves(valores):
+        cantidad, monto = deltas.get(clave, (0, Decimal('0')))
+        deltas[clave] = (cantidad + signo, monto + signo * presupuesto)
+
+
+def aplicar_deltas(connection, deltas):
+    """
+    Suma los deltas {clave: (cantidad, presupuesto)} al rollup con un upsert
+    nativo del motor (ON DUPLICATE KEY UPDATE en MySQL, ON CONFLICT en SQLite).
+    """
+    filas = [
+        {
+            'fecha': clave[0], 'tipo_fecha': clave[1], 'local_id': clave[2],
+            'comercial_id': clave[3], 'canal_origen': clave[4], 'estado': clave[5],
+            'cantidad': cantidad, 'presupuesto_total': monto, 'updated_at': ahora_argentina(),
+        }
+        for clave, (cantidad, monto) in deltas.items()
+        if cantidad or monto
+    ]
+    if not filas:
+        return
+
+    tabla = ReporteDiario.__table__
+    if connection.dialect.name == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(tabla)
+        stmt = stmt.on_duplicate_key_update(
+            cantidad=tabla.c.cantidad + stmt.inserted.cantidad,
+            presupuesto_total=tabla.c.presupuesto_total + stmt.inserted.presupuesto_total,
+            updated_at=stmt.inserted.updated_at,
+        )
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(tabla)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['fecha', 'tipo_fecha', 'local_id', 'comercial_id', 'canal_origen', 'estado'],
+            set_={
+                'cantidad': tabla.c.cantidad + stmt.excluded.cantidad,
+                'presupuesto_total': tabla.c.presupuesto_total + stmt.excluded.presupuesto_total,
+                'updated_at': stmt.excluded.updated_at,
+            },
+        )
+    connection.execute(stmt, filas)
+
+
+@event.listens_for(Session, 'after_flush')
+def _actualizar_reporte_diario(session, flush_context):
+    """
+    Mantiene reporte_diario al día en la misma transacción que modifica eventos.
+    Cubre altas, cambios de estado (incluyendo los que acompañan a
+    registrar_transicion), reasignaciones y bajas físicas.
+    """
+    from app.models import Evento
+
+    deltas = {}
+    for obj in session.new:
+        if isinstance(obj, Evento):
+            _acumular(deltas, _valores_actuales(obj), +1)
+
+    for obj in session.dirty:
+        if isinstance(obj, Evento) and session.is_modified(obj, include_collections=False):
+            anteriores = _valores_anteriores(obj)
+            actuales = _valores_actuales(obj)
+            if anteriores != actuales:
+                _acumular(deltas, anteriores, -1)
+                _acumular(deltas, actuales, +1)
+
+    for obj in session.deleted:
+        if isinstance(obj, Evento):
+            _acumular(deltas, _valores_anteriores(obj), -1)
+
+    if deltas:
+        aplicar_deltas(session.connection(), deltas)
+
+
+def reconstruir_reporte_diario():
+    """
+    Reconstruye reporte_diario completo desde eventos (backfill).
+    Borra el rollup y lo recalcula con un INSERT ... SELECT por tipo_fecha.
+
+    Returns:
+        int: cantidad de filas generadas
+    """
+    from app.models import Evento
+
+    tabla = ReporteDiario.__table__
+    db.session.execute(tabla.delete())
+
+    for tipo_fecha, campo_fecha in (('creacion', Evento.created_at), ('evento', Evento.fecha_evento)):
+        fecha = func.date(campo_fecha)
+        local_id = func.coalesce(Evento.local_id, SIN_LOCAL)
+        comercial_id = func.coalesce(Evento.comercial_id, SIN_COMERCIAL)
+        canal_origen = func.coalesce(Evento.canal_origen, SIN_CANAL)
+        estado = func.coalesce(Evento.estado, '')
+
+        consulta = select(
+            fecha,
+            literal(tipo_fecha),
+            local_id,
+            comercial_id,
+            canal_origen,
+            estado,
+            func.count(Evento.id),
+            func.coalesce(func.sum(Evento.presupuesto), 0),
+            literal(ahora_argentina()),
+        ).where(
+            campo_fecha.isnot(None)
+        ).group_by(fecha, local_id, comercial_id, canal_origen, estado)
+
+        db.session.execute(sql_insert(tabla).from_select(
+            ['fecha', 'tipo_fecha', 'local_id', 'comercial_id', 'canal_origen', 'estado',
+             'cantidad', 'presupuesto_total', 'updated_at'],
+            consulta
+        ))
+
+    db.session.commit()
+    return db.session.query(func.count(ReporteDiario.id)).scalar()
@@ -0,0 +1,107 @@
+"""
+Modelo SQLAlchemy para el registro de cambios del tablero.
+Tabla: cambios_tablero
+
+Cada commit que modifica algo visible en el Kanban o el calendario
+(eventos, clientes, locales, usuarios, precheck) agrega una fila con los ids
+tocados. La revisión del tablero es MAX(id): los endpoints la usan como ETag
+y, si no cambió, responden 304 sin cargar ni serializar eventos.
+
+La fila se inserta después del commit, en una transacción corta propia: las
+escrituras del CRM no comparten ningún lock (un contador único serializaba
+todas las transacciones que tocaban el tablero hasta su commit).
+"""
+import time
+import threading
+from datetime import timedelta
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import db
+from app.utils.pendientes_sesion import agregar_pendiente, tomar_pendientes
+from app.utils.timezone import ahora_argentina
+
+
+# Modelos cuyo cambio invalida el tablero (por nombre para evitar imports circulares)
+MODELOS_TABLERO = {'Evento', 'Cliente', 'Local', 'Usuario', 'PrecheckConcepto', 'PrecheckAdicional'}
+# El precheck cambia la tarjeta de su evento (tiene_precheck): se registra el evento
+MODELOS_DE_EVENTO = {'PrecheckConcepto', 'PrecheckAdicional'}
+
+# Las filas más viejas que esto se purgan (un token de /cambios más viejo recarga)
+RETENCION = timedelta(days=2)
+INTERVALO_PURGA_SEGUNDOS = 600
+
+
+class CambioTablero(db.Model):
+    """Un commit que tocó el tablero; id creciente = revisión"""
+    __tablename__ = 'cambios_tablero'
+
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True, autoincrement=True)
+    cambios = db.Column(db.JSON, nullable=False)  # {'Evento': [ids], 'Cliente': [ids], 'Local': [...], 'Usuario': [...]}
+    created_at = db.Column(db.DateTime, default=ahora_argentina, nullable=False, index=True)
+
+
+def registrar_cambios(cambios):
+    """Agrega una fila al registro en su propia transacción (autocommit corto)"""
+    tabla = CambioTablero.__table__
+    with db.engine.begin() as conn:
+        conn.execute(tabla.insert().values(cambios=cambios, created_at=ahora_argentina()))
+        _purgar_si_corresponde(conn)
+
+
+_ultima_purga = 0.0
+_purga_lock = threading.Lock()
+
+
+def _purgar_si_corresponde(conn):
+    global _ultima_purga
+    with _purga_lock:
+        if time.time() - _ultima_purga < INTERVALO_PURGA_SEGUNDOS:
+            return
+        _ultima_purga = time.time()
+    tabla = CambioTablero.__table__
+    conn.execute(tabla.delete().where(tabla.c.created_at < ahora_argentina() - RETENCION))
+
+
+def obtener_revision():
+    """Revisión actual: último id del registro (0 si todavía no hubo cambios)"""
+    revision = db.session.query(db.func.max(CambioTablero.id)).scalar()
+    return revision or 0
+
+
+def _cambios_del_flush(session):
+    """{modelo: ids} de los objetos del tablero creados, modificados o borrados"""
+    cambios = {}
+    for obj in list(session.new) + list(session.deleted) + list(session.dirty):
+        nombre = type(obj).__name__
+        if nombre not in MODELOS_TABLERO:
+            continue
+        if obj in session.dirty and not session.is_modified(obj, include_collections=False):
+            continue
+        if nombre in MODELOS_DE_EVENTO:
+            cambios.setdefault('Evento', set()).add(obj.evento_id)
+        else:
+            cambios.setdefault(nombre, set()).add(obj.id)
+    return cambios
+
+
+@event.listens_for(Session, 'after_flush')
+def _acumular_cambios_tablero(session, flush_context):
+    """Junta lo tocado en cada flush; se registra recién al confirmar"""
+    cambios = _cambios_del_flush(session)
+    if cambios:
+        agregar_pendiente(session, 'tablero', cambios)
+
+
+@event.listens_for(Session, 'after_commit')
+def _registrar_cambios_tablero(session):
+    pendientes = {}
+    for cambios in tomar_pendientes(session, 'tablero'):
+        for nombre, ids in cambios.items():
+            pendientes.setdefault(nombre, set()).update(ids)
+    if not pendientes:
+        return
+    try:
+        registrar_cambios({nombre: sorted(ids) for nombre, ids in pendientes.items()})
+    except Exception as e:
+        # El ETag vence igual por la ventana de SLA; no romper el request
+        print(f"[TABLERO] Error registrando cambios: {e}")
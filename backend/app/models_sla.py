@@ -14,6 +14,10 @@ class SlaViolation(db.Model):
     el evento supera el umbral crítico. No se elimina si el evento avanza.
     """
     __tablename__ = 'sla_violations'
+    __table_args__ = (
+        # Una violación por (evento, estado): permite INSERT IGNORE en check-violations
+        db.UniqueConstraint('evento_id', 'estado', name='uq_sla_violations_evento_estado'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     evento_id = db.Column(db.Integer, db.ForeignKey('eventos.id', ondelete='CASCADE'), nullable=False, index=True)
@@ -0,0 +1,22 @@
+"""
+Modelo SQLAlchemy para el broker de mensajes push entre instancias.
+Tabla: stream_mensajes
+
+Solo se usa con PUBSUB_BACKEND=tabla: cada instancia inserta acá lo que
+publica y lee periódicamente los mensajes nuevos para reenviarlos a sus
+suscriptores SSE. Con el backend en memoria (default) la tabla queda vacía.
+"""
+from app import db
+from app.utils.timezone import ahora_argentina
+
+
+class StreamMensaje(db.Model):
+    """Mensaje publicado en /api/stream (se purga después de un rato)"""
+    __tablename__ = 'stream_mensajes'
+
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True, autoincrement=True)
+    tipo = db.Column(db.String(30), nullable=False)
+    datos = db.Column(db.JSON, nullable=True)
+    usuarios = db.Column(db.JSON, nullable=True)  # ids destinatarios (NULL = sin filtro por usuario)
+    roles = db.Column(db.JSON, nullable=True)  # roles destinatarios (NULL = sin filtro por rol)
+    created_at = db.Column(db.DateTime, default=ahora_argentina, nullable=False, index=True)
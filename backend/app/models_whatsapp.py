@@ -5,6 +5,10 @@ Tablas: contactos, conversaciones, mensajes (sin prefijo wa_)
 from app import db
 from datetime import datetime
 from app.utils.timezone import ahora_argentina
+from app.utils.paginacion import codificar_cursor_numerico, filtro_keyset_numerico_desc
+
+# Mensajes que trae el detalle de una conversación por página
+LIMITE_MENSAJES_DETALLE = 50
 
 
 class WAContacto(db.Model):
@@ -56,6 +60,12 @@ class WAConversacion(db.Model):
     Tabla: conversaciones
     """
     __tablename__ = 'conversaciones'
+    __table_args__ = (
+        # Clave del upsert de la ingesta por lotes (app/utils/whatsapp_ingesta.py)
+        db.UniqueConstraint('contacto_id', 'remote_jid', 'instancia_nombre', name='uq_conversaciones_contacto_jid_instancia'),
+        # Bandeja: filtro por estado + orden keyset (ultima_actividad DESC, id DESC)
+        db.Index('idx_conversaciones_estado_actividad', 'estado', 'ultima_actividad', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     contacto_id = db.Column(db.Integer, db.ForeignKey('contactos.id', ondelete='CASCADE'), nullable=False, index=True)
@@ -76,7 +86,27 @@ class WAConversacion(db.Model):
     contacto = db.relationship('WAContacto', back_populates='conversaciones')
     mensajes = db.relationship('WAMensaje', back_populates='conversacion', cascade='all, delete-orphan', order_by='WAMensaje.timestamp')
 
-    def to_dict(self, include_mensajes=False):
+    def pagina_mensajes(self, limite=LIMITE_MENSAJES_DETALLE, before=None):
+        """
+        Página de mensajes, más nuevos primero, sin cargar la relación completa.
+        `before` es el cursor (timestamp, id) de la página anterior; usa
+        idx_mensajes_conv_timestamp. Lanza ValueError si el cursor es inválido.
+
+        Returns:
+            (lista de WAMensaje, cursor para la página siguiente o None)
+        """
+        query = WAMensaje.query.filter(WAMensaje.conversacion_id == self.id)
+        if before:
+            query = query.filter(filtro_keyset_numerico_desc(WAMensaje.timestamp, WAMensaje.id, before))
+
+        # Se pide una fila de más para saber si hay página siguiente
+        mensajes = query.order_by(WAMensaje.timestamp.desc(), WAMensaje.id.desc()).limit(limite + 1).all()
+        if len(mensajes) <= limite:
+            return mensajes, None
+        mensajes = mensajes[:limite]
+        return mensajes, codificar_cursor_numerico(mensajes[-1].timestamp, mensajes[-1].id)
+
+    def to_dict(self, include_mensajes=False, limite_mensajes=LIMITE_MENSAJES_DETALLE, before=None):
         data = {
             'id': self.id,
             'contacto_id': self.contacto_id,
@@ -95,7 +125,10 @@ class WAConversacion(db.Model):
             'fecha_actualizacion': self.fecha_actualizacion.isoformat() if self.fecha_actualizacion else None
         }
         if include_mensajes:
-            data['mensajes'] = [m.to_dict() for m in self.mensajes]
+            # Solo una página acotada: hay chats con decenas de miles de mensajes
+            mensajes, siguiente = self.pagina_mensajes(limite_mensajes, before)
+            data['mensajes'] = [m.to_dict() for m in mensajes]
+            data['siguiente_before'] = siguiente
         return data
 
 
@@ -107,6 +140,8 @@ class WAMensaje(db.Model):
     __tablename__ = 'mensajes'
     __table_args__ = (
         db.Index('idx_mensajes_conv_timestamp', 'conversacion_id', 'timestamp'),
+        # Búsqueda de texto completo (app/utils/busqueda.py); en SQLite se usa FTS5
+        db.Index('ft_mensajes_texto', 'texto', mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
     )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
@@ -145,3 +180,37 @@ class WAMensaje(db.Model):
             'tiene_multimedia': self.tiene_multimedia,
             'multimedia_url': self.multimedia_url
         }
+
+
+class WAWebhookPendiente(db.Model):
+    """
+    Cola durable de payloads del webhook de Evolution API.
+    El webhook solo inserta acá y responde 202; los workers de
+    app/utils/whatsapp_cola.py la drenan en lotes.
+    Tabla: webhook_pendientes
+    """
+    __tablename__ = 'webhook_pendientes'
+    __table_args__ = (
+        db.Index('idx_webhook_pendientes_estado_id', 'estado', 'id'),
+    )
+
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True, autoincrement=True)
+    instancia = db.Column(db.String(50), nullable=True)
+    payload = db.Column(db.JSON, nullable=False)
+    estado = db.Column(db.String(20), nullable=False, default='pendiente')  # pendiente, procesando, procesado, error
+    intentos = db.Column(db.Integer, nullable=False, default=0)
+    ultimo_error = db.Column(db.Text, nullable=True)
+    recibido_at = db.Column(db.DateTime, default=ahora_argentina, nullable=False)
+    tomado_at = db.Column(db.DateTime, nullable=True)
+    procesado_at = db.Column(db.DateTime, nullable=True, index=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'instancia': self.instancia,
+            'estado': self.estado,
+            'intentos': self.intentos,
+            'ultimo_error': self.ultimo_error,
+            'recibido_at': self.recibido_at.isoformat() if self.recibido_at else None,
+            'procesado_at': self.procesado_at.isoformat() if self.procesado_at else None,
+        }
@@ -0,0 +1,284 @@
+"""
+Modelo SQLAlchemy para los contadores de /webhook/stats.
+Tabla: wa_stats (fila base 'global' + SHARDS_STATS filas de deltas)
+
+Los contadores se mantienen en la misma transacción que los cambios:
+- altas/bajas/ediciones por el ORM (webhook sincrónico, PUT de contactos)
+  con un listener after_flush, como reporte_diario;
+- la ingesta por lotes (INSERT multi-fila, no pasa por el ORM) llama a
+  sumar_stats() con lo que insertó.
+
+Los deltas no van a una sola fila: cada hilo suma siempre en el mismo shard
+(elegido al azar la primera vez), así las transacciones de ingesta no se
+serializan esperando el lock de una fila única y una transacción nunca
+bloquea dos shards. La lectura suma las SHARDS_STATS + 1 filas.
+
+reconciliar_stats() (cron, POST /webhook/stats/reconciliar) recalcula todo
+con una sola query agregada, lo escribe en la fila base y pone los shards en
+cero; corrige cualquier desvío (borrados en cascada de la base, shards que
+faltaban, etc.).
+"""
+import random
+import threading
+from sqlalchemy import event, func, select, case, true, update, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+from app import db
+from app.utils.timezone import ahora_argentina
+
+CLAVE_STATS = 'global'
+
+SHARDS_STATS = 16
+CLAVES_SHARDS = tuple(f'shard_{i:02d}' for i in range(SHARDS_STATS))
+
+CAMPOS_STATS = (
+    'contactos_total', 'contactos_nuevos', 'contactos_clientes',
+    'conversaciones_total', 'conversaciones_abiertas',
+    'mensajes_total', 'mensajes_recibidos', 'mensajes_enviados',
+)
+
+
+class WAStats(db.Model):
+    """Contadores de WhatsApp: la fila base o un shard de deltas"""
+    __tablename__ = 'wa_stats'
+
+    clave = db.Column(db.String(20), primary_key=True, default=CLAVE_STATS)
+    contactos_total = db.Column(db.BigInteger, nullable=False, default=0)
+    contactos_nuevos = db.Column(db.BigInteger, nullable=False, default=0)
+    contactos_clientes = db.Column(db.BigInteger, nullable=False, default=0)
+    conversaciones_total = db.Column(db.BigInteger, nullable=False, default=0)
+    conversaciones_abiertas = db.Column(db.BigInteger, nullable=False, default=0)
+    mensajes_total = db.Column(db.BigInteger, nullable=False, default=0)
+    mensajes_recibidos = db.Column(db.BigInteger, nullable=False, default=0)
+    mensajes_enviados = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=ahora_argentina, onupdate=ahora_argentina)
+    reconciliado_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            'contactos': {
+                'total': self.contactos_total,
+                'nuevos': self.contactos_nuevos,
+                'clientes': self.contactos_clientes
+            },
+            'conversaciones': {
+                'total': self.conversaciones_total,
+                'abiertas': self.conversaciones_abiertas
+            },
+            'mensajes': {
+                'total': self.mensajes_total,
+                'recibidos': self.mensajes_recibidos,
+                'enviados': self.mensajes_enviados
+            },
+            'reconciliado_at': self.reconciliado_at.isoformat() if self.reconciliado_at else None
+        }
+
+
+# Campos que cambian la contribución de una fila a los contadores
+CAMPOS_POR_MODELO = {
+    'WAContacto': ('estado', 'es_cliente'),
+    'WAConversacion': ('estado',),
+    'WAMensaje': ('es_enviado',),
+}
+
+
+def _contribucion(nombre, valores):
+    """Contadores que suma una fila de contactos/conversaciones/mensajes"""
+    if nombre == 'WAContacto':
+        return {
+            'contactos_total': 1,
+            'contactos_nuevos': 1 if valores['estado'] == 'nuevo' else 0,
+            'contactos_clientes': 1 if valores['es_cliente'] else 0,
+        }
+    if nombre == 'WAConversacion':
+        return {
+            'conversaciones_total': 1,
+            'conversaciones_abiertas': 1 if valores['estado'] == 'abierta' else 0,
+        }
+    return {
+        'mensajes_total': 1,
+        'mensajes_enviados': 1 if valores['es_enviado'] else 0,
+        'mensajes_recibidos': 0 if valores['es_enviado'] else 1,
+    }
+
+
+def _valores_actuales(obj, campos):
+    return {campo: getattr(obj, campo) for campo in campos}
+
+
+def _valores_anteriores(obj, campos):
+    valores = {}
+    for campo in campos:
+        historial = get_history(obj, campo)
+        if historial.deleted:
+            valores[campo] = historial.deleted[0]
+        elif historial.unchanged:
+            valores[campo] = historial.unchanged[0]
+        else:
+            valores[campo] = getattr(obj, campo)
+    return valores
+
+
+def _acumular(deltas, contribucion, signo):
+    for campo, valor in contribucion.items():
+        if valor:
+            deltas[campo] = deltas.get(campo, 0) + signo * valor
+
+
+_shard_del_hilo = threading.local()
+
+
+def _clave_shard():
+    """Shard fijo del hilo: una transacción siempre suma en una sola fila"""
+    clave = getattr(_shard_del_hilo, 'clave', None)
+    if clave is None:
+        clave = _shard_del_hilo.clave = random.choice(CLAVES_SHARDS)
+    return clave
+
+
+def sumar_stats(connection, deltas):
+    """
+    Suma los deltas {campo: n} al shard del hilo con un UPDATE atómico.
+    Si el shard todavía no existe no hace nada: lo crea reconciliar_stats()
+    con los totales reales en la primera lectura.
+    """
+    deltas = {campo: valor for campo, valor in deltas.items() if valor}
+    if not deltas:
+        return
+    tabla = WAStats.__table__
+    connection.execute(update(tabla).where(tabla.c.clave == _clave_shard()).values(
+        updated_at=ahora_argentina(),
+        **{campo: tabla.c[campo] + valor for campo, valor in deltas.items()}
+    ))
+
+
+def _registrar_historial_activo():
+    """
+    Con active_history, asignar un campo de un objeto expirado carga antes el
+    valor previo; si no, get_history no lo tiene y el delta sale mal.
+    """
+    from app import models_whatsapp
+
+    def _sin_cambios(target, value, oldvalue, initiator):
+        return value
+
+    for nombre, campos in CAMPOS_POR_MODELO.items():
+        modelo = getattr(models_whatsapp, nombre)
+        for campo in campos:
+            event.listen(getattr(modelo, campo), 'set', _sin_cambios, active_history=True, retval=True)
+
+
+_registrar_historial_activo()
+
+
+@event.listens_for(Session, 'after_flush')
+def _actualizar_wa_stats(session, flush_context):
+    """Mantiene wa_stats al día en la misma transacción que los cambios del ORM"""
+    deltas = {}
+    for obj in session.new:
+        campos = CAMPOS_POR_MODELO.get(type(obj).__name__)
+        if campos:
+            _acumular(deltas, _contribucion(type(obj).__name__, _valores_actuales(obj, campos)), +1)
+
+    for obj in session.dirty:
+        campos = CAMPOS_POR_MODELO.get(type(obj).__name__)
+        if campos and session.is_modified(obj, include_collections=False):
+            nombre = type(obj).__name__
+            _acumular(deltas, _contribucion(nombre, _valores_anteriores(obj, campos)), -1)
+            _acumular(deltas, _contribucion(nombre, _valores_actuales(obj, campos)), +1)
+
+    for obj in session.deleted:
+        campos = CAMPOS_POR_MODELO.get(type(obj).__name__)
+        if campos:
+            _acumular(deltas, _contribucion(type(obj).__name__, _valores_anteriores(obj, campos)), -1)
+
+    if deltas:
+        sumar_stats(session.connection(), deltas)
+
+
+def calcular_stats_exactos():
+    """
+    Los ocho contadores con una sola query: un agregado por tabla (un
+    recorrido de cada una) unidos en una fila.
+    """
+    from app.models_whatsapp import WAContacto, WAConversacion, WAMensaje
+
+    def contar_si(condicion):
+        return func.coalesce(func.sum(case((condicion, 1), else_=0)), 0)
+
+    contactos = select(
+        func.count(WAContacto.id).label('contactos_total'),
+        contar_si(WAContacto.estado == 'nuevo').label('contactos_nuevos'),
+        contar_si(WAContacto.es_cliente == True).label('contactos_clientes'),
+    ).subquery()
+    conversaciones = select(
+        func.count(WAConversacion.id).label('conversaciones_total'),
+        contar_si(WAConversacion.estado == 'abierta').label('conversaciones_abiertas'),
+    ).subquery()
+    mensajes = select(
+        func.count(WAMensaje.id).label('mensajes_total'),
+        contar_si(WAMensaje.es_enviado == False).label('mensajes_recibidos'),
+        contar_si(WAMensaje.es_enviado == True).label('mensajes_enviados'),
+    ).subquery()
+
+    fila = db.session.execute(
+        select(contactos, conversaciones, mensajes).select_from(
+            contactos.join(conversaciones, true()).join(mensajes, true())
+        )
+    ).mappings().one()
+    return {campo: int(fila[campo]) for campo in CAMPOS_STATS}
+
+
+def reconciliar_stats():
+    """
+    Recalcula los contadores: los escribe en la fila base y pone los shards en
+    cero (crea las filas que falten). No hace commit.
+
+    Returns:
+        WAStats (sin sesión) con los totales
+    """
+    tabla = WAStats.__table__
+    # Bloquear las filas antes de contar: los deltas en vuelo terminan primero
+    # y quedan incluidos en el recuento, no sumados dos veces
+    existentes = set(db.session.execute(select(tabla.c.clave).with_for_update()).scalars())
+    valores = calcular_stats_exactos()
+    ahora = ahora_argentina()
+    ceros = dict.fromkeys(CAMPOS_STATS, 0)
+
+    for clave in (CLAVE_STATS,) + CLAVES_SHARDS:
+        fila = {**(valores if clave == CLAVE_STATS else ceros), 'updated_at': ahora}
+        if clave == CLAVE_STATS:
+            fila['reconciliado_at'] = ahora
+        if clave in existentes:
+            db.session.execute(update(tabla).where(tabla.c.clave == clave).values(**fila))
+        else:
+            db.session.execute(insert(tabla).values(clave=clave, **fila))
+    return WAStats(clave=CLAVE_STATS, reconciliado_at=ahora, **valores)
+
+
+def leer_stats():
+    """
+    Totales sumando la fila base y los shards (una lectura por rango de la
+    clave primaria). Si faltan filas (primera vez, deploy desde la versión de
+    una sola fila) las calcula y las guarda.
+    """
+    tabla = WAStats.__table__
+    fila = db.session.execute(select(
+        func.count().label('filas'),
+        func.max(tabla.c.reconciliado_at).label('reconciliado_at'),
+        *[func.coalesce(func.sum(tabla.c[campo]), 0).label(campo) for campo in CAMPOS_STATS]
+    )).mappings().one()
+    if fila['filas'] == SHARDS_STATS + 1:
+        return WAStats(
+            clave=CLAVE_STATS, reconciliado_at=fila['reconciliado_at'],
+            **{campo: int(fila[campo]) for campo in CAMPOS_STATS}
+        )
+    try:
+        stats = reconciliar_stats()
+        db.session.commit()
+    except IntegrityError:
+        # Otra instancia las creó en paralelo
+        db.session.rollback()
+        stats = leer_stats()
+    return stats
@@ -0,0 +1,35 @@
+"""
+Archivos del storage local (STORAGE_BACKEND=local).
+
+Cumple el papel de las signed URLs de GCS: StorageLocal.firmar() genera
+/api/archivos/<blob_path>?expires=...&signature=... (HMAC con SECRET_KEY) y
+esta ruta lo sirve en streaming desde un mmap del archivo. Con otro backend
+responde 404.
+"""
+import mimetypes
+from flask import Blueprint, Response, request, jsonify
+from app.utils.storage import obtener_storage, StorageLocal, CACHE_CONTROL_COMPROBANTES
+
+archivos_bp = Blueprint('archivos', __name__)
+
+
+@archivos_bp.route('/<path:blob_path>', methods=['GET'])
+def servir_archivo(blob_path):
+    backend = obtener_storage()
+    if not isinstance(backend, StorageLocal):
+        return jsonify({'error': 'No encontrado'}), 404
+
+    if not backend.verificar_firma(blob_path, request.args.get('expires'), request.args.get('signature')):
+        return jsonify({'error': 'Link inválido o vencido'}), 403
+
+    try:
+        tamano = backend.tamano(blob_path)
+    except (FileNotFoundError, ValueError):
+        return jsonify({'error': 'No encontrado'}), 404
+
+    return Response(
+        backend.stream(blob_path),
+        mimetype=mimetypes.guess_type(blob_path)[0] or 'application/octet-stream',
+        headers={'Content-Length': str(tamano), 'Cache-Control': CACHE_CONTROL_COMPROBANTES},
+        direct_passthrough=True
+    )
@@ -15,14 +15,40 @@ def create_token(user_id, user_rol):
     }
     return jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
 
+def create_purpose_token(user_id, proposito, segundos):
+    """JWT de corta duración que solo sirve para un propósito (ej: abrir /api/stream)"""
+    payload = {
+        'user_id': user_id,
+        'proposito': proposito,
+        'exp': datetime.utcnow() + timedelta(seconds=segundos)
+    }
+    return jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
+
+def get_user_from_purpose_token(token, proposito):
+    """Usuario de un token de propósito o None si es inválido, expiró o es de otro propósito"""
+    try:
+        payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+    except jwt.InvalidTokenError:
+        return None
+    if payload.get('proposito') != proposito:
+        return None
+    return Usuario.query.get(payload['user_id'])
+
 def get_current_user_from_token():
     auth_header = request.headers.get('Authorization')
     if not auth_header or not auth_header.startswith('Bearer '):
         return None
 
     token = auth_header.split(' ')[1]
+    return get_user_from_jwt(token)
+
+def get_user_from_jwt(token):
+    """Usuario del JWT o None si es inválido o expiró"""
     try:
         payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+        # Los tokens de propósito (stream) no sirven como sesión
+        if payload.get('proposito'):
+            return None
         return Usuario.query.get(payload['user_id'])
     except jwt.ExpiredSignatureError:
         return None
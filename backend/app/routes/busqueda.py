@@ -0,0 +1,79 @@
+"""
+Rutas de búsqueda de texto completo (WhatsApp + Gmail)
+"""
+from datetime import datetime
+from flask import Blueprint, request, jsonify
+from app.routes.auth import token_required
+from app.utils.busqueda import (
+    buscar_mensajes, buscar_mails, LIMITE_POR_DEFECTO, LIMITE_MAXIMO, MAXIMO_RESULTADOS
+)
+from app.utils.paginacion import leer_limite
+
+busqueda_bp = Blueprint('busqueda', __name__)
+
+ORIGENES = ('whatsapp', 'mail')
+
+
+def _leer_fecha(valor):
+    return datetime.strptime(valor, '%Y-%m-%d').date() if valor else None
+
+
+@busqueda_bp.route('', methods=['GET'])
+@token_required
+def buscar(current_user):
+    """
+    Busca en mensajes de WhatsApp y mails, ordenado por relevancia.
+
+    Query params:
+        q (obligatorio)
+        origen: whatsapp, mail o todos (default)
+        comercial_id: solo admins; los comerciales ven siempre lo suyo
+        instancia: instancia de Evolution (solo WhatsApp)
+        desde, hasta: YYYY-MM-DD
+        limit (default 20, máximo 50), pagina (desde 1)
+
+    Cada origen devuelve sus resultados y si hay más páginas.
+    """
+    consulta = (request.args.get('q') or '').strip()
+    if len(consulta) < 2:
+        return jsonify({'error': 'La búsqueda necesita al menos 2 caracteres'}), 400
+
+    origen = request.args.get('origen', 'todos')
+    if origen != 'todos' and origen not in ORIGENES:
+        return jsonify({'error': f'Origen inválido: {origen}'}), 400
+    origenes = ORIGENES if origen == 'todos' else (origen,)
+
+    try:
+        desde = _leer_fecha(request.args.get('desde'))
+        hasta = _leer_fecha(request.args.get('hasta'))
+    except ValueError:
+        return jsonify({'error': 'Formato de fecha inválido (YYYY-MM-DD)'}), 400
+
+    if current_user.rol == 'comercial':
+        comercial_id = current_user.id
+    else:
+        comercial_id = request.args.get('comercial_id', type=int)
+    instancia = request.args.get('instancia')
+
+    limite = leer_limite(request.args.get('limit'), por_defecto=LIMITE_POR_DEFECTO, maximo=LIMITE_MAXIMO)
+    pagina = max(request.args.get('pagina', 1, type=int), 1)
+    offset = (pagina - 1) * limite
+    if offset >= MAXIMO_RESULTADOS:
+        return jsonify({'error': f'Solo se pueden recorrer los primeros {MAXIMO_RESULTADOS} resultados; refiná la búsqueda'}), 400
+
+    try:
+        respuesta = {'q': consulta, 'pagina': pagina, 'limit': limite}
+
+        if 'whatsapp' in origenes:
+            resultados, hay_mas = buscar_mensajes(consulta, comercial_id, instancia, desde, hasta, limite, offset)
+            respuesta['whatsapp'] = {'resultados': resultados, 'hay_mas': hay_mas}
+
+        # Los mails no tienen instancia: si se filtra por una, no aplican
+        if 'mail' in origenes and not instancia:
+            resultados, hay_mas = buscar_mails(consulta, comercial_id, desde, hasta, limite, offset)
+            respuesta['mail'] = {'resultados': resultados, 'hay_mas': hay_mas}
+
+        return jsonify(respuesta), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
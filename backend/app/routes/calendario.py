@@ -6,6 +6,7 @@ from app import db
 from app.models import Evento, Local, Cliente
 from app.routes.auth import get_current_user_from_token
 from sqlalchemy.orm import joinedload
+from app.utils.etag import etag_tablero, respuesta_no_modificada, con_etag
 
 calendario_bp = Blueprint('calendario', __name__)
 
@@ -22,6 +23,12 @@ def listar_eventos_calendario():
     """
     user = get_current_user()
 
+    # GET condicional: si el tablero no cambió, 304 sin cargar eventos
+    etag = etag_tablero()
+    no_modificada = respuesta_no_modificada(etag)
+    if no_modificada:
+        return no_modificada
+
     # Query base: eventos con fecha_evento y estados relevantes
     query = db.session.query(Evento).options(
         joinedload(Evento.local),
@@ -59,12 +66,12 @@ def listar_eventos_calendario():
             'local_nombre': e.local.nombre if e.local else 'Sin local',
             'local_color': e.local.color if e.local else None,
             'estado': e.estado,
-            'tipo_evento': e.tipo_evento,
+            'tipo_evento': e.tipo,
             'cantidad_personas': e.cantidad_personas,
             'comercial_nombre': e.comercial.nombre if e.comercial else None
         })
 
-    return jsonify(resultado)
+    return con_etag(jsonify(resultado), etag)
 
 
 @calendario_bp.route('/verificar-fecha', methods=['GET'])
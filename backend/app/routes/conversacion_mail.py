@@ -1,8 +1,8 @@
 from flask import Blueprint, request, jsonify
 from app import db
 from app.models import ConversacionMail
-from datetime import datetime
-from sqlalchemy.dialects.mysql import insert
+from datetime import date, time
+from app.utils.timezone import ahora_argentina
 
 conversacion_mail_bp = Blueprint('conversacion_mail', __name__)
 
@@ -14,6 +14,10 @@ def guardar_mensajes():
     Endpoint para guardar mensajes de Gmail con upsert.
     Acepta un array de mensajes. Si el message_id ya existe, actualiza los campos que pueden cambiar.
 
+    N8N re-sincroniza threads completos, así que se guarda en bloque: un IN
+    para saber cuáles existen y un único INSERT multi-fila con upsert. Si el
+    bloque falla se guarda de a uno y los errores quedan en la respuesta 207.
+
     Campos esperados por mensaje:
     - message_id (obligatorio) - ID único del mensaje de Gmail
     - thread_id (obligatorio) - ID del thread de Gmail
@@ -47,80 +51,43 @@ def guardar_mensajes():
         'errores': []
     }
 
+    # Validar campos obligatorios; si un message_id se repite gana el último
+    validos = {}
     for idx, msg in enumerate(mensajes):
+        if not isinstance(msg, dict):
+            resultados['errores'].append(f'Mensaje {idx}: se esperaba un objeto')
+            continue
+        if not msg.get('message_id'):
+            resultados['errores'].append(f'Mensaje {idx}: message_id es requerido')
+            continue
+        if not msg.get('thread_id'):
+            resultados['errores'].append(f'Mensaje {idx}: thread_id es requerido')
+            continue
+        validos.pop(msg['message_id'], None)
+        validos[msg['message_id']] = (idx, msg)
+
+    if validos:
         try:
-            # Validar campos obligatorios
-            message_id = msg.get('message_id')
-            thread_id = msg.get('thread_id')
-
-            if not message_id:
-                resultados['errores'].append(f'Mensaje {idx}: message_id es requerido')
-                continue
-            if not thread_id:
-                resultados['errores'].append(f'Mensaje {idx}: thread_id es requerido')
-                continue
-
-            # Parsear fecha
-            fecha = None
-            if msg.get('fecha'):
-                try:
-                    fecha = datetime.strptime(msg['fecha'], '%Y-%m-%d').date()
-                except:
-                    pass
-
-            # Parsear hora (acepta HH:MM o HH:MM:SS)
-            hora = None
-            if msg.get('hora'):
-                try:
-                    hora_str = msg['hora']
-                    if len(hora_str) == 5:  # HH:MM
-                        hora = datetime.strptime(hora_str, '%H:%M').time()
-                    else:  # HH:MM:SS
-                        hora = datetime.strptime(hora_str, '%H:%M:%S').time()
-                except:
-                    pass
-
-            # Verificar si ya existe
-            existente = ConversacionMail.query.get(message_id)
-
-            if existente:
-                # UPDATE: Actualizar campos que pueden cambiar
-                existente.comercial_email = msg.get('comercial_email') or existente.comercial_email
-                existente.comercial_nombre = msg.get('comercial_nombre') or existente.comercial_nombre
-                # Otros campos generalmente no cambian, pero por si acaso:
-                if msg.get('mensaje'):
-                    existente.mensaje = msg['mensaje']
-                resultados['actualizados'] += 1
-            else:
-                # INSERT: Crear nuevo
-                nuevo_mensaje = ConversacionMail(
-                    message_id=message_id,
-                    thread_id=thread_id,
-                    asunto=msg.get('asunto'),
-                    fecha=fecha,
-                    hora=hora,
-                    de_email=msg.get('de_email'),
-                    de_nombre=msg.get('de_nombre'),
-                    para_email=msg.get('para_email'),
-                    tipo_emisor=msg.get('tipo_emisor', 'cliente'),
-                    mensaje=msg.get('mensaje'),
-                    comercial_email=msg.get('comercial_email'),
-                    comercial_nombre=msg.get('comercial_nombre')
-                )
-                db.session.add(nuevo_mensaje)
-                resultados['insertados'] += 1
-
+            filas = armar_filas([msg for _, msg in validos.values()])
+            existentes = message_ids_existentes(list(validos))
+            try:
+                with db.session.begin_nested():
+                    upsert_mensajes(filas)
+            except Exception as e:
+                # Un mensaje inválido no debe tirar el lote: se reintenta de a uno
+                print(f"[CONVERSACION MAIL] Upsert de {len(filas)} mensajes falló, se guardan de a uno: {e}")
+                filas = upsert_de_a_uno(filas, [idx for idx, _ in validos.values()], resultados['errores'])
+
+            actualizados = sum(1 for fila in filas if fila['message_id'] in existentes)
+            resultados['actualizados'] += actualizados
+            resultados['insertados'] += len(filas) - actualizados
+            db.session.commit()
         except Exception as e:
-            resultados['errores'].append(f'Mensaje {idx}: {str(e)}')
-
-    try:
-        db.session.commit()
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({
-            'error': f'Error guardando en base de datos: {str(e)}',
-            'resultados_parciales': resultados
-        }), 500
+            db.session.rollback()
+            return jsonify({
+                'error': f'Error guardando en base de datos: {str(e)}',
+                'resultados_parciales': resultados
+            }), 500
 
     return jsonify({
         'message': 'Mensajes procesados',
@@ -130,6 +97,96 @@ def guardar_mensajes():
     }), 200 if not resultados['errores'] else 207  # 207 = Multi-Status
 
 
+def _parsear_todos(valores, parsear):
+    """
+    Parsea cada valor distinto una sola vez (un thread re-sincronizado repite
+    las mismas fechas). Los inválidos quedan en None, como antes.
+    """
+    parseados = {}
+    for valor in set(valores):
+        if not valor:
+            continue
+        try:
+            parseados[valor] = parsear(valor)
+        except (TypeError, ValueError):
+            parseados[valor] = None
+    return parseados
+
+
+def armar_filas(mensajes):
+    """Filas listas para el INSERT multi-fila (fecha y hora parseadas en bloque)"""
+    # date/time.fromisoformat aceptan YYYY-MM-DD y HH:MM o HH:MM:SS
+    fechas = _parsear_todos([m.get('fecha') for m in mensajes], date.fromisoformat)
+    horas = _parsear_todos([m.get('hora') for m in mensajes], time.fromisoformat)
+    ahora = ahora_argentina()
+
+    return [{
+        'message_id': msg['message_id'],
+        'thread_id': msg['thread_id'],
+        'asunto': msg.get('asunto'),
+        'fecha': fechas.get(msg.get('fecha')),
+        'hora': horas.get(msg.get('hora')),
+        'de_email': msg.get('de_email'),
+        'de_nombre': msg.get('de_nombre'),
+        'para_email': msg.get('para_email'),
+        'tipo_emisor': msg.get('tipo_emisor', 'cliente'),
+        'mensaje': msg.get('mensaje'),
+        'comercial_email': msg.get('comercial_email'),
+        'comercial_nombre': msg.get('comercial_nombre'),
+        'created_at': ahora,
+    } for msg in mensajes]
+
+
+def message_ids_existentes(message_ids):
+    """Los message_id que ya están guardados (un IN por bloque de 1000)"""
+    existentes = set()
+    for i in range(0, len(message_ids), 1000):
+        existentes.update(db.session.execute(
+            db.select(ConversacionMail.message_id).where(ConversacionMail.message_id.in_(message_ids[i:i + 1000]))
+        ).scalars())
+    return existentes
+
+
+def upsert_mensajes(filas):
+    """
+    INSERT multi-fila con upsert nativo (ON DUPLICATE KEY UPDATE en MySQL,
+    ON CONFLICT en SQLite). En un mensaje existente solo se actualizan
+    comercial_email, comercial_nombre y mensaje, y solo si vienen con valor.
+    """
+    tabla = ConversacionMail.__table__
+    if db.session.get_bind().dialect.name == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(tabla)
+        nuevo = stmt.inserted
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(tabla)
+        nuevo = stmt.excluded
+
+    valores = {
+        campo: db.func.coalesce(db.func.nullif(nuevo[campo], ''), tabla.c[campo])
+        for campo in ('comercial_email', 'comercial_nombre', 'mensaje')
+    }
+    if db.session.get_bind().dialect.name == 'mysql':
+        stmt = stmt.on_duplicate_key_update(**valores)
+    else:
+        stmt = stmt.on_conflict_do_update(index_elements=['message_id'], set_=valores)
+    db.session.execute(stmt, filas)
+
+
+def upsert_de_a_uno(filas, indices, errores):
+    """Guarda cada fila en su savepoint; devuelve las que se guardaron"""
+    guardadas = []
+    for idx, fila in zip(indices, filas):
+        try:
+            with db.session.begin_nested():
+                upsert_mensajes([fila])
+            guardadas.append(fila)
+        except Exception as e:
+            errores.append(f'Mensaje {idx}: {str(e)}')
+    return guardadas
+
+
 # GET /api/conversacion-mail/:thread_id - Obtener mensajes de un thread
 @conversacion_mail_bp.route('/<thread_id>', methods=['GET'])
 def obtener_conversacion(thread_id):
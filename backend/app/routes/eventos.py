@@ -3,9 +3,12 @@ from app import db
 from app.models import Evento, Cliente, Actividad, Usuario, Local, RespuestaMail, EventoTransicion
 from app.routes.auth import get_current_user_from_token
 from sqlalchemy.orm import joinedload
-from sqlalchemy import text
-from datetime import datetime
+from sqlalchemy import text, func, or_, bindparam
+from datetime import datetime, timedelta
+import time
 from app.utils.timezone import ahora_argentina, hoy_argentina
+from app.utils.etag import etag_tablero, respuesta_no_modificada, con_etag
+from app.utils.paginacion import codificar_cursor, decodificar_cursor, filtro_keyset_desc, leer_limite
 
 
 def registrar_transicion(evento, estado_anterior, estado_nuevo, usuario_id=None, origen='manual'):
@@ -21,6 +24,7 @@ def registrar_transicion(evento, estado_anterior, estado_nuevo, usuario_id=None,
     )
     db.session.add(transicion)
     evento.fecha_ultimo_cambio_estado = ahora_argentina()
+    evento.recalcular_sla()
     return transicion
 
 eventos_bp = Blueprint('eventos', __name__)
@@ -97,25 +101,28 @@ def calcular_estado_automatico(evento, es_nuevo=False):
     return estado_actual
 
 # GET /api/eventos - Listar eventos (Kanban)
-@eventos_bp.route('', methods=['GET'])
-def listar_eventos():
-    user = get_current_user()
-
-    # Filtros opcionales
-    estado = request.args.get('estado')
-    comercial_id = request.args.get('comercial_id')
-    local_id = request.args.get('local_id')
-
-    # Usar joinedload para cargar relaciones en una sola query (evita N+1)
-    query = Evento.query.options(
-        joinedload(Evento.cliente),
-        joinedload(Evento.local),
-        joinedload(Evento.comercial)
-    ).filter(Evento.estado != 'ELIMINADO')
+# Cada cuánto vence el ETag del Kanban aunque no haya cambios (sla_info depende de la hora)
+VENTANA_ETAG_SLA_SEGUNDOS = 300
+
+# Columnas del Kanban (en orden)
+ESTADOS_KANBAN = [
+    'CONSULTA_ENTRANTE',
+    'ASIGNADO',
+    'CONTACTADO',
+    'COTIZADO',
+    'APROBADO',
+    'RECHAZADO',
+    'MULTIRESERVA',
+    'CONCLUIDO',
+]
+
+
+def filtrar_eventos_visibles(query, user, comercial_id=None, local_id=None):
+    """Aplica la visibilidad por rol y los filtros opcionales del Kanban"""
+    query = query.filter(Evento.estado != 'ELIMINADO')
 
     # Si es comercial, ve: CONSULTA_ENTRANTE (todos) + sus eventos asignados
     if user and user.rol == 'comercial':
-        from sqlalchemy import or_
         query = query.filter(
             or_(
                 Evento.estado == 'CONSULTA_ENTRANTE',
@@ -123,65 +130,298 @@ def listar_eventos():
             )
         )
     elif comercial_id:
-        query = query.filter_by(comercial_id=comercial_id)
+        query = query.filter(Evento.comercial_id == comercial_id)
 
-    if estado:
-        query = query.filter_by(estado=estado)
     if local_id:
-        query = query.filter_by(local_id=local_id)
+        query = query.filter(Evento.local_id == local_id)
+    return query
 
-    eventos = query.order_by(Evento.created_at.desc()).all()
 
-    # Obtener IDs de eventos con precheck en una sola query
-    eventos_con_precheck = set()
-    if eventos:
-        evento_ids = [e.id for e in eventos]
-        # Query para encontrar eventos que tienen al menos un concepto o adicional
-        result = db.session.execute(text("""
-            SELECT DISTINCT evento_id FROM (
-                SELECT evento_id FROM precheck_conceptos WHERE evento_id IN :ids
-                UNION
-                SELECT evento_id FROM precheck_adicionales WHERE evento_id IN :ids
-            ) AS combined
-        """), {'ids': tuple(evento_ids)})
-        eventos_con_precheck = {row[0] for row in result}
+def serializar_eventos_kanban(eventos):
+    """to_dict + tiene_precheck + sla_info para las tarjetas del Kanban"""
+    if not eventos:
+        return []
 
-    # Agrupar por estado para el Kanban
-    kanban = {
-        'CONSULTA_ENTRANTE': [],
-        'ASIGNADO': [],
-        'CONTACTADO': [],
-        'COTIZADO': [],
-        'APROBADO': [],
-        'RECHAZADO': [],
-        'MULTIRESERVA': [],
-        'CONCLUIDO': [],
-    }
+    # Obtener IDs de eventos con precheck en una sola query
+    evento_ids = [e.id for e in eventos]
+    # Query para encontrar eventos que tienen al menos un concepto o adicional
+    result = db.session.execute(text("""
+        SELECT DISTINCT evento_id FROM (
+            SELECT evento_id FROM precheck_conceptos WHERE evento_id IN :ids
+            UNION
+            SELECT evento_id FROM precheck_adicionales WHERE evento_id IN :ids
+        ) AS combined
+    """).bindparams(bindparam('ids', expanding=True)), {'ids': evento_ids})
+    eventos_con_precheck = {row[0] for row in result}
 
     from app.utils.sla import calcular_sla_evento
 
+    serializados = []
     for evento in eventos:
-        estado = evento.estado
-        if estado in kanban:
-            evento_dict = evento.to_dict()
-            evento_dict['tiene_precheck'] = evento.id in eventos_con_precheck
-            # Calcular SLA solo para estados que lo requieren
-            sla = calcular_sla_evento(evento)
-            if sla and sla['status'] != 'ok':
-                evento_dict['sla_info'] = sla
-            kanban[estado].append(evento_dict)
-
-    # Calcular totales por columna
-    totales = {}
-    for estado, lista in kanban.items():
-        totales[estado] = {
-            'cantidad': len(lista),
-            'monto': sum(e['presupuesto'] or 0 for e in lista)
-        }
+        evento_dict = evento.to_dict()
+        evento_dict['tiene_precheck'] = evento.id in eventos_con_precheck
+        # Calcular SLA solo para estados que lo requieren
+        sla = calcular_sla_evento(evento)
+        if sla and sla['status'] != 'ok':
+            evento_dict['sla_info'] = sla
+        serializados.append(evento_dict)
+    return serializados
+
+
+def calcular_totales_kanban(user, comercial_id=None, local_id=None):
+    """Cantidad y monto por columna con un único GROUP BY estado"""
+    query = filtrar_eventos_visibles(
+        db.session.query(
+            Evento.estado,
+            func.count(Evento.id),
+            func.coalesce(func.sum(Evento.presupuesto), 0)
+        ),
+        user, comercial_id, local_id
+    ).group_by(Evento.estado)
+
+    totales = {estado: {'cantidad': 0, 'monto': 0} for estado in ESTADOS_KANBAN}
+    for estado, cantidad, monto in query.all():
+        if estado in totales:
+            totales[estado] = {'cantidad': cantidad, 'monto': float(monto or 0)}
+    return totales
+
+
+def pagina_columna(user, estado, limite, cursor=None, comercial_id=None, local_id=None):
+    """
+    Una página de una columna del Kanban, keyset sobre (created_at, id) DESC.
+    Retorna (eventos_serializados, siguiente_cursor o None).
+    """
+    query = filtrar_eventos_visibles(
+        Evento.query.options(
+            joinedload(Evento.cliente),
+            joinedload(Evento.local),
+            joinedload(Evento.comercial)
+        ),
+        user, comercial_id, local_id
+    ).filter(Evento.estado == estado)
 
-    return jsonify({
+    if cursor:
+        query = query.filter(filtro_keyset_desc(Evento.created_at, Evento.id, cursor))
+
+    # Se pide una fila extra para saber si hay página siguiente
+    eventos = query.order_by(Evento.created_at.desc(), Evento.id.desc()).limit(limite + 1).all()
+    hay_mas = len(eventos) > limite
+    eventos = eventos[:limite]
+
+    siguiente = codificar_cursor(eventos[-1].created_at, eventos[-1].id) if hay_mas else None
+    return serializar_eventos_kanban(eventos), siguiente
+
+
+@eventos_bp.route('', methods=['GET'])
+def listar_eventos():
+    """
+    Kanban de eventos.
+
+    Sin parámetros de paginación devuelve el tablero completo (comportamiento
+    histórico). Con ?limit=N devuelve las primeras N tarjetas de cada columna
+    y con ?columna=ESTADO&limit=N&cursor=... la página siguiente de una sola
+    columna. Los totales por columna salen siempre de un GROUP BY estado.
+    """
+    user = get_current_user()
+
+    # GET condicional: si el tablero no cambió, 304 sin cargar eventos.
+    # La ventana de SLA hace que el ETag venza para reflejar alertas nuevas.
+    etag = etag_tablero(
+        user.id if user else None,
+        user.rol if user else None,
+        int(time.time() // VENTANA_ETAG_SLA_SEGUNDOS)
+    )
+    no_modificada = respuesta_no_modificada(etag)
+    if no_modificada:
+        return no_modificada
+
+    # Token para /cambios, tomado antes de leer eventos para no perder cambios concurrentes
+    cambios_desde = token_cambios()
+
+    # Filtros opcionales
+    estado = request.args.get('estado')
+    comercial_id = request.args.get('comercial_id')
+    local_id = request.args.get('local_id')
+
+    columna = request.args.get('columna')
+    limit = request.args.get('limit')
+    cursor = request.args.get('cursor')
+
+    if columna or limit:
+        if columna and columna not in ESTADOS_KANBAN:
+            return jsonify({'error': f'Columna inválida: {columna}'}), 400
+        limite = leer_limite(limit)
+        columnas = [columna] if columna else ESTADOS_KANBAN
+
+        kanban = {}
+        cursores = {}
+        try:
+            for estado_columna in columnas:
+                kanban[estado_columna], cursores[estado_columna] = pagina_columna(
+                    user, estado_columna, limite,
+                    cursor=cursor if columna else None,
+                    comercial_id=comercial_id, local_id=local_id
+                )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        return con_etag(jsonify({
+            'kanban': kanban,
+            'cursores': cursores,
+            'totales': calcular_totales_kanban(user, comercial_id, local_id),
+            'cambios_desde': cambios_desde
+        }), etag)
+
+    # Usar joinedload para cargar relaciones en una sola query (evita N+1)
+    query = filtrar_eventos_visibles(
+        Evento.query.options(
+            joinedload(Evento.cliente),
+            joinedload(Evento.local),
+            joinedload(Evento.comercial)
+        ),
+        user, comercial_id, local_id
+    )
+    if estado:
+        query = query.filter_by(estado=estado)
+
+    eventos = [e for e in query.order_by(Evento.created_at.desc()).all() if e.estado in ESTADOS_KANBAN]
+
+    # Agrupar por estado para el Kanban
+    kanban = {estado_columna: [] for estado_columna in ESTADOS_KANBAN}
+    for evento_dict in serializar_eventos_kanban(eventos):
+        kanban[evento_dict['estado']].append(evento_dict)
+
+    totales = calcular_totales_kanban(user, comercial_id, local_id)
+    if estado:
+        # Con filtro de estado solo la columna pedida tiene tarjetas
+        totales = {k: (v if k == estado else {'cantidad': 0, 'monto': 0}) for k, v in totales.items()}
+
+    return con_etag(jsonify({
         'kanban': kanban,
-        'totales': totales
+        'totales': totales,
+        'cambios_desde': cambios_desde
+    }), etag)
+
+# Una fila de cambios_tablero recibe su id al insertarse y se ve al confirmarse:
+# una con id menor que la revisión leída puede no ser visible todavía. Por eso
+# /cambios relee las filas de los últimos segundos anteriores al token.
+# Reenviar un evento sin cambios es inocuo (el patch es idempotente).
+MARGEN_CAMBIOS_SEGUNDOS = 5
+SOLAPE_REVISIONES = 50
+
+# Si hay más cambios que esto, conviene recargar el tablero completo
+MAXIMO_CAMBIOS = 500
+
+
+def token_cambios():
+    """Token para /cambios: momento actual + revisión del tablero"""
+    from app.models_revision import obtener_revision
+    # Se reutiliza el formato de cursor (fecha|entero) con la revisión como entero
+    return codificar_cursor(ahora_argentina(), obtener_revision())
+
+
+def eventos_afectados(cambios):
+    """
+    Ids de eventos cuya tarjeta cambió según filas de cambios_tablero:
+    los eventos tocados (o su precheck) y los de los clientes, locales y
+    comerciales modificados. Retorna None si son más de MAXIMO_CAMBIOS.
+    """
+    ids = set()
+    relacionados = {'Cliente': set(), 'Local': set(), 'Usuario': set()}
+    for fila in cambios:
+        ids.update(fila.get('Evento', []))
+        for modelo, valores in relacionados.items():
+            valores.update(fila.get(modelo, []))
+
+    condiciones = []
+    if relacionados['Cliente']:
+        condiciones.append(Evento.cliente_id.in_(relacionados['Cliente']))
+    if relacionados['Local']:
+        condiciones.append(Evento.local_id.in_(relacionados['Local']))
+    if relacionados['Usuario']:
+        condiciones.append(Evento.comercial_id.in_(relacionados['Usuario']))
+    if condiciones:
+        filas = db.session.query(Evento.id).filter(
+            or_(*condiciones),
+            Evento.estado.in_(ESTADOS_KANBAN)
+        ).limit(MAXIMO_CAMBIOS + 1).all()
+        ids.update(row[0] for row in filas)
+
+    return ids if len(ids) <= MAXIMO_CAMBIOS else None
+
+
+# GET /api/eventos/cambios?desde=<token> - Cambios del Kanban desde un token
+@eventos_bp.route('/cambios', methods=['GET'])
+def listar_cambios():
+    """
+    Patch incremental del Kanban desde el token `desde` (de listar_eventos o
+    de una llamada anterior a /cambios), leído de cambios_tablero.
+
+    Respuesta:
+        hasta: token para la próxima llamada
+        upsert: eventos creados/modificados/movidos visibles en el Kanban
+        eliminar: ids que ya no deben mostrarse (eliminados, borrados, reasignados)
+        totales: totales por columna
+        recargar: True si el token es inválido o viejo, o hay demasiados cambios
+    """
+    from app.models_revision import CambioTablero, RETENCION, obtener_revision
+
+    user = get_current_user()
+    comercial_id = request.args.get('comercial_id')
+    local_id = request.args.get('local_id')
+
+    desde = request.args.get('desde')
+    try:
+        fecha_desde, revision_desde = decodificar_cursor(desde or '')
+    except ValueError:
+        return jsonify({'recargar': True, 'hasta': token_cambios()})
+
+    revision = obtener_revision()
+    hasta = codificar_cursor(ahora_argentina(), revision)
+
+    # Sin cambios en el tablero: no hace falta tocar eventos
+    if revision == revision_desde:
+        return jsonify({'hasta': desde, 'upsert': [], 'eliminar': [], 'recargar': False})
+
+    # Token de antes de la última purga (o de otra base): recargar
+    if revision < revision_desde or fecha_desde < ahora_argentina() - RETENCION:
+        return jsonify({'recargar': True, 'hasta': hasta})
+
+    cambios = db.session.query(CambioTablero.cambios).filter(
+        CambioTablero.id <= revision,
+        or_(
+            CambioTablero.id > revision_desde,
+            db.and_(
+                CambioTablero.id > revision_desde - SOLAPE_REVISIONES,
+                CambioTablero.created_at >= fecha_desde - timedelta(seconds=MARGEN_CAMBIOS_SEGUNDOS)
+            )
+        )
+    ).limit(MAXIMO_CAMBIOS + 1).all()
+    ids_cambiados = eventos_afectados([row[0] for row in cambios]) if len(cambios) <= MAXIMO_CAMBIOS else None
+
+    if ids_cambiados is None:
+        return jsonify({'recargar': True, 'hasta': hasta})
+
+    visibles = []
+    if ids_cambiados:
+        visibles = filtrar_eventos_visibles(
+            Evento.query.options(
+                joinedload(Evento.cliente),
+                joinedload(Evento.local),
+                joinedload(Evento.comercial)
+            ),
+            user, comercial_id, local_id
+        ).filter(
+            Evento.id.in_(ids_cambiados),
+            Evento.estado.in_(ESTADOS_KANBAN)
+        ).all()
+
+    return jsonify({
+        'hasta': hasta,
+        'upsert': serializar_eventos_kanban(visibles),
+        'eliminar': sorted(ids_cambiados - {e.id for e in visibles}),
+        'totales': calcular_totales_kanban(user, comercial_id, local_id),
+        'recargar': False
     })
 
 # GET /api/eventos/eliminados - Listar eventos eliminados (papelera)
@@ -2,15 +2,17 @@
 Rutas API para sistema Pre-Check
 Endpoints para conceptos, adicionales, pagos y resumen
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, redirect, current_app
 from app import db
 from app.models import Evento
 from app.models_precheck import (
     PrecheckConcepto, PrecheckAdicional, PrecheckPago,
     CATEGORIAS_PRECHECK, METODOS_PAGO, calcular_resumen_precheck
 )
-from app.routes.auth import token_required
-from app.utils.storage import subir_archivo, eliminar_archivo, enrich_pago_dict
+from app.routes.auth import token_required, get_current_user_from_token
+from app.utils.storage import subir_archivo, eliminar_archivo, generar_signed_url, MARGEN_RENOVACION
+from app.utils.comprobantes import generar_variantes, rutas_variantes
+from app.utils.links_comprobantes import con_link_comprobante, verificar_link
 from datetime import datetime, date, timedelta
 import uuid
 
@@ -77,7 +79,7 @@ def obtener_precheck(current_user, evento_id):
     # Obtener todos los datos
     conceptos = [c.to_dict() for c in evento.precheck_conceptos.order_by(PrecheckConcepto.categoria, PrecheckConcepto.id)]
     adicionales = [a.to_dict() for a in evento.precheck_adicionales.order_by(PrecheckAdicional.categoria, PrecheckAdicional.id)]
-    pagos = [enrich_pago_dict(p.to_dict()) for p in evento.precheck_pagos.order_by(PrecheckPago.fecha_pago.desc())]
+    pagos = [con_link_comprobante(p.to_dict()) for p in evento.precheck_pagos.order_by(PrecheckPago.fecha_pago.desc())]
     resumen = calcular_resumen_precheck(evento)
 
     # Verificar si es editable
@@ -326,7 +328,7 @@ def agregar_pago(current_user, evento_id):
 
     return jsonify({
         'message': 'Pago agregado',
-        'pago': enrich_pago_dict(pago.to_dict()),
+        'pago': con_link_comprobante(pago.to_dict()),
         'resumen': calcular_resumen_precheck(evento)
     }), 201
 
@@ -367,7 +369,7 @@ def actualizar_pago(current_user, evento_id, pago_id):
 
     return jsonify({
         'message': 'Pago actualizado',
-        'pago': enrich_pago_dict(pago.to_dict()),
+        'pago': con_link_comprobante(pago.to_dict()),
         'resumen': calcular_resumen_precheck(evento)
     }), 200
 
@@ -390,7 +392,7 @@ def eliminar_pago(current_user, evento_id, pago_id):
     # Si tiene comprobante, eliminarlo del bucket
     if pago.comprobante_url:
         try:
-            eliminar_archivo_bucket(pago.comprobante_url)
+            eliminar_archivos_comprobante(pago)
         except Exception as e:
             print(f"Error eliminando comprobante: {e}")
 
@@ -410,6 +412,47 @@ def eliminar_archivo_bucket(blob_path):
     eliminar_archivo(blob_path)
 
 
+def eliminar_archivos_comprobante(pago):
+    """Eliminar del bucket el comprobante y sus versiones reducidas"""
+    for blob_path in (pago.comprobante_url, pago.comprobante_preview, pago.comprobante_thumb):
+        if blob_path:
+            eliminar_archivo_bucket(blob_path)
+
+
+@precheck_bp.route('/comprobante/<int:pago_id>', methods=['GET'])
+def redirigir_comprobante(pago_id):
+    """
+    Redirige (302) a una signed URL del comprobante, cacheada por storage.
+    ?variante=preview|thumb pide la versión reducida (si no existe, el original).
+    <img> y <a> no mandan headers: vale el link firmado que arma
+    con_link_comprobante (?expires=&signature=) o el JWT en Authorization.
+    """
+    variante = request.args.get('variante')
+    if verificar_link(pago_id, variante, request.args.get('expires'), request.args.get('signature')):
+        pago = PrecheckPago.query.get_or_404(pago_id)
+    else:
+        usuario = get_current_user_from_token()
+        if not usuario:
+            return jsonify({'error': 'Link inválido o vencido'}), 401
+        pago = PrecheckPago.query.get_or_404(pago_id)
+        if usuario.rol not in ('admin', 'tesoreria') and pago.evento.comercial_id != usuario.id:
+            return jsonify({'error': 'No tienes acceso a este comprobante'}), 403
+
+    if not pago.comprobante_url:
+        return jsonify({'error': 'El pago no tiene comprobante'}), 404
+
+    variantes = {'preview': pago.comprobante_preview, 'thumb': pago.comprobante_thumb}
+    url = generar_signed_url(variantes.get(variante) or pago.comprobante_url)
+    if not url:
+        return jsonify({'error': 'No se pudo generar el link del comprobante'}), 503
+
+    respuesta = redirect(url, code=302)
+    # La URL servida tiene al menos MARGEN_RENOVACION de validez: el navegador
+    # puede reusar la redirección ese tiempo
+    respuesta.headers['Cache-Control'] = f'private, max-age={int(MARGEN_RENOVACION.total_seconds())}'
+    return respuesta
+
+
 @precheck_bp.route('/<int:evento_id>/pagos/<int:pago_id>/comprobante', methods=['POST'])
 @token_required
 def subir_comprobante(current_user, evento_id, pago_id):
@@ -421,6 +464,13 @@ def subir_comprobante(current_user, evento_id, pago_id):
     if not puede_editar:
         return jsonify({'error': error}), 403
 
+    # Antes de tocar request.files, que lee el cuerpo entero
+    max_bytes = current_app.config['COMPROBANTE_MAX_MB'] * 1024 * 1024
+    if request.content_length is None:
+        return jsonify({'error': 'Falta el tamaño del archivo (Content-Length)'}), 411
+    if request.content_length > max_bytes:
+        return jsonify({'error': f'El archivo supera el máximo de {current_app.config["COMPROBANTE_MAX_MB"]} MB'}), 413
+
     if 'file' not in request.files:
         return jsonify({'error': 'No se envió archivo'}), 400
 
@@ -434,33 +484,48 @@ def subir_comprobante(current_user, evento_id, pago_id):
     if ext not in allowed_extensions:
         return jsonify({'error': f'Extensión no permitida. Usar: {", ".join(allowed_extensions)}'}), 400
 
-    # Si ya tiene comprobante, eliminar el anterior
-    if pago.comprobante_url:
-        try:
-            eliminar_archivo_bucket(pago.comprobante_url)
-        except Exception as e:
-            print(f"Error eliminando comprobante anterior: {e}")
+    # El comprobante anterior se borra recién cuando el nuevo quedó guardado
+    anteriores = [pago.comprobante_url, pago.comprobante_preview, pago.comprobante_thumb]
 
     # Generar nombre único
     filename = f"comprobantes/{evento_id}/{pago_id}_{uuid.uuid4().hex}.{ext}"
+    subidos = []
 
     try:
+        # Preview y thumb se generan del archivo ya recibido (werkzeug lo
+        # pasa a disco si es grande); en PDF o imágenes ilegibles no hay
+        variantes = generar_variantes(file.stream, ext)
+        rutas = rutas_variantes(filename)
+
         # Subir archivo y guardar blob path (NO URL pública)
-        blob_path = subir_archivo(file, filename, content_type=file.content_type)
+        blob_path = subir_archivo(file.stream, filename, content_type=file.content_type)
+        subidos.append(blob_path)
+        for variante, contenido in variantes.items():
+            subidos.append(subir_archivo(contenido, rutas[variante], content_type='image/jpeg'))
 
         # Actualizar pago con el blob path
         pago.comprobante_url = blob_path
         pago.comprobante_nombre = file.filename
+        pago.comprobante_preview = rutas['preview'] if 'preview' in variantes else None
+        pago.comprobante_thumb = rutas['thumb'] if 'thumb' in variantes else None
         db.session.commit()
 
-        return jsonify({
-            'message': 'Comprobante subido',
-            'pago': enrich_pago_dict(pago.to_dict())
-        }), 200
-
     except Exception as e:
+        db.session.rollback()
+        # No dejar huérfanos en el bucket los archivos que llegaron a subirse
+        for path in subidos:
+            eliminar_archivo_bucket(path)
         return jsonify({'error': f'Error subiendo archivo: {str(e)}'}), 500
 
+    for path in anteriores:
+        if path:
+            eliminar_archivo_bucket(path)
+
+    return jsonify({
+        'message': 'Comprobante subido',
+        'pago': con_link_comprobante(pago.to_dict())
+    }), 200
+
 
 @precheck_bp.route('/<int:evento_id>/pagos/<int:pago_id>/comprobante', methods=['DELETE'])
 @token_required
@@ -477,17 +542,19 @@ def eliminar_comprobante(current_user, evento_id, pago_id):
         return jsonify({'error': 'No hay comprobante para eliminar'}), 400
 
     try:
-        eliminar_archivo_bucket(pago.comprobante_url)
+        eliminar_archivos_comprobante(pago)
     except Exception as e:
         print(f"Error eliminando comprobante: {e}")
 
     pago.comprobante_url = None
     pago.comprobante_nombre = None
+    pago.comprobante_preview = None
+    pago.comprobante_thumb = None
     db.session.commit()
 
     return jsonify({
         'message': 'Comprobante eliminado',
-        'pago': enrich_pago_dict(pago.to_dict())
+        'pago': con_link_comprobante(pago.to_dict())
     }), 200
 
 
@@ -573,7 +640,7 @@ def exportar_pdf(current_user, evento_id):
     # Obtener datos
     conceptos = [c.to_dict() for c in evento.precheck_conceptos.order_by(PrecheckConcepto.categoria, PrecheckConcepto.id)]
     adicionales = [a.to_dict() for a in evento.precheck_adicionales.order_by(PrecheckAdicional.categoria, PrecheckAdicional.id)]
-    pagos = [enrich_pago_dict(p.to_dict()) for p in evento.precheck_pagos.order_by(PrecheckPago.fecha_pago.desc())]
+    pagos = [p.to_dict() for p in evento.precheck_pagos.order_by(PrecheckPago.fecha_pago.desc())]
     resumen = calcular_resumen_precheck(evento)
 
     # Generar PDF
@@ -2,11 +2,15 @@ from flask import Blueprint, request, jsonify
 from app import db
 from app.models import Evento, Usuario, Local, Cliente, EventoTransicion
 from app.models_precheck import PrecheckConcepto, PrecheckAdicional, PrecheckPago, calcular_resumen_precheck
-from sqlalchemy import func, case, and_, or_, extract
+from app.models_reportes import ReporteDiario, SIN_LOCAL, SIN_COMERCIAL, SIN_CANAL
+from sqlalchemy import func, case, and_, or_, extract, literal, Numeric
 from sqlalchemy.orm import joinedload
 from datetime import datetime, timedelta
 from decimal import Decimal
+from statistics import median
 from app.utils.timezone import hoy_argentina
+from app.utils.filtros import filtro_rango_fechas
+from app.utils.periodos import inicio_periodo, AGRUPACIONES
 
 reportes_bp = Blueprint('reportes', __name__)
 
@@ -20,13 +24,17 @@ def obtener_reportes():
     - fecha_desde: YYYY-MM-DD (default: 30 días atrás)
     - fecha_hasta: YYYY-MM-DD (default: hoy)
     - tipo_fecha: 'creacion' o 'evento' (default: creacion)
-    - agrupacion: 'diario' o 'semanal' (default: diario)
+    - agrupacion: 'diario', 'semanal', 'mensual' o 'trimestral' (default: diario)
     """
     # Parsear fechas
     fecha_hasta_str = request.args.get('fecha_hasta')
     fecha_desde_str = request.args.get('fecha_desde')
     tipo_fecha = request.args.get('tipo_fecha', 'creacion')
+    if tipo_fecha != 'evento':
+        tipo_fecha = 'creacion'
     agrupacion = request.args.get('agrupacion', 'diario')
+    if agrupacion not in AGRUPACIONES:
+        agrupacion = 'diario'
 
     if fecha_hasta_str:
         fecha_hasta = datetime.strptime(fecha_hasta_str, '%Y-%m-%d').date()
@@ -44,14 +52,14 @@ def obtener_reportes():
     # === KPIs ===
     kpis = calcular_kpis(fecha_desde, fecha_hasta, campo_fecha)
 
-    # === VOLUMEN POR PERÍODO ===
-    volumen_periodo = calcular_volumen_periodo(fecha_desde, fecha_hasta, agrupacion, campo_fecha)
+    # === VOLUMEN POR PERÍODO (desde rollup reporte_diario) ===
+    volumen_periodo = calcular_volumen_periodo(fecha_desde, fecha_hasta, agrupacion, tipo_fecha)
 
     # === CANALES x LOCAL ===
-    canales_local = calcular_canales_local(fecha_desde, fecha_hasta, campo_fecha)
+    canales_local = calcular_canales_local(fecha_desde, fecha_hasta, tipo_fecha)
 
     # === COMERCIALES ===
-    comerciales = calcular_comerciales(fecha_desde, fecha_hasta, campo_fecha)
+    comerciales = calcular_comerciales(fecha_desde, fecha_hasta, tipo_fecha)
 
     # === DISTRIBUCIÓN POR LOCAL (siempre por fecha de carga) ===
     locales_dist = calcular_distribucion_locales(fecha_desde, fecha_hasta, agrupacion)
@@ -119,8 +127,7 @@ def calcular_kpis(fecha_desde, fecha_hasta, campo_fecha=None):
 
     # Filtro base: eventos en el rango de fechas seleccionado (excluye ELIMINADOS)
     filtro_periodo = and_(
-        func.date(campo_fecha) >= fecha_desde,
-        func.date(campo_fecha) <= fecha_hasta,
+        filtro_rango_fechas(campo_fecha, fecha_desde, fecha_hasta),
         Evento.estado != 'ELIMINADO'
     )
 
@@ -141,31 +148,7 @@ def calcular_kpis(fecha_desde, fecha_hasta, campo_fecha=None):
 
     # Facturación cerrada: suma de precheck (conceptos + adicionales + IVA) para
     # eventos APROBADOS/CONCLUIDOS. Si no tienen precheck, usar presupuesto cotizado.
-    eventos_cerrados = Evento.query.filter(
-        filtro_periodo,
-        Evento.estado.in_(['APROBADO', 'CONCLUIDO'])
-    ).all()
-
-    monto_cerrado = Decimal('0')
-    for evento in eventos_cerrados:
-        # Calcular total precheck
-        total_conceptos = db.session.query(
-            func.sum(PrecheckConcepto.cantidad * PrecheckConcepto.precio_unitario)
-        ).filter(PrecheckConcepto.evento_id == evento.id).scalar() or Decimal('0')
-
-        total_adicionales = db.session.query(
-            func.sum(PrecheckAdicional.monto)
-        ).filter(PrecheckAdicional.evento_id == evento.id).scalar() or Decimal('0')
-
-        subtotal_precheck = Decimal(str(total_conceptos)) + Decimal(str(total_adicionales))
-
-        if subtotal_precheck > 0:
-            # Tiene precheck: usar total precheck + IVA si facturada
-            iva = subtotal_precheck * Decimal('0.21') if evento.facturada else Decimal('0')
-            monto_cerrado += subtotal_precheck + iva
-        elif evento.presupuesto:
-            # Sin precheck: fallback al presupuesto cotizado
-            monto_cerrado += Decimal(str(evento.presupuesto))
+    monto_cerrado = calcular_monto_cerrado(filtro_periodo)
 
     # Tasa de cierre
     total_finalizados = cerrados + perdidos
@@ -189,33 +172,80 @@ def calcular_kpis(fecha_desde, fecha_hasta, campo_fecha=None):
     }
 
 
-def calcular_volumen_periodo(fecha_desde, fecha_hasta, agrupacion, campo_fecha=None):
-    """Calcula el volumen de eventos por período (diario o semanal)"""
-    if campo_fecha is None:
-        campo_fecha = Evento.created_at
+def calcular_monto_cerrado(filtro_periodo):
+    """
+    Suma la facturación cerrada (APROBADO/CONCLUIDO) en una sola query.
+
+    Agrupa precheck_conceptos y precheck_adicionales por evento en subqueries
+    y las une a eventos, resolviendo el IVA y el fallback a presupuesto en SQL:
+    - subtotal precheck > 0: subtotal + IVA 21% si facturada
+    - sin precheck (o subtotal <= 0): presupuesto cotizado
+
+    Retorna Decimal (mismo resultado que sumar evento por evento).
+    """
+    conceptos_sq = db.session.query(
+        PrecheckConcepto.evento_id.label('evento_id'),
+        func.sum(PrecheckConcepto.cantidad * PrecheckConcepto.precio_unitario).label('total')
+    ).group_by(PrecheckConcepto.evento_id).subquery()
+
+    adicionales_sq = db.session.query(
+        PrecheckAdicional.evento_id.label('evento_id'),
+        func.sum(PrecheckAdicional.monto).label('total')
+    ).group_by(PrecheckAdicional.evento_id).subquery()
+
+    subtotal = func.coalesce(conceptos_sq.c.total, 0) + func.coalesce(adicionales_sq.c.total, 0)
+    iva = case((Evento.facturada.is_(True), subtotal * literal(Decimal('0.21'), Numeric(4, 2))), else_=0)
+
+    monto_evento = case(
+        (subtotal > 0, subtotal + iva),
+        else_=func.coalesce(Evento.presupuesto, 0)
+    )
+
+    # Numeric sin escala fija: el IVA agrega decimales que no deben redondearse
+    total = db.session.query(
+        func.sum(monto_evento, type_=Numeric())
+    ).select_from(Evento).outerjoin(
+        conceptos_sq, conceptos_sq.c.evento_id == Evento.id
+    ).outerjoin(
+        adicionales_sq, adicionales_sq.c.evento_id == Evento.id
+    ).filter(
+        filtro_periodo,
+        Evento.estado.in_(['APROBADO', 'CONCLUIDO'])
+    ).scalar()
+
+    return Decimal(str(total)) if total is not None else Decimal('0')
 
-    if agrupacion == 'semanal':
-        # Agrupar por semana (lunes)
-        date_trunc = func.date(campo_fecha - func.strftime('%w', campo_fecha) + 1)
-    else:
-        # Agrupar por día
-        date_trunc = func.date(campo_fecha)
+
+def filtro_rollup(fecha_desde, fecha_hasta, tipo_fecha='creacion'):
+    """Filtro base sobre reporte_diario: rango de fechas, tipo de fecha y sin ELIMINADOS"""
+    return and_(
+        ReporteDiario.tipo_fecha == tipo_fecha,
+        filtro_rango_fechas(ReporteDiario.fecha, fecha_desde, fecha_hasta),
+        ReporteDiario.estado != 'ELIMINADO'
+    )
+
+
+def calcular_volumen_periodo(fecha_desde, fecha_hasta, agrupacion, tipo_fecha='creacion'):
+    """Calcula el volumen de eventos por período (diario, semanal, mensual o trimestral)"""
+    campo_fecha = ReporteDiario.fecha
+
+    # Agrupar por día, semana (lunes), mes o trimestre en la base
+    date_trunc = inicio_periodo(campo_fecha, agrupacion)
 
     # Query con conteo por estado (excluye ELIMINADOS)
+    cantidad = ReporteDiario.cantidad
     query = db.session.query(
         date_trunc.label('fecha'),
-        func.count(Evento.id).label('total'),
-        func.sum(case((Evento.estado == 'CONSULTA_ENTRANTE', 1), else_=0)).label('consulta_entrante'),
-        func.sum(case((Evento.estado == 'ASIGNADO', 1), else_=0)).label('asignado'),
-        func.sum(case((Evento.estado == 'CONTACTADO', 1), else_=0)).label('contactado'),
-        func.sum(case((Evento.estado == 'COTIZADO', 1), else_=0)).label('cotizado'),
-        func.sum(case((Evento.estado.in_(['APROBADO', 'CONCLUIDO']), 1), else_=0)).label('aprobado'),
-        func.sum(case((Evento.estado == 'RECHAZADO', 1), else_=0)).label('rechazado'),
+        func.sum(cantidad).label('total'),
+        func.sum(case((ReporteDiario.estado == 'CONSULTA_ENTRANTE', cantidad), else_=0)).label('consulta_entrante'),
+        func.sum(case((ReporteDiario.estado == 'ASIGNADO', cantidad), else_=0)).label('asignado'),
+        func.sum(case((ReporteDiario.estado == 'CONTACTADO', cantidad), else_=0)).label('contactado'),
+        func.sum(case((ReporteDiario.estado == 'COTIZADO', cantidad), else_=0)).label('cotizado'),
+        func.sum(case((ReporteDiario.estado.in_(['APROBADO', 'CONCLUIDO']), cantidad), else_=0)).label('aprobado'),
+        func.sum(case((ReporteDiario.estado == 'RECHAZADO', cantidad), else_=0)).label('rechazado'),
     ).filter(
-        func.date(campo_fecha) >= fecha_desde,
-        func.date(campo_fecha) <= fecha_hasta,
-        Evento.estado != 'ELIMINADO'
-    ).group_by(date_trunc).order_by(date_trunc.desc()).all()
+        filtro_rollup(fecha_desde, fecha_hasta, tipo_fecha)
+    ).group_by(date_trunc).having(func.sum(cantidad) > 0).order_by(date_trunc.desc()).all()
 
     # Calcular totales
     totales = {
@@ -252,24 +282,19 @@ def calcular_volumen_periodo(fecha_desde, fecha_hasta, agrupacion, campo_fecha=N
     }
 
 
-def calcular_canales_local(fecha_desde, fecha_hasta, campo_fecha=None):
+def calcular_canales_local(fecha_desde, fecha_hasta, tipo_fecha='creacion'):
     """Calcula la distribución de canales por local"""
-    if campo_fecha is None:
-        campo_fecha = Evento.created_at
-
     # Obtener locales activos
     locales = Local.query.filter_by(activo=True).all()
 
     # Query de canales con conteo por local (excluye ELIMINADOS)
     query = db.session.query(
-        Evento.canal_origen,
-        Evento.local_id,
-        func.count(Evento.id).label('cantidad')
+        ReporteDiario.canal_origen,
+        ReporteDiario.local_id,
+        func.sum(ReporteDiario.cantidad).label('cantidad')
     ).filter(
-        func.date(campo_fecha) >= fecha_desde,
-        func.date(campo_fecha) <= fecha_hasta,
-        Evento.estado != 'ELIMINADO'
-    ).group_by(Evento.canal_origen, Evento.local_id).all()
+        filtro_rollup(fecha_desde, fecha_hasta, tipo_fecha)
+    ).group_by(ReporteDiario.canal_origen, ReporteDiario.local_id).all()
 
     # Organizar datos
     canales_data = {}
@@ -277,9 +302,11 @@ def calcular_canales_local(fecha_desde, fecha_hasta, campo_fecha=None):
     totales_por_local = {local.id: 0 for local in locales}
 
     for row in query:
-        canal = row.canal_origen or 'sin_canal'
-        local_id = row.local_id
+        canal = row.canal_origen if row.canal_origen != SIN_CANAL else 'sin_canal'
+        local_id = row.local_id if row.local_id != SIN_LOCAL else None
         cantidad = row.cantidad or 0
+        if not cantidad:
+            continue
 
         if canal not in canales_data:
             canales_data[canal] = {'total': 0, 'locales': {}}
@@ -325,117 +352,88 @@ def calcular_canales_local(fecha_desde, fecha_hasta, campo_fecha=None):
     }
 
 
-def calcular_comerciales(fecha_desde, fecha_hasta, campo_fecha=None):
-    """Calcula la carga y performance por comercial"""
-    if campo_fecha is None:
-        campo_fecha = Evento.created_at
+# Estados que se muestran como columnas en el reporte de comerciales
+# (CONCLUIDO se agrupa con APROBADO; MULTIRESERVA y ELIMINADO no cuentan)
+ESTADOS_COMERCIALES = {
+    'CONSULTA_ENTRANTE': 'consulta_entrante',
+    'ASIGNADO': 'asignado',
+    'CONTACTADO': 'contactado',
+    'COTIZADO': 'cotizado',
+    'APROBADO': 'aprobado',
+    'CONCLUIDO': 'aprobado',
+    'RECHAZADO': 'rechazado',
+}
 
-    # Obtener comerciales activos
-    comerciales = Usuario.query.filter_by(activo=True, rol='comercial').all()
 
-    # Query de eventos por comercial y estado (excluye ELIMINADOS)
+def calcular_comerciales(fecha_desde, fecha_hasta, tipo_fecha='creacion'):
+    """
+    Calcula la carga y performance por comercial.
+
+    Una sola query pivot sobre reporte_diario (SUM(CASE estado ...) por
+    comercial, LEFT JOIN usuarios) devuelve conteos, nombre y participación.
+    Se complementa con presupuesto promedio y mediana de horas hasta COTIZADO
+    (desde evento_transiciones), cada uno en una query agregada.
+    """
+    cantidad = ReporteDiario.cantidad
+    total = func.sum(cantidad)
+    total_general = func.sum(total).over()
+
+    columnas_estado = [
+        func.sum(case((ReporteDiario.estado.in_([e for e, c in ESTADOS_COMERCIALES.items() if c == columna]), cantidad),
+                      else_=0)).label(columna)
+        for columna in dict.fromkeys(ESTADOS_COMERCIALES.values())
+    ]
+
     query = db.session.query(
-        Evento.comercial_id,
-        Evento.estado,
-        func.count(Evento.id).label('cantidad')
+        ReporteDiario.comercial_id,
+        Usuario.nombre,
+        *columnas_estado,
+        total.label('total'),
+        func.coalesce(func.round(total * 100.0 / func.nullif(total_general, 0), 1), 0).label('participacion')
+    ).outerjoin(
+        Usuario, Usuario.id == ReporteDiario.comercial_id
     ).filter(
-        func.date(campo_fecha) >= fecha_desde,
-        func.date(campo_fecha) <= fecha_hasta,
-        Evento.estado != 'ELIMINADO'
-    ).group_by(Evento.comercial_id, Evento.estado).all()
+        filtro_rollup(fecha_desde, fecha_hasta, tipo_fecha),
+        ReporteDiario.estado.in_(list(ESTADOS_COMERCIALES.keys()))
+    ).group_by(ReporteDiario.comercial_id, Usuario.nombre).having(total > 0).all()
 
-    # Organizar datos
-    comerciales_data = {}
-
-    # Inicializar con comerciales conocidos
-    for comercial in comerciales:
-        comerciales_data[comercial.id] = {
-            'nombre': comercial.nombre,
-            'consulta_entrante': 0,
-            'asignado': 0,
-            'contactado': 0,
-            'cotizado': 0,
-            'aprobado': 0,
-            'rechazado': 0,
-            'total': 0
-        }
+    columnas = list(dict.fromkeys(ESTADOS_COMERCIALES.values()))
+    vacio = {columna: 0 for columna in columnas}
 
-    # Agregar "En Blanco" para eventos sin comercial
-    comerciales_data[None] = {
-        'nombre': 'Sin asignar',
-        'consulta_entrante': 0,
-        'asignado': 0,
-        'contactado': 0,
-        'cotizado': 0,
-        'aprobado': 0,
-        'rechazado': 0,
-        'total': 0
+    filas_por_comercial = {
+        None: {'comercial_id': None, 'nombre': 'Sin asignar', **vacio, 'total': 0, 'participacion': 0}
     }
-
     for row in query:
-        comercial_id = row.comercial_id
-        estado = row.estado.lower() if row.estado else 'consulta_entrante'
-        cantidad = row.cantidad or 0
-
-        # CONCLUIDO se agrupa con APROBADO
-        if estado == 'concluido':
-            estado = 'aprobado'
-
-        # Ignorar MULTIRESERVA y otros estados no mapeados
-        if estado not in ('consulta_entrante', 'asignado', 'contactado', 'cotizado', 'aprobado', 'rechazado'):
-            continue
+        comercial_id = row.comercial_id if row.comercial_id != SIN_COMERCIAL else None
+        filas_por_comercial[comercial_id] = {
+            'comercial_id': comercial_id,
+            'nombre': 'Sin asignar' if comercial_id is None else (row.nombre or f'ID {comercial_id}'),
+            **{columna: int(getattr(row, columna) or 0) for columna in columnas},
+            'total': int(row.total or 0),
+            'participacion': float(row.participacion or 0)
+        }
 
-        if comercial_id not in comerciales_data:
-            # Comercial no activo o eliminado
-            comercial = Usuario.query.get(comercial_id)
-            comerciales_data[comercial_id] = {
-                'nombre': comercial.nombre if comercial else f'ID {comercial_id}',
-                'consulta_entrante': 0,
-                'asignado': 0,
-                'contactado': 0,
-                'cotizado': 0,
-                'aprobado': 0,
-                'rechazado': 0,
-                'total': 0
+    # Comerciales activos sin eventos en el período también se listan
+    for comercial in Usuario.query.filter_by(activo=True, rol='comercial').all():
+        if comercial.id not in filas_por_comercial:
+            filas_por_comercial[comercial.id] = {
+                'comercial_id': comercial.id, 'nombre': comercial.nombre, **vacio, 'total': 0, 'participacion': 0
             }
 
-        comerciales_data[comercial_id][estado] += cantidad
-        comerciales_data[comercial_id]['total'] += cantidad
+    # Presupuesto promedio y mediana hasta COTIZADO por comercial
+    presupuestos, total_presupuestos = calcular_presupuesto_promedio_comerciales(fecha_desde, fecha_hasta, tipo_fecha)
+    medianas, mediana_general = calcular_mediana_cotizado_comerciales(fecha_desde, fecha_hasta, tipo_fecha)
 
-    # Calcular totales generales
-    totales = {
-        'consulta_entrante': 0,
-        'asignado': 0,
-        'contactado': 0,
-        'cotizado': 0,
-        'aprobado': 0,
-        'rechazado': 0,
-        'total': 0
-    }
-
-    filas = []
-    for comercial_id, data in comerciales_data.items():
-        # Calcular participación
-        total_general = sum(c['total'] for c in comerciales_data.values())
-        participacion = round(data['total'] / total_general * 100, 1) if total_general > 0 else 0
+    filas = list(filas_por_comercial.values())
+    for fila in filas:
+        fila['presupuesto_promedio'] = presupuestos.get(fila['comercial_id'])
+        fila['mediana_horas_cotizado'] = medianas.get(fila['comercial_id'])
 
-        fila = {
-            'comercial_id': comercial_id,
-            'nombre': data['nombre'],
-            'consulta_entrante': data['consulta_entrante'],
-            'asignado': data['asignado'],
-            'contactado': data['contactado'],
-            'cotizado': data['cotizado'],
-            'aprobado': data['aprobado'],
-            'rechazado': data['rechazado'],
-            'total': data['total'],
-            'participacion': participacion
-        }
-        filas.append(fila)
-
-        # Acumular totales
-        for key in totales:
-            totales[key] += data.get(key, 0)
+    # Calcular totales generales
+    totales = {columna: sum(f[columna] for f in filas) for columna in columnas}
+    totales['total'] = sum(f['total'] for f in filas)
+    totales['presupuesto_promedio'] = total_presupuestos
+    totales['mediana_horas_cotizado'] = mediana_general
 
     # Ordenar: Sin asignar primero, luego por total descendente
     filas.sort(key=lambda x: (x['comercial_id'] is not None, -x['total']))
@@ -446,29 +444,96 @@ def calcular_comerciales(fecha_desde, fecha_hasta, campo_fecha=None):
     }
 
 
+def _campo_fecha_evento(tipo_fecha):
+    return Evento.fecha_evento if tipo_fecha == 'evento' else Evento.created_at
+
+
+def calcular_presupuesto_promedio_comerciales(fecha_desde, fecha_hasta, tipo_fecha='creacion'):
+    """
+    Presupuesto promedio por comercial (solo eventos con presupuesto cargado).
+    Retorna ({comercial_id: promedio}, promedio_general).
+    """
+    query = db.session.query(
+        Evento.comercial_id,
+        func.sum(Evento.presupuesto).label('suma'),
+        func.count(Evento.presupuesto).label('cantidad')
+    ).filter(
+        filtro_rango_fechas(_campo_fecha_evento(tipo_fecha), fecha_desde, fecha_hasta),
+        Evento.estado.in_(list(ESTADOS_COMERCIALES.keys())),
+        Evento.presupuesto.isnot(None)
+    ).group_by(Evento.comercial_id).all()
+
+    promedios = {}
+    suma_total = Decimal('0')
+    cantidad_total = 0
+    for row in query:
+        if not row.cantidad:
+            continue
+        suma = Decimal(str(row.suma or 0))
+        promedios[row.comercial_id] = round(float(suma / row.cantidad), 2)
+        suma_total += suma
+        cantidad_total += row.cantidad
+
+    promedio_general = round(float(suma_total / cantidad_total), 2) if cantidad_total else None
+    return promedios, promedio_general
+
+
+def calcular_mediana_cotizado_comerciales(fecha_desde, fecha_hasta, tipo_fecha='creacion'):
+    """
+    Mediana de horas desde la creación del evento hasta su primera transición
+    a COTIZADO, por comercial. La mediana se calcula en Python porque MySQL
+    no tiene MEDIAN; la query trae una fila por evento cotizado.
+    Retorna ({comercial_id: horas}, mediana_general).
+    """
+    primera_cotizacion = db.session.query(
+        EventoTransicion.evento_id.label('evento_id'),
+        func.min(EventoTransicion.created_at).label('fecha_cotizado')
+    ).filter(
+        EventoTransicion.estado_nuevo == 'COTIZADO'
+    ).group_by(EventoTransicion.evento_id).subquery()
+
+    query = db.session.query(
+        Evento.comercial_id,
+        Evento.created_at,
+        primera_cotizacion.c.fecha_cotizado
+    ).join(
+        primera_cotizacion, primera_cotizacion.c.evento_id == Evento.id
+    ).filter(
+        filtro_rango_fechas(_campo_fecha_evento(tipo_fecha), fecha_desde, fecha_hasta),
+        Evento.estado.in_(list(ESTADOS_COMERCIALES.keys()))
+    ).all()
+
+    horas_por_comercial = {}
+    todas = []
+    for row in query:
+        if not row.created_at or not row.fecha_cotizado:
+            continue
+        horas = max((row.fecha_cotizado - row.created_at).total_seconds(), 0) / 3600
+        horas_por_comercial.setdefault(row.comercial_id, []).append(horas)
+        todas.append(horas)
+
+    medianas = {cid: round(median(valores), 1) for cid, valores in horas_por_comercial.items()}
+    return medianas, (round(median(todas), 1) if todas else None)
+
+
 def calcular_distribucion_locales(fecha_desde, fecha_hasta, agrupacion='diario'):
     """
     Tabla cruzada: filas = fechas de carga (created_at), columnas = locales.
     Siempre usa fecha de carga para medir efectividad de pauta.
     """
     # Siempre fecha de carga
-    campo_fecha = Evento.created_at
+    campo_fecha = ReporteDiario.fecha
 
-    if agrupacion == 'semanal':
-        date_trunc = func.date(campo_fecha - func.strftime('%w', campo_fecha) + 1)
-    else:
-        date_trunc = func.date(campo_fecha)
+    date_trunc = inicio_periodo(campo_fecha, agrupacion)
 
     # Query: fecha x local_id -> cantidad (excluye ELIMINADOS)
     query = db.session.query(
         date_trunc.label('fecha'),
-        Evento.local_id,
-        func.count(Evento.id).label('cantidad')
+        ReporteDiario.local_id,
+        func.sum(ReporteDiario.cantidad).label('cantidad')
     ).filter(
-        func.date(campo_fecha) >= fecha_desde,
-        func.date(campo_fecha) <= fecha_hasta,
-        Evento.estado != 'ELIMINADO'
-    ).group_by(date_trunc, Evento.local_id).all()
+        filtro_rollup(fecha_desde, fecha_hasta, 'creacion')
+    ).group_by(date_trunc, ReporteDiario.local_id).having(func.sum(ReporteDiario.cantidad) > 0).all()
 
     # Obtener locales activos para nombres/colores
     locales_db = Local.query.filter_by(activo=True).order_by(Local.nombre).all()
@@ -480,7 +545,7 @@ def calcular_distribucion_locales(fecha_desde, fecha_hasta, agrupacion='diario')
 
     for row in query:
         fecha = row.fecha if isinstance(row.fecha, str) else row.fecha.isoformat() if row.fecha else None
-        local_id = row.local_id
+        local_id = row.local_id if row.local_id != SIN_LOCAL else None
         cantidad = row.cantidad or 0
 
         local_ids_vistos.add(local_id)
@@ -604,8 +669,7 @@ def calcular_flujo_pagos(fecha_desde, fecha_hasta, local_id=None):
     ).filter(
         Evento.estado.in_(['APROBADO', 'CONCLUIDO']),
         Evento.fecha_evento.isnot(None),
-        Evento.fecha_evento >= fecha_desde,
-        Evento.fecha_evento <= fecha_hasta
+        filtro_rango_fechas(Evento.fecha_evento, fecha_desde, fecha_hasta)
     )
 
     if local_id:
@@ -740,8 +804,7 @@ def calcular_resumen_saldos(fecha_desde, fecha_hasta, local_id=None):
     ).filter(
         Evento.estado.in_(['APROBADO', 'CONCLUIDO']),
         Evento.fecha_evento.isnot(None),
-        Evento.fecha_evento >= fecha_desde,
-        Evento.fecha_evento <= fecha_hasta
+        filtro_rango_fechas(Evento.fecha_evento, fecha_desde, fecha_hasta)
     )
 
     if local_id:
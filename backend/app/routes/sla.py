@@ -9,10 +9,12 @@ from app import db
 from app.models import Evento, Usuario
 from app.models_sla import SlaViolation
 from app.routes.auth import get_current_user_from_token
-from app.utils.sla import calcular_sla_evento, SLA_CONFIG
+from app.utils.fechas_sql import segundos_entre
 from app.utils.timezone import ahora_argentina
+from app.utils.filtros import filtro_rango_fechas
 from sqlalchemy.orm import joinedload
-from datetime import datetime
+from sqlalchemy import func, case, or_, exists, select, insert, literal
+import time
 
 sla_bp = Blueprint('sla', __name__)
 
@@ -22,63 +24,57 @@ def obtener_notificaciones():
     """
     Obtener resumen de alertas SLA para el usuario actual.
     Comerciales ven solo sus eventos; admins ven todos.
+
+    Usa los vencimientos precalculados: los totales salen de un único COUNT
+    sobre sla_alerta_at <= ahora y solo se cargan los 50 más urgentes.
     """
     try:
         user = get_current_user_from_token()
+        ahora = ahora_argentina()
 
-        estados_con_sla = list(SLA_CONFIG.keys())
-
-        query = Evento.query.options(
-            joinedload(Evento.cliente),
-            joinedload(Evento.comercial)
-        ).filter(Evento.estado.in_(estados_con_sla))
+        filtros = [Evento.sla_alerta_at <= ahora]
 
         # Comerciales solo ven sus eventos + CONSULTA_ENTRANTE sin asignar
         if user and user.rol == 'comercial':
-            from sqlalchemy import or_
-            query = query.filter(
-                or_(
-                    Evento.comercial_id == user.id,
-                    Evento.comercial_id.is_(None)
-                )
-            )
-
-        eventos = query.all()
-
-        alertas = []
-        criticos = []
+            filtros.append(or_(
+                Evento.comercial_id == user.id,
+                Evento.comercial_id.is_(None)
+            ))
+
+        es_critico = Evento.sla_critico_at <= ahora
+        total, total_criticos = db.session.query(
+            func.count(Evento.id),
+            func.coalesce(func.sum(case((es_critico, 1), else_=0)), 0)
+        ).filter(*filtros).one()
+        total_criticos = int(total_criticos)
+
+        # Críticos primero, luego alertas; dentro de cada grupo el más antiguo primero. Máximo 50.
+        fecha_ref = func.coalesce(Evento.fecha_ultimo_cambio_estado, Evento.created_at)
+        eventos = Evento.query.options(
+            joinedload(Evento.cliente),
+            joinedload(Evento.comercial),
+            joinedload(Evento.local)
+        ).filter(*filtros).order_by(
+            case((es_critico, 0), else_=1), fecha_ref.asc()
+        ).limit(50).all()
 
+        todos = []
         for evento in eventos:
-            sla = calcular_sla_evento(evento)
-            if not sla or sla['status'] == 'ok':
-                continue
-
-            item = {
+            fecha_ultimo = evento.fecha_ultimo_cambio_estado or evento.created_at
+            todos.append({
                 'id': evento.id,
                 'titulo_display': evento.titulo or evento.generar_titulo_auto(),
                 'estado': evento.estado,
-                'sla_status': sla['status'],
-                'segundos': sla['segundos'],
+                'sla_status': 'critico' if evento.sla_critico_at <= ahora else 'alerta',
+                'segundos': int((ahora - fecha_ultimo).total_seconds()) if fecha_ultimo else 0,
                 'comercial_nombre': evento.comercial.nombre if evento.comercial else None,
                 'cliente_nombre': evento.cliente.nombre if evento.cliente else None,
-            }
-
-            if sla['status'] == 'critico':
-                criticos.append(item)
-            else:
-                alertas.append(item)
-
-        # Ordenar por tiempo transcurrido (más urgente primero)
-        criticos.sort(key=lambda x: x['segundos'], reverse=True)
-        alertas.sort(key=lambda x: x['segundos'], reverse=True)
-
-        # Críticos primero, luego alertas. Máximo 50.
-        todos = (criticos + alertas)[:50]
+            })
 
         return jsonify({
-            'total_alertas': len(alertas),
-            'total_criticos': len(criticos),
-            'total': len(alertas) + len(criticos),
+            'total_alertas': total - total_criticos,
+            'total_criticos': total_criticos,
+            'total': total,
             'eventos': todos,
         }), 200
 
@@ -89,45 +85,66 @@ def obtener_notificaciones():
 @sla_bp.route('/check-violations', methods=['POST'])
 def check_violations():
     """
-    Cron job: escanea eventos activos y registra violaciones SLA críticas.
+    Cron job: registra violaciones SLA críticas.
     Diseñado para ejecutarse diariamente via Cloud Scheduler.
+
+    Cantidad fija de round trips sin importar el backlog: un COUNT de eventos
+    críticos y un INSERT IGNORE ... SELECT con anti-join contra las
+    violaciones ya registradas (clave única evento_id + estado).
     """
     try:
-        estados_con_sla = list(SLA_CONFIG.keys())
-        eventos = Evento.query.filter(
-            Evento.estado.in_(estados_con_sla)
-        ).all()
-
-        nuevas = 0
-        for evento in eventos:
-            sla = calcular_sla_evento(evento)
-            if not sla or sla['status'] != 'critico':
-                continue
-
-            # Verificar si ya existe violación para este evento en este estado
-            existe = SlaViolation.query.filter_by(
-                evento_id=evento.id,
-                estado=evento.estado
-            ).first()
-
-            if not existe:
-                violacion = SlaViolation(
-                    evento_id=evento.id,
-                    estado=evento.estado,
-                    comercial_id=evento.comercial_id,
-                    comercial_nombre=evento.comercial.nombre if evento.comercial else None,
-                    fecha_violacion=ahora_argentina(),
-                    segundos_transcurridos=sla['segundos'],
-                )
-                db.session.add(violacion)
-                nuevas += 1
-
+        t_inicio = time.perf_counter()
+        ahora = ahora_argentina()
+
+        es_critico = Evento.sla_critico_at <= ahora
+        # Críticos al momento del COUNT (con o sin violación ya registrada);
+        # el INSERT ... SELECT corre aparte y solo inserta los que faltan
+        eventos_escaneados = db.session.query(func.count(Evento.id)).filter(es_critico).scalar()
+        t_conteo = time.perf_counter()
+
+        ya_registrada = exists().where(
+            SlaViolation.evento_id == Evento.id,
+            SlaViolation.estado == Evento.estado
+        )
+        fecha_ref = func.coalesce(Evento.fecha_ultimo_cambio_estado, Evento.created_at)
+        criticos_sin_violacion = select(
+            Evento.id,
+            Evento.estado,
+            Evento.comercial_id,
+            Usuario.nombre,
+            literal(ahora),
+            segundos_entre(fecha_ref, literal(ahora)),
+            literal(ahora)
+        ).select_from(Evento).outerjoin(
+            Usuario, Usuario.id == Evento.comercial_id
+        ).where(es_critico, ~ya_registrada)
+
+        resultado = db.session.execute(
+            insert(SlaViolation.__table__)
+            .prefix_with('IGNORE', dialect='mysql')
+            .prefix_with('OR IGNORE', dialect='sqlite')
+            .from_select(
+                ['evento_id', 'estado', 'comercial_id', 'comercial_nombre',
+                 'fecha_violacion', 'segundos_transcurridos', 'created_at'],
+                criticos_sin_violacion
+            )
+        )
+        nuevas = max(resultado.rowcount or 0, 0)
         db.session.commit()
+        t_fin = time.perf_counter()
+
+        tiempos = {
+            'conteo_ms': round((t_conteo - t_inicio) * 1000, 1),
+            'insercion_ms': round((t_fin - t_conteo) * 1000, 1),
+            'total_ms': round((t_fin - t_inicio) * 1000, 1),
+        }
+        print(f"[SLA] check-violations: {nuevas} nuevas de {eventos_escaneados} críticos en {tiempos['total_ms']} ms")
 
         return jsonify({
             'status': 'ok',
             'nuevas_violaciones': nuevas,
-            'eventos_escaneados': len(eventos),
+            'eventos_escaneados': eventos_escaneados,
+            'tiempos': tiempos,
         }), 200
 
     except Exception as e:
@@ -155,12 +172,8 @@ def listar_violations():
             joinedload(SlaViolation.evento)
         )
 
-        if fecha_desde_str:
-            fecha_desde = datetime.strptime(fecha_desde_str, '%Y-%m-%d')
-            query = query.filter(SlaViolation.fecha_violacion >= fecha_desde)
-        if fecha_hasta_str:
-            fecha_hasta = datetime.strptime(fecha_hasta_str, '%Y-%m-%d').replace(hour=23, minute=59, second=59)
-            query = query.filter(SlaViolation.fecha_violacion <= fecha_hasta)
+        if fecha_desde_str or fecha_hasta_str:
+            query = query.filter(filtro_rango_fechas(SlaViolation.fecha_violacion, fecha_desde_str, fecha_hasta_str))
         if comercial_id:
             query = query.filter_by(comercial_id=comercial_id)
 
@@ -0,0 +1,141 @@
+"""
+Canal push por Server-Sent Events.
+
+GET /api/stream?token=<token> mantiene la conexión abierta y envía los
+mensajes de app/utils/pubsub.py dirigidos al usuario: movimientos del Kanban
+(kanban), mensajes de WhatsApp (whatsapp), pagos en REVISION (tesoreria) y
+cambios de estado SLA (sla).
+
+EventSource no permite headers, así que el token va en la query string y
+termina en los logs de acceso. Por eso no se usa el JWT de sesión: el cliente
+pide a POST /api/stream/token un token que vence en TOKEN_STREAM_SEGUNDOS y
+solo sirve para abrir el stream.
+"""
+import json
+import queue
+import threading
+import time
+from flask import Blueprint, Response, request, jsonify, current_app
+from app import db
+from app.models import Evento
+from app.routes.auth import token_required, create_purpose_token, get_user_from_purpose_token
+from app.utils.pubsub import obtener_backend, es_destinatario
+from app.utils.timezone import ahora_argentina
+
+stream_bp = Blueprint('stream', __name__)
+
+# Cada cuánto se manda un comentario para que proxies no corten la conexión
+INTERVALO_HEARTBEAT = 15
+
+# Cada cuánto el monitor recalcula estados SLA (uno por proceso, no por pestaña)
+INTERVALO_MONITOR_SLA = 60
+
+# Vida del token de stream: alcanza para abrir la conexión, no para reusarlo
+TOKEN_STREAM_SEGUNDOS = 60
+
+
+@stream_bp.route('/token', methods=['POST'])
+@token_required
+def token_stream(current_user):
+    """Token de un solo propósito para abrir /api/stream"""
+    return jsonify({
+        'token': create_purpose_token(current_user.id, 'stream', TOKEN_STREAM_SEGUNDOS),
+        'expira_en': TOKEN_STREAM_SEGUNDOS,
+    })
+
+
+@stream_bp.route('', methods=['GET'])
+def stream():
+    usuario = get_user_from_purpose_token(request.args.get('token', ''), 'stream')
+    if not usuario:
+        return jsonify({'error': 'No autenticado'}), 401
+
+    # Se copian los datos del usuario: el generador no usa la sesión de DB
+    usuario_id, rol = usuario.id, usuario.rol
+    backend = obtener_backend()
+    iniciar_monitor_sla(current_app._get_current_object())
+    cola = backend.suscribir()
+
+    def generar():
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    mensaje = cola.get(timeout=INTERVALO_HEARTBEAT)
+                except queue.Empty:
+                    yield ': ping\n\n'
+                    continue
+                if not es_destinatario(mensaje, usuario_id, rol):
+                    continue
+                yield f"id: {mensaje['id']}\nevent: {mensaje['tipo']}\ndata: {json.dumps(mensaje['datos'])}\n\n"
+        finally:
+            backend.desuscribir(cola)
+
+    return Response(generar(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+
+# ==================== MONITOR SLA ====================
+
+_monitor_lock = threading.Lock()
+_monitor_hilo = None
+
+
+def iniciar_monitor_sla(app):
+    """Arranca (una vez por proceso) el hilo que detecta cambios de estado SLA"""
+    global _monitor_hilo
+    with _monitor_lock:
+        if _monitor_hilo and _monitor_hilo.is_alive():
+            return
+        _monitor_hilo = threading.Thread(target=_monitor_sla, args=(app,), name='monitor-sla', daemon=True)
+        _monitor_hilo.start()
+
+
+def estados_sla_actuales():
+    """{evento_id: (status, comercial_id)} de los eventos en alerta o crítico"""
+    ahora = ahora_argentina()
+    filas = db.session.query(
+        Evento.id, Evento.comercial_id, Evento.sla_critico_at <= ahora
+    ).filter(Evento.sla_alerta_at <= ahora).all()
+    return {
+        evento_id: ('critico' if es_critico else 'alerta', comercial_id)
+        for evento_id, comercial_id, es_critico in filas
+    }
+
+
+def _monitor_sla(app):
+    anteriores = None
+    while True:
+        try:
+            backend = obtener_backend_de(app)
+            if backend.cantidad_suscriptores() == 0:
+                # Sin conexiones abiertas no hace falta escanear
+                anteriores = None
+            else:
+                with app.app_context():
+                    actuales = estados_sla_actuales()
+                    db.session.remove()
+                if anteriores is not None:
+                    for evento_id in set(actuales) | set(anteriores):
+                        nuevo = actuales.get(evento_id, ('ok', None))
+                        previo = anteriores.get(evento_id, ('ok', None))
+                        if nuevo[0] != previo[0]:
+                            comercial_id = nuevo[1] or previo[1]
+                            # Cada instancia avisa solo a sus propias conexiones
+                            backend.publicar_local('sla', {
+                                'evento_id': evento_id,
+                                'status': nuevo[0],
+                                'status_anterior': previo[0],
+                            }, usuarios=[comercial_id] if comercial_id else None,
+                                roles=['admin'] if comercial_id else None)
+                anteriores = actuales
+        except Exception as e:
+            print(f"[STREAM] Error en monitor SLA: {e}")
+        time.sleep(INTERVALO_MONITOR_SLA)
+
+
+def obtener_backend_de(app):
+    with app.app_context():
+        return obtener_backend()
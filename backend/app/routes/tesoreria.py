@@ -3,106 +3,167 @@ Rutas API para panel de Tesorería
 Endpoints para validar/rechazar pagos del pre-check
 """
 from flask import Blueprint, request, jsonify
+from sqlalchemy import func
+from sqlalchemy.orm import contains_eager, joinedload
 from app import db
 from app.models import Evento, Usuario
 from app.models_precheck import PrecheckPago
 from app.routes.auth import token_required
+from app.utils.links_comprobantes import con_link_comprobante
 from app.utils.timezone import ahora_argentina
-from app.utils.storage import enrich_pago_dict
+from app.utils.paginacion import codificar_cursor, filtro_keyset_asc, filtro_keyset_desc, leer_limite
 from decimal import Decimal
 from datetime import datetime, timedelta
 
 tesoreria_bp = Blueprint('tesoreria', __name__)
 
+# Validados/rechazados: si no se pide validacion_desde, los de los últimos N días
+DIAS_HISTORIAL = 30
+
+# Filtros ?<nombre>_desde= / ?<nombre>_hasta= (YYYY-MM-DD, ambos inclusive)
+CAMPOS_FECHA = {
+    'deposito': PrecheckPago.fecha_deposito,
+    'acreditacion': PrecheckPago.fecha_acreditacion,
+    'carga': PrecheckPago.created_at,
+    'validacion': PrecheckPago.fecha_validacion,
+}
+
 
 def verificar_acceso_tesoreria(usuario):
     """Solo admin y tesoreria pueden acceder"""
     return usuario.rol in ('admin', 'tesoreria')
 
 
+def _filtros_fecha(args):
+    """
+    Condiciones de los filtros de fecha de la query string.
+    Lanza ValueError si una fecha no es YYYY-MM-DD.
+    """
+    condiciones = []
+    for nombre, campo in CAMPOS_FECHA.items():
+        desde, hasta = args.get(f'{nombre}_desde'), args.get(f'{nombre}_hasta')
+        es_datetime = isinstance(campo.type, db.DateTime)
+        if desde:
+            desde = datetime.strptime(desde, '%Y-%m-%d')
+            condiciones.append(campo >= (desde if es_datetime else desde.date()))
+        if hasta:
+            hasta = datetime.strptime(hasta, '%Y-%m-%d')
+            condiciones.append(campo < hasta + timedelta(days=1) if es_datetime else campo <= hasta.date())
+    return condiciones
+
+
+def _serializar_pago(pago):
+    evento = pago.evento
+    return con_link_comprobante({
+        **pago.to_dict(),
+        'evento_titulo': evento.titulo or evento.generar_titulo_auto(),
+        'cliente_nombre': evento.cliente.nombre if evento.cliente else None,
+        'local_nombre': evento.local.nombre if evento.local else None,
+        'comercial_nombre': evento.comercial.nombre if evento.comercial else None,
+    })
+
+
+def listar_pagos(estado, campo_orden, ascendente, args):
+    """
+    Una página de pagos del estado, keyset sobre (campo_orden, id).
+
+    Query params:
+        limit (default 50, máximo 200), cursor (siguiente_cursor de la página anterior)
+        deposito_desde/hasta, acreditacion_desde/hasta, carga_desde/hasta,
+        validacion_desde/hasta: YYYY-MM-DD, ambos inclusive
+
+    Los pagos se traen con su evento (contains_eager sobre el join) y el
+    cliente, local, comercial y validador del pago (joinedload) en una sola
+    query, sin importar cuántas filas haya. Además una query agregada da el
+    total y el monto de todo lo filtrado.
+
+    Lanza ValueError si un filtro o el cursor son inválidos.
+    """
+    condiciones = [PrecheckPago.estado == estado] + _filtros_fecha(args)
+    if estado != 'REVISION' and not args.get('validacion_desde'):
+        condiciones.append(PrecheckPago.fecha_validacion >= ahora_argentina() - timedelta(days=DIAS_HISTORIAL))
+
+    query = PrecheckPago.query.join(PrecheckPago.evento).filter(*condiciones).options(
+        contains_eager(PrecheckPago.evento).joinedload(Evento.cliente),
+        contains_eager(PrecheckPago.evento).joinedload(Evento.local),
+        contains_eager(PrecheckPago.evento).joinedload(Evento.comercial),
+        joinedload(PrecheckPago.validado_por),
+    )
+
+    cursor = args.get('cursor')
+    if cursor:
+        filtro = filtro_keyset_asc if ascendente else filtro_keyset_desc
+        query = query.filter(filtro(campo_orden, PrecheckPago.id, cursor))
+    if ascendente:
+        query = query.order_by(campo_orden.asc(), PrecheckPago.id.asc())
+    else:
+        query = query.order_by(campo_orden.desc(), PrecheckPago.id.desc())
+
+    # Se pide una fila extra para saber si hay página siguiente
+    limite = leer_limite(args.get('limit'))
+    pagos = query.limit(limite + 1).all()
+    hay_mas = len(pagos) > limite
+    pagos = pagos[:limite]
+
+    total, monto_total = db.session.query(
+        func.count(PrecheckPago.id), func.coalesce(func.sum(PrecheckPago.monto), 0)
+    ).filter(*condiciones).one()
+
+    return {
+        'pagos': [_serializar_pago(pago) for pago in pagos],
+        'total': total,
+        'monto_total': float(monto_total),
+        'siguiente_cursor': codificar_cursor(getattr(pagos[-1], campo_orden.key), pagos[-1].id) if hay_mas else None,
+    }
+
+
 @tesoreria_bp.route('/pagos-pendientes', methods=['GET'])
 @token_required
 def obtener_pagos_pendientes(current_user):
-    """Lista pagos con estado REVISION, ordenados por fecha_pago ASC"""
+    """
+    Lista pagos con estado REVISION, ordenados por fecha_pago ASC (paginado).
+    total_pendientes y monto_total cubren todo lo filtrado, no solo la página.
+    """
     if not verificar_acceso_tesoreria(current_user):
         return jsonify({'error': 'Acceso no autorizado'}), 403
 
-    pagos = PrecheckPago.query.filter_by(estado='REVISION') \
-        .join(Evento, PrecheckPago.evento_id == Evento.id) \
-        .order_by(PrecheckPago.fecha_pago.asc()) \
-        .all()
-
-    result = []
-    for pago in pagos:
-        evento = pago.evento
-        result.append(enrich_pago_dict({
-            **pago.to_dict(),
-            'evento_titulo': evento.titulo or evento.generar_titulo_auto(),
-            'cliente_nombre': evento.cliente.nombre if evento.cliente else None,
-            'local_nombre': evento.local.nombre if evento.local else None,
-            'comercial_nombre': evento.comercial.nombre if evento.comercial else None,
-        }))
+    try:
+        resultado = listar_pagos('REVISION', PrecheckPago.fecha_pago, True, request.args)
+    except ValueError as e:
+        return jsonify({'error': f'Filtro inválido: {e}'}), 400
 
-    return jsonify({
-        'pagos': result,
-        'total_pendientes': len(result)
-    }), 200
+    resultado['total_pendientes'] = resultado['total']
+    return jsonify(resultado), 200
 
 
 @tesoreria_bp.route('/pagos-validados', methods=['GET'])
 @token_required
 def obtener_pagos_validados(current_user):
-    """Lista pagos VALIDADO de los últimos 30 días"""
+    """Lista pagos VALIDADO (por defecto de los últimos 30 días), fecha_validacion DESC (paginado)"""
     if not verificar_acceso_tesoreria(current_user):
         return jsonify({'error': 'Acceso no autorizado'}), 403
 
-    hace_30_dias = ahora_argentina() - timedelta(days=30)
-
-    pagos = PrecheckPago.query.filter(
-        PrecheckPago.estado == 'VALIDADO',
-        PrecheckPago.fecha_validacion >= hace_30_dias
-    ).order_by(PrecheckPago.fecha_validacion.desc()).all()
-
-    result = []
-    for pago in pagos:
-        evento = pago.evento
-        result.append(enrich_pago_dict({
-            **pago.to_dict(),
-            'evento_titulo': evento.titulo or evento.generar_titulo_auto(),
-            'cliente_nombre': evento.cliente.nombre if evento.cliente else None,
-            'local_nombre': evento.local.nombre if evento.local else None,
-            'comercial_nombre': evento.comercial.nombre if evento.comercial else None,
-        }))
+    try:
+        resultado = listar_pagos('VALIDADO', PrecheckPago.fecha_validacion, False, request.args)
+    except ValueError as e:
+        return jsonify({'error': f'Filtro inválido: {e}'}), 400
 
-    return jsonify({'pagos': result}), 200
+    return jsonify(resultado), 200
 
 
 @tesoreria_bp.route('/pagos-rechazados', methods=['GET'])
 @token_required
 def obtener_pagos_rechazados(current_user):
-    """Lista pagos RECHAZADO de los últimos 30 días"""
+    """Lista pagos RECHAZADO (por defecto de los últimos 30 días), fecha_validacion DESC (paginado)"""
     if not verificar_acceso_tesoreria(current_user):
         return jsonify({'error': 'Acceso no autorizado'}), 403
 
-    hace_30_dias = ahora_argentina() - timedelta(days=30)
-
-    pagos = PrecheckPago.query.filter(
-        PrecheckPago.estado == 'RECHAZADO',
-        PrecheckPago.fecha_validacion >= hace_30_dias
-    ).order_by(PrecheckPago.fecha_validacion.desc()).all()
-
-    result = []
-    for pago in pagos:
-        evento = pago.evento
-        result.append(enrich_pago_dict({
-            **pago.to_dict(),
-            'evento_titulo': evento.titulo or evento.generar_titulo_auto(),
-            'cliente_nombre': evento.cliente.nombre if evento.cliente else None,
-            'local_nombre': evento.local.nombre if evento.local else None,
-            'comercial_nombre': evento.comercial.nombre if evento.comercial else None,
-        }))
+    try:
+        resultado = listar_pagos('RECHAZADO', PrecheckPago.fecha_validacion, False, request.args)
+    except ValueError as e:
+        return jsonify({'error': f'Filtro inválido: {e}'}), 400
 
-    return jsonify({'pagos': result}), 200
+    return jsonify(resultado), 200
 
 
 @tesoreria_bp.route('/pagos/<int:pago_id>/validar', methods=['PUT'])
@@ -149,7 +210,7 @@ def validar_pago(current_user, pago_id):
 
     return jsonify({
         'message': 'Pago validado correctamente',
-        'pago': enrich_pago_dict(pago.to_dict())
+        'pago': con_link_comprobante(pago.to_dict())
     }), 200
 
 
@@ -182,5 +243,5 @@ def rechazar_pago(current_user, pago_id):
 
     return jsonify({
         'message': 'Pago rechazado',
-        'pago': enrich_pago_dict(pago.to_dict())
+        'pago': con_link_comprobante(pago.to_dict())
     }), 200
@@ -2,25 +2,24 @@
 Rutas para webhook de Evolution API (WhatsApp)
 Completamente separadas del CRM de eventos
 """
-from flask import Blueprint, request, jsonify
+import json
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
+from sqlalchemy.orm import joinedload
 from datetime import datetime, timezone, timedelta
 from app import db
-from app.utils.timezone import ahora_argentina, AR_TIMEZONE
-from app.models import Usuario
-from app.models_whatsapp import WAContacto, WAConversacion, WAMensaje
-from app.utils.whatsapp_utils import normalizar_numero_argentino, whatsapp_jid_a_numero
+from app.utils.timezone import ahora_argentina
+from app.models_whatsapp import WAContacto, WAConversacion, WAMensaje, WAWebhookPendiente, LIMITE_MENSAJES_DETALLE
+from app.routes.auth import get_current_user_from_token
+from app.utils.whatsapp_utils import normalizar_numero_argentino
+from app.utils.whatsapp_ingesta import (
+    parsear_payload, guardar_mensaje, guardar_mensajes, reconciliar_contadores, estadisticas_caches
+)
+from app.utils.whatsapp_cola import encolar, estadisticas_cola, reencolar_fallidos, drenar_cola
+from app.utils.paginacion import codificar_cursor, filtro_keyset_desc, leer_limite
+from app.models_whatsapp_stats import leer_stats, reconciliar_stats
 
 whatsapp_bp = Blueprint('whatsapp', __name__)
 
-# Mapeo instancia Evolution API -> telefono del vendedor
-INSTANCIA_TELEFONO = {
-    'vendedora_juana': '5491122905495',
-    'vendedora_delfina': '5491140504258',
-    'vendedora_traiana': '5491131642113',
-    'vendedora_ignacio': '5491128394047',
-    'whatsapp_nuevo': '5491156574088',
-}
-
 
 @whatsapp_bp.route('/test', methods=['GET'])
 def test_webhook():
@@ -53,6 +52,15 @@ def webhook_evolution():
             "messageTimestamp": 1707398765
         }
     }
+
+    `data` también puede traer varios mensajes (lista o {"messages": [...]},
+    ej: messages.set del history sync); en ese caso se guardan con
+    guardar_mensajes() en una cantidad fija de queries.
+
+    Por defecto (WHATSAPP_INGESTA=async) solo valida, guarda el payload en la
+    cola webhook_pendientes y responde 202; los workers de
+    app/utils/whatsapp_cola.py lo procesan. Con WHATSAPP_INGESTA=sync se
+    procesa dentro del request como antes.
     """
     try:
         data = request.get_json()
@@ -61,157 +69,36 @@ def webhook_evolution():
             return jsonify({'status': 'error', 'message': 'No data received'}), 400
 
         event = data.get('event')
-        instance = data.get('instance', 'whatsapp_nuevo')
-        message_data = data.get('data', {})
 
-        # Solo procesar eventos de mensajes nuevos
-        if event != 'messages.upsert':
+        # Solo procesar eventos de mensajes nuevos o sincronización de historial
+        if event not in ('messages.upsert', 'messages.set'):
             return jsonify({'status': 'ignored', 'reason': f'not a message event: {event}'}), 200
 
-        # Extraer datos del mensaje
-        key = message_data.get('key', {})
-        remote_jid = key.get('remoteJid')
-        from_me = key.get('fromMe', False)
-        mensaje_id = key.get('id')
-
-        # Validar datos mínimos
-        if not remote_jid or not mensaje_id:
-            return jsonify({'status': 'error', 'message': 'Missing remoteJid or mensaje_id'}), 400
-
-        # Ignorar mensajes de grupos (terminan en @g.us)
-        if remote_jid.endswith('@g.us'):
-            return jsonify({'status': 'ignored', 'reason': 'group message'}), 200
-
-        # Extraer texto del mensaje según el tipo
-        message = message_data.get('message', {})
-        texto = None
-        tipo_mensaje = 'text'
-        tiene_multimedia = False
-        multimedia_url = None
-
-        if 'conversation' in message:
-            texto = message['conversation']
-        elif 'extendedTextMessage' in message:
-            texto = message['extendedTextMessage'].get('text', '')
-        elif 'imageMessage' in message:
-            tipo_mensaje = 'image'
-            texto = message['imageMessage'].get('caption', '[Imagen]')
-            tiene_multimedia = True
-        elif 'audioMessage' in message:
-            tipo_mensaje = 'audio'
-            texto = '[Audio]'
-            tiene_multimedia = True
-        elif 'videoMessage' in message:
-            tipo_mensaje = 'video'
-            texto = message['videoMessage'].get('caption', '[Video]')
-            tiene_multimedia = True
-        elif 'documentMessage' in message:
-            tipo_mensaje = 'document'
-            texto = message['documentMessage'].get('fileName', '[Documento]')
-            tiene_multimedia = True
-        elif 'stickerMessage' in message:
-            tipo_mensaje = 'sticker'
-            texto = '[Sticker]'
-        elif 'contactMessage' in message:
-            tipo_mensaje = 'contact'
-            texto = '[Contacto]'
-        elif 'locationMessage' in message:
-            tipo_mensaje = 'location'
-            texto = '[Ubicación]'
-
-        # Timestamp
-        timestamp = message_data.get('messageTimestamp', 0)
-        if isinstance(timestamp, str):
-            timestamp = int(timestamp)
-        fecha_mensaje = datetime.fromtimestamp(timestamp, tz=AR_TIMEZONE).replace(tzinfo=None) if timestamp else ahora_argentina()
-
-        # Normalizar número
-        numero = whatsapp_jid_a_numero(remote_jid)
-        numero_normalizado = normalizar_numero_argentino(numero)
+        validos, descartados = parsear_payload(data)
+        if not validos:
+            if descartados:
+                return jsonify(descartados[0][0]), descartados[0][1]
+            return jsonify({'status': 'ignored', 'reason': 'no messages'}), 200
 
-        if not numero_normalizado:
-            return jsonify({'status': 'error', 'message': 'Could not normalize phone number'}), 400
-
-        # 1. Buscar o crear contacto
-        contacto = WAContacto.query.filter_by(numero_normalizado=numero_normalizado).first()
-
-        if not contacto:
-            contacto = WAContacto(
-                numero_original=numero,
-                numero_normalizado=numero_normalizado,
-                numero_whatsapp=remote_jid,
-                estado='nuevo'
-            )
-            db.session.add(contacto)
-            db.session.flush()
-
-        # 2. Identificar vendedor CRM por instancia
-        telefono_vendedor = INSTANCIA_TELEFONO.get(instance)
-        usuario_crm = None
-        if telefono_vendedor:
-            usuario_crm = Usuario.query.filter_by(telefono=telefono_vendedor).first()
-
-        # 3. Buscar o crear conversación (clave: contacto + remote_jid + instancia)
-        conversacion = WAConversacion.query.filter_by(
-            contacto_id=contacto.id,
-            remote_jid=remote_jid,
-            instancia_nombre=instance
-        ).first()
-
-        if not conversacion:
-            conversacion = WAConversacion(
-                contacto_id=contacto.id,
-                remote_jid=remote_jid,
-                instancia_nombre=instance,
-                usuario_id=usuario_crm.id if usuario_crm else None,
-                vendedor_numero=telefono_vendedor or '',
-                vendedor_nombre=usuario_crm.nombre if usuario_crm else 'Vendedor'
-            )
-            db.session.add(conversacion)
-            db.session.flush()
-
-        # 4. Verificar si el mensaje ya existe (evitar duplicados)
-        mensaje_existente = WAMensaje.query.filter_by(mensaje_id=mensaje_id).first()
-
-        if mensaje_existente:
-            return jsonify({'status': 'duplicate', 'mensaje_id': mensaje_id}), 200
-
-        # 5. Guardar mensaje
-        nuevo_mensaje = WAMensaje(
-            conversacion_id=conversacion.id,
-            mensaje_id=mensaje_id,
-            texto=texto,
-            tipo_mensaje=tipo_mensaje,
-            es_enviado=from_me,
-            from_me=from_me,
-            numero_remitente=remote_jid,
-            timestamp=timestamp,
-            fecha_mensaje=fecha_mensaje,
-            tiene_multimedia=tiene_multimedia,
-            multimedia_url=multimedia_url,
-            mensaje_completo_json=message_data
-        )
-        db.session.add(nuevo_mensaje)
-
-        # 6. Actualizar contadores de conversación
-        if from_me:
-            conversacion.mensajes_enviados = (conversacion.mensajes_enviados or 0) + 1
+        if current_app.config.get('WHATSAPP_INGESTA', 'async') == 'async':
+            pendiente_id = encolar(data)
+            return jsonify({
+                'status': 'queued',
+                'cola_id': pendiente_id,
+                'mensaje_id': validos[0]['mensaje_id'] if len(validos) == 1 else None,
+                'mensajes': len(validos)
+            }), 202
+
+        if len(validos) == 1 and not descartados:
+            resultado = guardar_mensaje(validos[0])
+            if resultado['status'] == 'duplicate':
+                return jsonify(resultado), 200
         else:
-            conversacion.mensajes_recibidos = (conversacion.mensajes_recibidos or 0) + 1
-
-        conversacion.total_mensajes = (conversacion.total_mensajes or 0) + 1
-        conversacion.ultima_actividad = fecha_mensaje
+            resultado = guardar_mensajes(validos)
+            resultado['descartados'] = len(descartados)
 
         db.session.commit()
-
-        return jsonify({
-            'status': 'success',
-            'contacto_id': contacto.id,
-            'conversacion_id': conversacion.id,
-            'mensaje_id': mensaje_id,
-            'tipo': tipo_mensaje,
-            'from_me': from_me
-        }), 200
+        return jsonify(resultado), 200
 
     except Exception as e:
         db.session.rollback()
@@ -221,28 +108,187 @@ def webhook_evolution():
         return jsonify({'status': 'error', 'error': str(e)}), 500
 
 
+@whatsapp_bp.route('/cola/stats', methods=['GET'])
+def obtener_estadisticas_cola():
+    """Métricas de la cola del webhook: pendientes por estado, demora y backpressure."""
+    try:
+        return jsonify(estadisticas_cola()), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@whatsapp_bp.route('/cache/stats', methods=['GET'])
+def obtener_estadisticas_cache():
+    """Hits/misses de los caches de vendedor por instancia y contacto por número (de este proceso)."""
+    try:
+        return jsonify({'caches': estadisticas_caches()}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@whatsapp_bp.route('/cola/fallidos', methods=['GET'])
+def listar_fallidos_cola():
+    """Payloads que agotaron los reintentos (estado 'error'), más recientes primero."""
+    try:
+        limit = min(request.args.get('limit', 50, type=int), 200)
+        fallidos = WAWebhookPendiente.query.filter_by(estado='error').order_by(
+            WAWebhookPendiente.id.desc()
+        ).limit(limit).all()
+        return jsonify({'fallidos': [f.to_dict() for f in fallidos]}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@whatsapp_bp.route('/cola/reintentar', methods=['POST'])
+def reintentar_fallidos_cola():
+    """
+    Reencola payloads fallidos. Body opcional: {"ids": [1, 2, 3]}
+    (sin ids se reencolan todos). Solo admins.
+    """
+    user = get_current_user_from_token()
+    if not user or user.rol != 'admin':
+        return jsonify({'error': 'Solo administradores'}), 403
+
+    try:
+        ids = (request.get_json(silent=True) or {}).get('ids')
+        reencolados = reencolar_fallidos(ids)
+        return jsonify({'status': 'ok', 'reencolados': reencolados}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@whatsapp_bp.route('/cola/drenar', methods=['POST'])
+def drenar_cola_webhook():
+    """
+    Endpoint para cron job (Cloud Scheduler).
+    Devuelve a la cola los payloads abandonados en 'procesando', procesa los
+    pendientes dentro del request y arranca los workers de la instancia.
+    Ejecutar cada pocos minutos: cubre deploys y instancias sin CPU en segundo plano.
+    """
+    try:
+        resultado = drenar_cola()
+        if resultado['payloads'] or resultado['liberados']:
+            print(f"[WHATSAPP COLA] Drenaje: {resultado['payloads']} payloads en {resultado['lotes']} lotes, {resultado['liberados']} liberados")
+        return jsonify({
+            'status': 'ok',
+            'fecha_ejecucion': ahora_argentina().isoformat(),
+            **resultado,
+            'cola': estadisticas_cola()['por_estado'],
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@whatsapp_bp.route('/conversaciones/reconciliar-contadores', methods=['POST'])
+def reconciliar_contadores_conversaciones():
+    """
+    Endpoint para cron job (Cloud Scheduler).
+    Recalcula total_mensajes / mensajes_enviados / mensajes_recibidos desde
+    la tabla mensajes y corrige las conversaciones desfasadas.
+    Ejecutar diariamente; la ingesta suma los contadores en SQL sin leerlos.
+    """
+    try:
+        corregidas = reconciliar_contadores()
+        db.session.commit()
+        if corregidas:
+            print(f"[WHATSAPP] Contadores reconciliados en {len(corregidas)} conversaciones")
+        return jsonify({
+            'message': f'{len(corregidas)} conversaciones corregidas',
+            'fecha_ejecucion': ahora_argentina().isoformat(),
+            'conversaciones': corregidas[:100]
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+def ultimos_mensajes(conversacion_ids):
+    """
+    {conversacion_id: WAMensaje} con el último mensaje de cada conversación,
+    en una sola query (ROW_NUMBER por conversación sobre idx_mensajes_conv_timestamp).
+    """
+    if not conversacion_ids:
+        return {}
+    orden = db.func.row_number().over(
+        partition_by=WAMensaje.conversacion_id,
+        order_by=(WAMensaje.timestamp.desc(), WAMensaje.id.desc())
+    ).label('orden')
+    ranking = db.session.query(WAMensaje.id, orden).filter(
+        WAMensaje.conversacion_id.in_(conversacion_ids)
+    ).subquery()
+    mensajes = WAMensaje.query.join(ranking, ranking.c.id == WAMensaje.id).filter(ranking.c.orden == 1).all()
+    return {m.conversacion_id: m for m in mensajes}
+
+
+@whatsapp_bp.route('/stats/reconciliar', methods=['POST'])
+def reconciliar_estadisticas():
+    """
+    Endpoint para cron job (Cloud Scheduler).
+    Recalcula los contadores de wa_stats desde contactos, conversaciones y
+    mensajes (fila base exacta, shards en cero). Ejecutar cada hora; corrige
+    desvíos del mantenimiento incremental. Reemplaza al viejo GET /stats?exact=1.
+    """
+    try:
+        stats = reconciliar_stats()
+        db.session.commit()
+        return jsonify({
+            'message': 'Contadores de WhatsApp reconciliados',
+            'fecha_ejecucion': ahora_argentina().isoformat(),
+            'stats': stats.to_dict()
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
 @whatsapp_bp.route('/conversaciones', methods=['GET'])
 def obtener_conversaciones():
     """
-    Obtener todas las conversaciones.
-    Query params opcionales: estado (abierta, cerrada, archivada)
+    Obtener conversaciones, más recientes primero, paginadas por cursor.
+    Query params opcionales:
+        estado (abierta, cerrada, archivada; default abierta)
+        usuario_id, instancia_nombre
+        limit (default 50, máximo 200)
+        cursor (siguiente_cursor de la página anterior)
+
+    Siempre 2 queries: conversaciones + contacto (JOIN) y últimos mensajes (ventana).
     """
     try:
         estado = request.args.get('estado', 'abierta')
+        usuario_id = request.args.get('usuario_id', type=int)
+        instancia_nombre = request.args.get('instancia_nombre')
+        limite = leer_limite(request.args.get('limit'))
+        cursor = request.args.get('cursor')
 
-        query = WAConversacion.query
+        query = WAConversacion.query.options(joinedload(WAConversacion.contacto))
 
         if estado:
             query = query.filter_by(estado=estado)
-
-        conversaciones = query.order_by(WAConversacion.ultima_actividad.desc()).all()
+        if usuario_id:
+            query = query.filter_by(usuario_id=usuario_id)
+        if instancia_nombre:
+            query = query.filter_by(instancia_nombre=instancia_nombre)
+        if cursor:
+            try:
+                query = query.filter(filtro_keyset_desc(WAConversacion.ultima_actividad, WAConversacion.id, cursor))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+
+        # Se pide una fila de más para saber si hay página siguiente
+        conversaciones = query.order_by(
+            WAConversacion.ultima_actividad.desc(), WAConversacion.id.desc()
+        ).limit(limite + 1).all()
+        hay_mas = len(conversaciones) > limite
+        conversaciones = conversaciones[:limite]
+
+        ultimos = ultimos_mensajes([conv.id for conv in conversaciones])
 
         resultado = []
         for conv in conversaciones:
             contacto = conv.contacto
-            ultimo_mensaje = WAMensaje.query.filter_by(
-                conversacion_id=conv.id
-            ).order_by(WAMensaje.timestamp.desc()).first()
+            ultimo_mensaje = ultimos.get(conv.id)
 
             resultado.append({
                 'id': conv.id,
@@ -252,22 +298,26 @@ def obtener_conversaciones():
                     'numero': contacto.numero_normalizado,
                     'estado': contacto.estado
                 },
+                'usuario_id': conv.usuario_id,
+                'instancia_nombre': conv.instancia_nombre,
                 'total_mensajes': conv.total_mensajes,
                 'mensajes_enviados': conv.mensajes_enviados,
                 'mensajes_recibidos': conv.mensajes_recibidos,
                 'ultima_actividad': conv.ultima_actividad.isoformat() if conv.ultima_actividad else None,
                 'estado': conv.estado,
                 'ultimo_mensaje': {
-                    'texto': ultimo_mensaje.texto if ultimo_mensaje else None,
-                    'fecha': ultimo_mensaje.fecha_mensaje.isoformat() if ultimo_mensaje else None,
-                    'es_enviado': ultimo_mensaje.es_enviado if ultimo_mensaje else None,
-                    'tipo': ultimo_mensaje.tipo_mensaje if ultimo_mensaje else None
+                    'texto': ultimo_mensaje.texto,
+                    'fecha': ultimo_mensaje.fecha_mensaje.isoformat(),
+                    'es_enviado': ultimo_mensaje.es_enviado,
+                    'tipo': ultimo_mensaje.tipo_mensaje
                 } if ultimo_mensaje else None
             })
 
+        ultima = conversaciones[-1] if conversaciones else None
         return jsonify({
             'conversaciones': resultado,
-            'total': len(resultado)
+            'total': len(resultado),
+            'siguiente_cursor': codificar_cursor(ultima.ultima_actividad, ultima.id) if hay_mas else None
         }), 200
 
     except Exception as e:
@@ -276,15 +326,70 @@ def obtener_conversaciones():
 
 @whatsapp_bp.route('/conversacion/<int:conversacion_id>', methods=['GET'])
 def obtener_conversacion(conversacion_id):
-    """Obtener detalle de una conversación con todos sus mensajes."""
+    """
+    Obtener detalle de una conversación con una página de sus mensajes.
+    Query params opcionales:
+        limit (default 50, máximo 200)
+        before (siguiente_before de la página anterior, mensajes más viejos)
+        formato=ndjson: exporta el historial completo (ver exportar_conversacion_ndjson)
+    """
     try:
         conversacion = WAConversacion.query.get_or_404(conversacion_id)
-        return jsonify(conversacion.to_dict(include_mensajes=True)), 200
+
+        if request.args.get('formato') == 'ndjson':
+            return exportar_conversacion_ndjson(conversacion)
+
+        limite = leer_limite(request.args.get('limit'), por_defecto=LIMITE_MENSAJES_DETALLE)
+        try:
+            data = conversacion.to_dict(include_mensajes=True, limite_mensajes=limite,
+                                        before=request.args.get('before'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify(data), 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+# Mensajes por query al exportar (keyset, nunca se arma la lista completa)
+LOTE_EXPORTACION = 1000
+
+
+def exportar_conversacion_ndjson(conversacion):
+    """
+    Historial completo en NDJSON (una línea JSON por registro), en orden
+    cronológico: primero la cabecera de la conversación y después un mensaje
+    por línea. Se lee en lotes por keyset (timestamp, id) y se va enviando,
+    así la memoria no depende del tamaño del chat.
+    """
+    cabecera = conversacion.to_dict()
+    conversacion_id = conversacion.id
+
+    def generar():
+        yield json.dumps({'tipo': 'conversacion', 'datos': cabecera}, ensure_ascii=False) + '\n'
+        ultimo = None
+        while True:
+            query = WAMensaje.query.filter(WAMensaje.conversacion_id == conversacion_id)
+            if ultimo:
+                query = query.filter(db.or_(
+                    WAMensaje.timestamp > ultimo[0],
+                    db.and_(WAMensaje.timestamp == ultimo[0], WAMensaje.id > ultimo[1])
+                ))
+            lote = query.order_by(WAMensaje.timestamp.asc(), WAMensaje.id.asc()).limit(LOTE_EXPORTACION).all()
+            for mensaje in lote:
+                yield json.dumps({'tipo': 'mensaje', 'datos': mensaje.to_dict()}, ensure_ascii=False) + '\n'
+            if len(lote) < LOTE_EXPORTACION:
+                break
+            ultimo = (lote[-1].timestamp, lote[-1].id)
+            # Suelta los objetos del lote anterior
+            db.session.expunge_all()
+
+    return Response(stream_with_context(generar()), mimetype='application/x-ndjson', headers={
+        'Content-Disposition': f'attachment; filename="conversacion_{conversacion_id}.ndjson"',
+        'X-Accel-Buffering': 'no',
+    })
+
+
 @whatsapp_bp.route('/conversacion/<int:conversacion_id>/mensajes', methods=['GET'])
 def obtener_mensajes_conversacion(conversacion_id):
     """
@@ -552,35 +657,14 @@ def obtener_conversacion_por_numero(numero):
 
 @whatsapp_bp.route('/stats', methods=['GET'])
 def obtener_estadisticas():
-    """Obtener estadísticas generales del sistema de WhatsApp."""
+    """
+    Obtener estadísticas generales del sistema de WhatsApp.
+    Suma las filas de contadores de wa_stats (solo lectura). Para recalcularlos
+    exactos: POST /webhook/stats/reconciliar.
+    """
     try:
-        total_contactos = WAContacto.query.count()
-        contactos_nuevos = WAContacto.query.filter_by(estado='nuevo').count()
-        contactos_clientes = WAContacto.query.filter_by(es_cliente=True).count()
-
-        total_conversaciones = WAConversacion.query.count()
-        conversaciones_abiertas = WAConversacion.query.filter_by(estado='abierta').count()
-
-        total_mensajes = WAMensaje.query.count()
-        mensajes_recibidos = WAMensaje.query.filter_by(es_enviado=False).count()
-        mensajes_enviados = WAMensaje.query.filter_by(es_enviado=True).count()
-
-        return jsonify({
-            'contactos': {
-                'total': total_contactos,
-                'nuevos': contactos_nuevos,
-                'clientes': contactos_clientes
-            },
-            'conversaciones': {
-                'total': total_conversaciones,
-                'abiertas': conversaciones_abiertas
-            },
-            'mensajes': {
-                'total': total_mensajes,
-                'recibidos': mensajes_recibidos,
-                'enviados': mensajes_enviados
-            }
-        }), 200
+        stats = leer_stats()
+        return jsonify(stats.to_dict()), 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
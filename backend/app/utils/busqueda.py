@@ -0,0 +1,226 @@
+"""
+Búsqueda de texto completo sobre mensajes de WhatsApp y mails de Gmail.
+
+- MySQL: índices FULLTEXT (ft_mensajes_texto y ft_conversacion_mail_asunto_mensaje)
+  con MATCH ... AGAINST en modo lenguaje natural; el puntaje es la relevancia.
+- SQLite (desarrollo): índice invertido local con tablas FTS5 de contenido
+  externo (busqueda_mensajes, busqueda_mails) que se mantienen con triggers,
+  así también cubren los INSERT multi-fila de la ingesta. Puntaje: -bm25().
+
+Cada origen se pagina por separado: los puntajes de dos índices distintos no
+son comparables entre sí.
+"""
+import re
+import unicodedata
+from datetime import datetime, timedelta
+from sqlalchemy import text, func, literal_column, exists, table, column
+from app import db
+from app.models import Evento, ConversacionMail
+from app.models_whatsapp import WAMensaje, WAConversacion, WAContacto
+
+# Resultados por página y tope de resultados navegables por origen
+LIMITE_POR_DEFECTO = 20
+LIMITE_MAXIMO = 50
+MAXIMO_RESULTADOS = 500
+
+# Caracteres de contexto a cada lado del término encontrado
+LARGO_FRAGMENTO = 80
+
+_TABLAS_FTS_SQLITE = {
+    'busqueda_mensajes': [
+        "CREATE VIRTUAL TABLE busqueda_mensajes USING fts5(texto, content='mensajes', content_rowid='id')",
+        "CREATE TRIGGER IF NOT EXISTS busqueda_mensajes_ai AFTER INSERT ON mensajes BEGIN "
+        "INSERT INTO busqueda_mensajes(rowid, texto) VALUES (new.id, new.texto); END",
+        "CREATE TRIGGER IF NOT EXISTS busqueda_mensajes_ad AFTER DELETE ON mensajes BEGIN "
+        "INSERT INTO busqueda_mensajes(busqueda_mensajes, rowid, texto) VALUES ('delete', old.id, old.texto); END",
+        "CREATE TRIGGER IF NOT EXISTS busqueda_mensajes_au AFTER UPDATE OF texto ON mensajes BEGIN "
+        "INSERT INTO busqueda_mensajes(busqueda_mensajes, rowid, texto) VALUES ('delete', old.id, old.texto); "
+        "INSERT INTO busqueda_mensajes(rowid, texto) VALUES (new.id, new.texto); END",
+    ],
+    'busqueda_mails': [
+        "CREATE VIRTUAL TABLE busqueda_mails USING fts5(asunto, mensaje, content='conversacion_mail')",
+        "CREATE TRIGGER IF NOT EXISTS busqueda_mails_ai AFTER INSERT ON conversacion_mail BEGIN "
+        "INSERT INTO busqueda_mails(rowid, asunto, mensaje) VALUES (new.rowid, new.asunto, new.mensaje); END",
+        "CREATE TRIGGER IF NOT EXISTS busqueda_mails_ad AFTER DELETE ON conversacion_mail BEGIN "
+        "INSERT INTO busqueda_mails(busqueda_mails, rowid, asunto, mensaje) "
+        "VALUES ('delete', old.rowid, old.asunto, old.mensaje); END",
+        "CREATE TRIGGER IF NOT EXISTS busqueda_mails_au AFTER UPDATE OF asunto, mensaje ON conversacion_mail BEGIN "
+        "INSERT INTO busqueda_mails(busqueda_mails, rowid, asunto, mensaje) "
+        "VALUES ('delete', old.rowid, old.asunto, old.mensaje); "
+        "INSERT INTO busqueda_mails(rowid, asunto, mensaje) VALUES (new.rowid, new.asunto, new.mensaje); END",
+    ],
+}
+
+
+def configurar_busqueda(engine):
+    """
+    En SQLite crea (una vez) las tablas FTS5 y sus triggers, e indexa lo que
+    ya existía. En MySQL no hace nada: los índices FULLTEXT se declaran en
+    los modelos y en migrations/add_busqueda_fulltext.py.
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+    with engine.begin() as conn:
+        existentes = {fila[0] for fila in conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'busqueda_%'"
+        ))}
+        for nombre, sentencias in _TABLAS_FTS_SQLITE.items():
+            if nombre in existentes:
+                continue
+            for sentencia in sentencias:
+                conn.execute(text(sentencia))
+            conn.execute(text(f"INSERT INTO {nombre}({nombre}) VALUES ('rebuild')"))
+
+
+def _sin_acentos(texto):
+    return ''.join(c for c in unicodedata.normalize('NFD', texto) if unicodedata.category(c) != 'Mn')
+
+
+def terminos_de(consulta):
+    """Palabras de la consulta, sin signos (los operadores no llegan al motor)"""
+    return re.findall(r'\w+', consulta.lower())
+
+
+def fragmento(texto, terminos):
+    """Recorte del texto alrededor del primer término encontrado"""
+    if not texto:
+        return ''
+    plano = _sin_acentos(texto.lower())
+    posiciones = [plano.find(_sin_acentos(t)) for t in terminos]
+    posiciones = [p for p in posiciones if p >= 0]
+    inicio = max(min(posiciones) - LARGO_FRAGMENTO, 0) if posiciones else 0
+    fin = inicio + 2 * LARGO_FRAGMENTO
+    return ('…' if inicio > 0 else '') + texto[inicio:fin] + ('…' if fin < len(texto) else '')
+
+
+def _es_mysql():
+    return db.session.get_bind().dialect.name == 'mysql'
+
+
+def _busqueda(tabla_fts, columnas_mysql, terminos, columna_rowid):
+    """
+    (puntaje, condición) para el motor actual. En SQLite además devuelve la
+    tabla FTS y su condición de join.
+    """
+    if _es_mysql():
+        from sqlalchemy.dialects.mysql import match
+        puntaje = match(*columnas_mysql, against=' '.join(terminos)).in_natural_language_mode()
+        return puntaje, puntaje > 0, None
+
+    fts = table(tabla_fts, column('rowid'))
+    consulta_fts = ' OR '.join(f'"{t}"' for t in terminos)
+    puntaje = -func.bm25(literal_column(tabla_fts))
+    condicion = text(f"{tabla_fts} MATCH :consulta_{tabla_fts}").bindparams(**{f'consulta_{tabla_fts}': consulta_fts})
+    return puntaje, condicion, (fts, fts.c.rowid == columna_rowid)
+
+
+def _rango_fechas(desde, hasta):
+    """date/None -> (datetime desde, datetime hasta exclusivo)"""
+    inicio = datetime.combine(desde, datetime.min.time()) if desde else None
+    fin = datetime.combine(hasta + timedelta(days=1), datetime.min.time()) if hasta else None
+    return inicio, fin
+
+
+def buscar_mensajes(consulta, comercial_id=None, instancia=None, desde=None, hasta=None,
+                    limite=LIMITE_POR_DEFECTO, offset=0):
+    """Mensajes de WhatsApp ordenados por relevancia. Devuelve (resultados, hay_mas)."""
+    terminos = terminos_de(consulta)
+    if not terminos:
+        return [], False
+
+    puntaje, condicion, fts = _busqueda('busqueda_mensajes', [WAMensaje.texto], terminos, WAMensaje.id)
+    query = db.session.query(WAMensaje, WAConversacion, WAContacto, puntaje.label('puntaje'))
+    if fts is not None:
+        query = query.select_from(fts[0]).join(WAMensaje, fts[1])
+    query = query.join(WAConversacion, WAConversacion.id == WAMensaje.conversacion_id) \
+        .join(WAContacto, WAContacto.id == WAConversacion.contacto_id) \
+        .filter(condicion)
+
+    if comercial_id:
+        query = query.filter(WAConversacion.usuario_id == comercial_id)
+    if instancia:
+        query = query.filter(WAConversacion.instancia_nombre == instancia)
+    inicio, fin = _rango_fechas(desde, hasta)
+    if inicio:
+        query = query.filter(WAMensaje.fecha_mensaje >= inicio)
+    if fin:
+        query = query.filter(WAMensaje.fecha_mensaje < fin)
+
+    filas = query.order_by(puntaje.desc(), WAMensaje.id.desc()).offset(offset).limit(limite + 1).all()
+    resultados = [{
+        'mensaje_id': mensaje.id,
+        'conversacion_id': conversacion.id,
+        'fragmento': fragmento(mensaje.texto, terminos),
+        'fecha': mensaje.fecha_mensaje.isoformat() if mensaje.fecha_mensaje else None,
+        'es_enviado': mensaje.es_enviado,
+        'instancia_nombre': conversacion.instancia_nombre,
+        'usuario_id': conversacion.usuario_id,
+        'vendedor_nombre': conversacion.vendedor_nombre,
+        'contacto': {
+            'id': contacto.id,
+            'nombre': contacto.nombre or contacto.numero_normalizado,
+            'numero': contacto.numero_normalizado
+        },
+        'puntaje': round(float(valor or 0), 4),
+    } for mensaje, conversacion, contacto, valor in filas[:limite]]
+    return resultados, len(filas) > limite
+
+
+def buscar_mails(consulta, comercial_id=None, desde=None, hasta=None,
+                 limite=LIMITE_POR_DEFECTO, offset=0):
+    """Mails (asunto y cuerpo) ordenados por relevancia. Devuelve (resultados, hay_mas)."""
+    terminos = terminos_de(consulta)
+    if not terminos:
+        return [], False
+
+    puntaje, condicion, fts = _busqueda(
+        'busqueda_mails', [ConversacionMail.asunto, ConversacionMail.mensaje], terminos,
+        literal_column('conversacion_mail.rowid')
+    )
+    query = db.session.query(ConversacionMail, puntaje.label('puntaje'))
+    if fts is not None:
+        query = query.select_from(fts[0]).join(ConversacionMail, fts[1])
+    query = query.filter(condicion)
+
+    if comercial_id:
+        # El mail es del comercial si su thread pertenece a un evento suyo
+        query = query.filter(exists().where(
+            Evento.thread_id == ConversacionMail.thread_id,
+            Evento.comercial_id == comercial_id
+        ))
+    if desde:
+        query = query.filter(ConversacionMail.fecha >= desde)
+    if hasta:
+        query = query.filter(ConversacionMail.fecha <= hasta)
+
+    filas = query.order_by(puntaje.desc(), ConversacionMail.message_id.desc()).offset(offset).limit(limite + 1).all()
+    filas_pagina = filas[:limite]
+
+    # Evento vinculado a cada thread de la página (una sola query)
+    thread_ids = {mail.thread_id for mail, _ in filas_pagina}
+    eventos = {}
+    if thread_ids:
+        for evento in Evento.query.filter(Evento.thread_id.in_(thread_ids)).all():
+            eventos.setdefault(evento.thread_id, evento)
+
+    resultados = []
+    for mail, valor in filas_pagina:
+        evento = eventos.get(mail.thread_id)
+        resultados.append({
+            'message_id': mail.message_id,
+            'thread_id': mail.thread_id,
+            'asunto': mail.asunto,
+            'fragmento': fragmento(mail.mensaje, terminos),
+            'fecha': mail.fecha.isoformat() if mail.fecha else None,
+            'hora': mail.hora.isoformat() if mail.hora else None,
+            'de_nombre': mail.de_nombre,
+            'de_email': mail.de_email,
+            'tipo_emisor': mail.tipo_emisor,
+            'evento': {
+                'id': evento.id,
+                'titulo': evento.titulo or evento.generar_titulo_auto(),
+                'comercial_id': evento.comercial_id
+            } if evento else None,
+            'puntaje': round(float(valor or 0), 4),
+        })
+    return resultados, len(filas) > limite
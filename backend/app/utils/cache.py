@@ -0,0 +1,77 @@
+"""
+Cache en memoria del proceso con vencimiento (TTL) y tamaño máximo (LRU).
+
+Pensado para datos chicos que casi nunca cambian y se consultan en cada
+request (ej: instancia de WhatsApp -> vendedor). Cada proceso de gunicorn
+tiene su propia copia; las invalidaciones explícitas son locales, por eso el
+TTL acota cuánto puede tardar en verse un cambio hecho desde otra instancia.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+# Centinela para distinguir "no está" de un valor None cacheado
+_FALTA = object()
+
+
+class CacheTTL:
+
+    def __init__(self, nombre, maximo=1000, ttl=300):
+        self.nombre = nombre
+        self.maximo = maximo
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._datos = OrderedDict()  # clave -> (valor, vence_en)
+        self.hits = 0
+        self.misses = 0
+        self.invalidaciones = 0
+
+    def obtener(self, clave, default=None):
+        with self._lock:
+            valor, vence = self._datos.get(clave, (_FALTA, 0))
+            if valor is _FALTA or vence < time.monotonic():
+                if valor is not _FALTA:
+                    del self._datos[clave]
+                self.misses += 1
+                return default
+            self._datos.move_to_end(clave)
+            self.hits += 1
+            return valor
+
+    def guardar(self, clave, valor):
+        with self._lock:
+            self._datos[clave] = (valor, time.monotonic() + self.ttl)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+
+    def obtener_o_cargar(self, clave, cargar):
+        """Devuelve el valor cacheado o llama a cargar(clave) y lo guarda"""
+        valor = self.obtener(clave, _FALTA)
+        if valor is _FALTA:
+            valor = cargar(clave)
+            self.guardar(clave, valor)
+        return valor
+
+    def invalidar(self, clave=_FALTA):
+        """Borra una clave, o todo el cache si no se indica ninguna"""
+        with self._lock:
+            if clave is _FALTA:
+                self._datos.clear()
+            else:
+                self._datos.pop(clave, None)
+            self.invalidaciones += 1
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                'nombre': self.nombre,
+                'entradas': len(self._datos),
+                'maximo': self.maximo,
+                'ttl_segundos': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / consultas, 3) if consultas else None,
+                'invalidaciones': self.invalidaciones,
+            }
@@ -0,0 +1,79 @@
+"""
+Versiones reducidas de los comprobantes de pago.
+
+Las fotos de celular llegan a 4000px y varios MB; tesorería las revisa en
+listas. Al subir una imagen se generan y guardan junto al original:
+- preview: JPEG de hasta LADO_PREVIEW px (lightbox)
+- thumb:   JPEG de hasta LADO_THUMB px (listas)
+Los PDF y las imágenes que no se pueden leer quedan sin variantes y se
+sirven completos.
+"""
+import io
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow viene con reportlab; sin él no hay variantes
+    Image = None
+
+LADO_PREVIEW = 1600
+CALIDAD_PREVIEW = 80
+LADO_THUMB = 320
+CALIDAD_THUMB = 70
+
+EXTENSIONES_IMAGEN = {'png', 'jpg', 'jpeg', 'gif'}
+
+# Fotos más grandes que esto (en píxeles) no se procesan
+MAXIMO_PIXELES = 60_000_000
+
+
+def rutas_variantes(blob_path):
+    """'comprobantes/1/2_abc.jpeg' -> {'preview': 'comprobantes/1/2_abc.preview.jpg', 'thumb': ...}"""
+    base = blob_path.rsplit('.', 1)[0]
+    return {'preview': f'{base}.preview.jpg', 'thumb': f'{base}.thumb.jpg'}
+
+
+def _a_jpeg(imagen, lado, calidad):
+    copia = imagen.copy()
+    copia.thumbnail((lado, lado), Image.LANCZOS)
+    salida = io.BytesIO()
+    copia.save(salida, format='JPEG', quality=calidad, optimize=True, progressive=True)
+    salida.seek(0)
+    return salida
+
+
+def generar_variantes(stream, ext):
+    """
+    Genera preview y thumb de una imagen. Deja el stream al principio.
+
+    Returns:
+        dict {'preview': BytesIO, 'thumb': BytesIO}, vacío si no es una
+        imagen procesable
+    """
+    if Image is None or ext not in EXTENSIONES_IMAGEN:
+        return {}
+    try:
+        stream.seek(0)
+        imagen = Image.open(stream)
+        ancho, alto = imagen.size
+        if ancho * alto > MAXIMO_PIXELES:
+            print(f"Comprobante de {ancho}x{alto} px: no se generan variantes")
+            return {}
+        # En JPEG decodifica directo a una escala reducida (mucho menos memoria y CPU)
+        imagen.draft('RGB', (LADO_PREVIEW, LADO_PREVIEW))
+        imagen = ImageOps.exif_transpose(imagen)
+        if imagen.mode in ('RGBA', 'LA', 'P'):
+            imagen = imagen.convert('RGBA')
+            fondo = Image.new('RGB', imagen.size, 'white')
+            fondo.paste(imagen, mask=imagen.getchannel('A'))
+            imagen = fondo
+        elif imagen.mode != 'RGB':
+            imagen = imagen.convert('RGB')
+
+        preview = _a_jpeg(imagen, LADO_PREVIEW, CALIDAD_PREVIEW)
+        thumb = _a_jpeg(imagen, LADO_THUMB, CALIDAD_THUMB)
+        return {'preview': preview, 'thumb': thumb}
+    except Exception as e:
+        print(f"No se pudieron generar variantes del comprobante: {e}")
+        return {}
+    finally:
+        stream.seek(0)
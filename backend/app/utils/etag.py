@@ -0,0 +1,36 @@
+"""
+GET condicional (ETag / If-None-Match) para el Kanban y el calendario.
+
+El ETag se arma con la revisión del tablero (models_revision) más el alcance
+de la respuesta (usuario, rol, query string), así un refresco sin cambios se
+resuelve con un MAX(id) de cambios_tablero y un 304 sin cuerpo.
+"""
+import hashlib
+from flask import request, Response
+
+CACHE_CONTROL = 'private, no-cache'
+
+
+def etag_tablero(*alcance):
+    """ETag para la revisión actual del tablero y el alcance dado"""
+    from app.models_revision import obtener_revision
+
+    crudo = '|'.join(str(parte) for parte in (obtener_revision(), request.query_string.decode(), *alcance))
+    return hashlib.sha1(crudo.encode()).hexdigest()[:24]
+
+
+def respuesta_no_modificada(etag):
+    """Respuesta 304 si el cliente ya tiene esta versión, si no None"""
+    if request.if_none_match and request.if_none_match.contains_weak(etag):
+        respuesta = Response(status=304)
+        respuesta.set_etag(etag, weak=True)
+        respuesta.headers['Cache-Control'] = CACHE_CONTROL
+        return respuesta
+    return None
+
+
+def con_etag(respuesta, etag):
+    """Agrega ETag débil y Cache-Control (el navegador revalida siempre)"""
+    respuesta.set_etag(etag, weak=True)
+    respuesta.headers['Cache-Control'] = CACHE_CONTROL
+    return respuesta
@@ -0,0 +1,41 @@
+"""
+Aritmética de fechas resuelta en la base.
+
+`segundos_entre(desde, hasta)` compila a TIMESTAMPDIFF en MySQL (julianday en
+SQLite), para calcular duraciones dentro de un INSERT ... SELECT sin traer
+las filas a Python (ej: /api/sla/check-violations).
+"""
+from sqlalchemy import Integer
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+
+
+class segundos_entre(FunctionElement):
+    """
+    Segundos enteros entre dos DATETIME (hasta - desde), calculado en la base.
+
+    Uso: segundos_entre(Evento.fecha_ultimo_cambio_estado, literal(ahora))
+    """
+    type = Integer()
+    inherit_cache = True
+
+    def __init__(self, desde, hasta):
+        super().__init__(desde, hasta)
+
+
+@compiles(segundos_entre, 'mysql')
+def _segundos_entre_mysql(element, compiler, **kw):
+    desde, hasta = [compiler.process(c, **kw) for c in element.clauses]
+    return f"TIMESTAMPDIFF(SECOND, {desde}, {hasta})"
+
+
+@compiles(segundos_entre, 'sqlite')
+def _segundos_entre_sqlite(element, compiler, **kw):
+    desde, hasta = [compiler.process(c, **kw) for c in element.clauses]
+    return f"CAST(ROUND((julianday({hasta}) - julianday({desde})) * 86400) AS INTEGER)"
+
+
+@compiles(segundos_entre)
+def _segundos_entre_default(element, compiler, **kw):
+    desde, hasta = [compiler.process(c, **kw) for c in element.clauses]
+    return f"CAST(EXTRACT(EPOCH FROM ({hasta} - {desde})) AS INTEGER)"
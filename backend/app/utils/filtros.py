@@ -0,0 +1,45 @@
+"""
+Filtros SQL compartidos para reportes y listados.
+Construyen predicados sargables (sin envolver la columna en funciones)
+para que MySQL pueda usar los índices sobre columnas de fecha.
+"""
+from datetime import datetime, date, time, timedelta
+from sqlalchemy import and_, true, DateTime
+
+
+def filtro_rango_fechas(campo_fecha, fecha_desde=None, fecha_hasta=None):
+    """
+    Filtro de rango de fechas con límites semiabiertos [desde, hasta + 1 día).
+
+    Reemplaza `func.date(campo) >= desde AND func.date(campo) <= hasta`,
+    que obliga a un full scan. Incluye el día `fecha_hasta` completo.
+
+    Args:
+        campo_fecha: Columna Date o DateTime (ej: Evento.created_at)
+        fecha_desde: date inicial inclusiva (None = sin límite)
+        fecha_hasta: date final inclusiva (None = sin límite)
+
+    Returns:
+        Expresión SQLAlchemy para usar en .filter()
+    """
+    es_datetime = isinstance(campo_fecha.type, DateTime)
+    condiciones = []
+
+    if fecha_desde:
+        desde = _a_fecha(fecha_desde)
+        condiciones.append(campo_fecha >= (datetime.combine(desde, time.min) if es_datetime else desde))
+
+    if fecha_hasta:
+        limite = _a_fecha(fecha_hasta) + timedelta(days=1)
+        condiciones.append(campo_fecha < (datetime.combine(limite, time.min) if es_datetime else limite))
+
+    return and_(*condiciones) if condiciones else true()
+
+
+def _a_fecha(valor):
+    """Acepta date, datetime o string YYYY-MM-DD"""
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return datetime.strptime(valor, '%Y-%m-%d').date()
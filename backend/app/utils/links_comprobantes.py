@@ -0,0 +1,63 @@
+"""
+Links firmados a los comprobantes de pago.
+
+Las respuestas de precheck y tesorería no traen blob paths ni signed URLs de
+GCS: traen /api/precheck/comprobante/<pago_id>?expires=...&signature=...,
+que redirige a la signed URL recién cuando se abre. <img> y <a> no mandan
+headers, así que el link se autoriza solo: la firma (HMAC con SECRET_KEY)
+cubre pago, variante y vencimiento, y se genera únicamente en endpoints que
+ya verificaron el acceso al pago.
+
+El vencimiento se redondea a VENTANA_LINK: durante esa ventana el mismo pago
+recibe el mismo link y el navegador reusa la imagen cacheada.
+"""
+import hashlib
+import hmac
+import time
+from flask import current_app, url_for
+
+# Validez mínima de un link y ventana de redondeo del vencimiento (segundos)
+VIGENCIA_LINK = 30 * 60
+VENTANA_LINK = 10 * 60
+
+VARIANTES = ('preview', 'thumb')
+
+
+def _firma(pago_id, variante, expira):
+    clave = current_app.config['SECRET_KEY'].encode()
+    mensaje = f'comprobante:{pago_id}:{variante or ""}:{expira}'.encode()
+    return hmac.new(clave, mensaje, hashlib.sha256).hexdigest()
+
+
+def link_comprobante(pago_id, variante=None):
+    """Link firmado a /api/precheck/comprobante/<pago_id> (opcionalmente a una variante)"""
+    expira = (int(time.time()) // VENTANA_LINK + 1) * VENTANA_LINK + VIGENCIA_LINK
+    params = {'variante': variante} if variante else {}
+    return url_for(
+        'precheck.redirigir_comprobante', pago_id=pago_id,
+        expires=expira, signature=_firma(pago_id, variante, expira), **params
+    )
+
+
+def verificar_link(pago_id, variante, expira, firma):
+    """True si la firma corresponde al pago y la variante y no venció"""
+    try:
+        expira = int(expira)
+    except (TypeError, ValueError):
+        return False
+    if expira < time.time():
+        return False
+    return hmac.compare_digest(_firma(pago_id, variante, expira), firma or '')
+
+
+def con_link_comprobante(pago_dict):
+    """
+    Reemplaza los blob paths del comprobante (original, preview y thumb) por
+    links firmados: la signed URL del storage se genera recién cuando se abren.
+    """
+    if pago_dict.get('comprobante_url'):
+        pago_dict['comprobante_url'] = link_comprobante(pago_dict['id'])
+        for variante in VARIANTES:
+            if pago_dict.get(f'comprobante_{variante}'):
+                pago_dict[f'comprobante_{variante}'] = link_comprobante(pago_dict['id'], variante)
+    return pago_dict
@@ -0,0 +1,95 @@
+"""
+Paginación keyset (por cursor) para listados ordenados por (fecha DESC, id DESC).
+
+El cursor es opaco para el frontend: base64 url-safe de "fecha_iso|id" de la
+última fila devuelta. La página siguiente filtra con
+(fecha < f) OR (fecha = f AND id < i), que usa el índice sobre la fecha en
+lugar de un OFFSET que recorre todas las filas anteriores.
+
+Para claves numéricas no nulas (ej: mensajes por timestamp epoch) están
+codificar_cursor_numerico() / filtro_keyset_numerico_desc(), y para orden
+ascendente (ej: pagos pendientes, el más viejo primero) filtro_keyset_asc().
+"""
+import base64
+from datetime import datetime
+from sqlalchemy import and_, or_, Date
+
+
+def codificar_cursor(fecha, id):
+    """Cursor opaco para la fila (fecha, id)"""
+    crudo = f"{fecha.isoformat() if fecha else ''}|{id}"
+    return base64.urlsafe_b64encode(crudo.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """
+    Devuelve (fecha, id) a partir de un cursor de codificar_cursor().
+    Lanza ValueError si el cursor es inválido.
+    """
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        fecha_str, id_str = base64.urlsafe_b64decode(cursor + relleno).decode().split('|', 1)
+        return (datetime.fromisoformat(fecha_str) if fecha_str else None), int(id_str)
+    except Exception:
+        raise ValueError('Cursor inválido')
+
+
+def _valor_para(campo_fecha, fecha):
+    """El cursor guarda datetime; contra una columna Date se compara la fecha"""
+    if fecha is not None and isinstance(campo_fecha.type, Date):
+        return fecha.date()
+    return fecha
+
+
+def filtro_keyset_desc(campo_fecha, campo_id, cursor):
+    """Filas posteriores al cursor en orden (campo_fecha DESC, campo_id DESC)"""
+    fecha, id = decodificar_cursor(cursor)
+    fecha = _valor_para(campo_fecha, fecha)
+    if fecha is None:
+        # La fila del cursor no tenía fecha: solo quedan filas sin fecha con id menor
+        return and_(campo_fecha.is_(None), campo_id < id)
+    return or_(
+        campo_fecha < fecha,
+        and_(campo_fecha == fecha, campo_id < id),
+        campo_fecha.is_(None)
+    )
+
+
+def filtro_keyset_asc(campo_fecha, campo_id, cursor):
+    """Filas posteriores al cursor en orden (campo_fecha ASC, campo_id ASC), campo_fecha no nulo"""
+    fecha, id = decodificar_cursor(cursor)
+    if fecha is None:
+        raise ValueError('Cursor inválido')
+    fecha = _valor_para(campo_fecha, fecha)
+    return or_(campo_fecha > fecha, and_(campo_fecha == fecha, campo_id > id))
+
+
+def codificar_cursor_numerico(valor, id):
+    """Cursor opaco para la fila (valor entero, id)"""
+    crudo = f"{valor}|{id}"
+    return base64.urlsafe_b64encode(crudo.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor_numerico(cursor):
+    """(valor, id) de un cursor de codificar_cursor_numerico(); ValueError si es inválido"""
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        valor_str, id_str = base64.urlsafe_b64decode(cursor + relleno).decode().split('|', 1)
+        return int(valor_str), int(id_str)
+    except Exception:
+        raise ValueError('Cursor inválido')
+
+
+def filtro_keyset_numerico_desc(campo, campo_id, cursor):
+    """Filas posteriores al cursor en orden (campo DESC, campo_id DESC), campo no nulo"""
+    valor, id = decodificar_cursor_numerico(cursor)
+    return or_(campo < valor, and_(campo == valor, campo_id < id))
+
+
+def leer_limite(valor, por_defecto=50, maximo=200):
+    """Parsea ?limit= acotándolo a [1, maximo]"""
+    try:
+        limite = int(valor) if valor not in (None, '') else por_defecto
+    except (TypeError, ValueError):
+        limite = por_defecto
+    return max(1, min(limite, maximo))
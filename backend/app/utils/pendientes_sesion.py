@@ -0,0 +1,54 @@
+"""
+Efectos que se aplican recién cuando la transacción de la sesión se confirma
+(avisos del canal push, cache de contactos, registro de cambios del tablero).
+
+Cada pendiente se guarda junto con el savepoint activo al agregarlo:
+- al hacer rollback de un savepoint (begin_nested) se descartan solo los
+  pendientes de ese savepoint y de los que estaban dentro de él; lo agregado
+  antes sigue en pie (ej: procesar_lote, payload por payload);
+- al hacer rollback de la transacción externa se descartan todos;
+- after_commit también se dispara al liberar un savepoint: tomar_pendientes()
+  solo entrega algo en el commit de la transacción externa.
+"""
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+CLAVE = 'pendientes_al_confirmar'
+
+
+def agregar_pendiente(session, tipo, item):
+    """Agrega `item` a los pendientes `tipo` de la transacción en curso"""
+    pendientes = session.info.setdefault(CLAVE, {}).setdefault(tipo, [])
+    pendientes.append((session.get_nested_transaction(), item))
+
+
+def tomar_pendientes(session, tipo):
+    """Pendientes `tipo` a aplicar (para usar en after_commit); [] si solo se liberó un savepoint"""
+    if session.in_nested_transaction():
+        return []
+    pendientes = session.info.get(CLAVE, {}).pop(tipo, [])
+    return [item for _, item in pendientes]
+
+
+def _dentro_de(transaccion, savepoint):
+    while transaccion is not None:
+        if transaccion is savepoint:
+            return True
+        transaccion = transaccion.parent
+    return False
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _descartar_pendientes(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop(CLAVE, None)
+        return
+    if not previous_transaction.nested:
+        # Subtransacción interna de un flush: el savepoint o la transacción
+        # que la contiene hace su propio rollback a continuación
+        return
+    for tipo, pendientes in session.info.get(CLAVE, {}).items():
+        pendientes[:] = [
+            (transaccion, item) for transaccion, item in pendientes
+            if not _dentro_de(transaccion, previous_transaction)
+        ]
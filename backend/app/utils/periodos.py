@@ -0,0 +1,73 @@
+"""
+Agrupación de fechas por período (día/semana/mes/trimestre) resuelta en la base.
+
+`inicio_periodo(campo, agrupacion)` compila a funciones nativas de cada motor
+(WEEKDAY/DATE_FORMAT/QUARTER en MySQL, strftime en SQLite) y devuelve siempre
+el primer día del período como string 'YYYY-MM-DD', así el GROUP BY se hace
+en SQL y el frontend recibe el mismo formato para cualquier agrupación.
+"""
+from sqlalchemy import String
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.sql.visitors import InternalTraversal
+
+# agrupacion (query param del dashboard) -> unidad del período
+AGRUPACIONES = {
+    'diario': 'dia',
+    'semanal': 'semana',
+    'mensual': 'mes',
+    'trimestral': 'trimestre',
+}
+
+
+class inicio_periodo(FunctionElement):
+    """
+    Primer día del período que contiene `campo` (semanas empiezan el lunes).
+
+    Uso: inicio_periodo(ReporteDiario.fecha, 'semanal')
+    """
+    type = String()
+    inherit_cache = True
+    # La unidad forma parte de la clave de cache del statement compilado
+    _traverse_internals = FunctionElement._traverse_internals + [('unidad', InternalTraversal.dp_string)]
+
+    def __init__(self, campo, agrupacion='diario'):
+        self.unidad = AGRUPACIONES.get(agrupacion, 'dia')
+        super().__init__(campo)
+
+    @property
+    def campo(self):
+        return list(self.clauses)[0]
+
+
+@compiles(inicio_periodo, 'mysql')
+def _inicio_periodo_mysql(element, compiler, **kw):
+    campo = compiler.process(element.campo, **kw)
+    if element.unidad == 'semana':
+        return f"DATE_FORMAT(DATE_SUB({campo}, INTERVAL WEEKDAY({campo}) DAY), '%%Y-%%m-%%d')"
+    if element.unidad == 'mes':
+        return f"DATE_FORMAT({campo}, '%%Y-%%m-01')"
+    if element.unidad == 'trimestre':
+        return (f"CONCAT(YEAR({campo}), '-', LPAD((QUARTER({campo}) - 1) * 3 + 1, 2, '0'), '-01')")
+    return f"DATE_FORMAT({campo}, '%%Y-%%m-%%d')"
+
+
+@compiles(inicio_periodo, 'sqlite')
+def _inicio_periodo_sqlite(element, compiler, **kw):
+    campo = compiler.process(element.campo, **kw)
+    if element.unidad == 'semana':
+        return f"date({campo}, '-' || ((CAST(strftime('%w', {campo}) AS INTEGER) + 6) % 7) || ' days')"
+    if element.unidad == 'mes':
+        return f"strftime('%Y-%m-01', {campo})"
+    if element.unidad == 'trimestre':
+        return (f"printf('%s-%02d-01', strftime('%Y', {campo}), "
+                f"((CAST(strftime('%m', {campo}) AS INTEGER) - 1) / 3) * 3 + 1)")
+    return f"date({campo})"
+
+
+@compiles(inicio_periodo)
+def _inicio_periodo_default(element, compiler, **kw):
+    # Motores con date_trunc (PostgreSQL): week ya empieza el lunes
+    campo = compiler.process(element.campo, **kw)
+    unidad = {'dia': 'day', 'semana': 'week', 'mes': 'month', 'trimestre': 'quarter'}[element.unidad]
+    return f"to_char(date_trunc('{unidad}', {campo}), 'YYYY-MM-DD')"
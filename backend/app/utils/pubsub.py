@@ -0,0 +1,250 @@
+"""
+Pub/sub en proceso para el canal push (/api/stream).
+
+Los productores llaman a publicar() (o dejan que los listeners de sesión lo
+hagan al confirmar la transacción) y cada conexión SSE se suscribe con una
+cola propia. El backend se elige con PUBSUB_BACKEND:
+
+- 'tabla' (default): escribe cada mensaje en stream_mensajes y un hilo por
+  proceso lee los nuevos, así varias instancias comparten los mensajes
+  usando la misma base como broker.
+- 'memoria': fan-out directo entre hilos del mismo proceso. Solo es correcto
+  con una única instancia: con varias, cada una avisa a sus propias conexiones.
+
+Mensaje: {'id', 'tipo', 'datos', 'usuarios', 'roles'}. Si usuarios y roles
+son None el mensaje va a todos; si no, a quien esté en usuarios o tenga uno
+de los roles.
+"""
+import itertools
+import queue
+import threading
+import time
+from datetime import timedelta
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.utils.pendientes_sesion import agregar_pendiente, tomar_pendientes
+
+# Mensajes que puede acumular una conexión lenta antes de descartar
+TAMANO_COLA = 200
+
+
+class BackendMemoria:
+    """Fan-out en memoria: cada suscriptor tiene una queue.Queue"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._suscriptores = set()
+        self._ids = itertools.count(1)
+
+    def publicar(self, tipo, datos=None, usuarios=None, roles=None):
+        self._repartir({
+            'id': next(self._ids), 'tipo': tipo, 'datos': datos,
+            'usuarios': usuarios, 'roles': roles,
+        })
+
+    def publicar_local(self, tipo, datos=None, usuarios=None, roles=None):
+        """Solo a los suscriptores de este proceso (ej: monitor SLA por instancia)"""
+        BackendMemoria.publicar(self, tipo, datos, usuarios, roles)
+
+    def _repartir(self, mensaje):
+        with self._lock:
+            suscriptores = list(self._suscriptores)
+        for cola in suscriptores:
+            try:
+                cola.put_nowait(mensaje)
+            except queue.Full:
+                pass  # El cliente está atrasado; al reconectar recarga
+
+    def suscribir(self):
+        cola = queue.Queue(maxsize=TAMANO_COLA)
+        with self._lock:
+            self._suscriptores.add(cola)
+        return cola
+
+    def desuscribir(self, cola):
+        with self._lock:
+            self._suscriptores.discard(cola)
+
+    def cantidad_suscriptores(self):
+        with self._lock:
+            return len(self._suscriptores)
+
+
+class BackendTabla(BackendMemoria):
+    """
+    Broker sobre la tabla stream_mensajes para varias instancias.
+    publicar() inserta; un hilo lee cada INTERVALO los mensajes nuevos y los
+    reparte a los suscriptores locales.
+    """
+    INTERVALO = 1.0
+    RETENCION = timedelta(hours=1)
+
+    def __init__(self, app):
+        super().__init__()
+        self.app = app
+        self._ultimo_id = None
+        self._hilo = None
+
+    def publicar(self, tipo, datos=None, usuarios=None, roles=None):
+        from app import db
+        from app.models_stream import StreamMensaje
+        with db.engine.begin() as conn:
+            conn.execute(StreamMensaje.__table__.insert().values(
+                tipo=tipo, datos=datos, usuarios=usuarios, roles=roles,
+                created_at=_ahora()
+            ))
+
+    def suscribir(self):
+        self._iniciar_lector()
+        return super().suscribir()
+
+    def _iniciar_lector(self):
+        with self._lock:
+            if self._hilo and self._hilo.is_alive():
+                return
+            self._hilo = threading.Thread(target=self._leer, name='pubsub-tabla', daemon=True)
+            self._hilo.start()
+
+    def _leer(self):
+        from app import db
+        from app.models_stream import StreamMensaje
+        tabla = StreamMensaje.__table__
+        ultima_purga = 0
+
+        while True:
+            try:
+                with self.app.app_context():
+                    with db.engine.connect() as conn:
+                        if self._ultimo_id is None:
+                            self._ultimo_id = conn.execute(
+                                db.select(db.func.coalesce(db.func.max(tabla.c.id), 0))
+                            ).scalar()
+                        filas = conn.execute(
+                            db.select(tabla).where(tabla.c.id > self._ultimo_id).order_by(tabla.c.id)
+                        ).mappings().all()
+
+                    for fila in filas:
+                        self._ultimo_id = fila['id']
+                        self._repartir({
+                            'id': fila['id'], 'tipo': fila['tipo'], 'datos': fila['datos'],
+                            'usuarios': fila['usuarios'], 'roles': fila['roles'],
+                        })
+
+                    if time.time() - ultima_purga > 600:
+                        with db.engine.begin() as conn:
+                            conn.execute(tabla.delete().where(tabla.c.created_at < _ahora() - self.RETENCION))
+                        ultima_purga = time.time()
+            except Exception as e:
+                print(f"[PUBSUB] Error leyendo stream_mensajes: {e}")
+            time.sleep(self.INTERVALO)
+
+
+def _ahora():
+    from app.utils.timezone import ahora_argentina
+    return ahora_argentina()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def obtener_backend():
+    """Backend del proceso según PUBSUB_BACKEND (se crea una sola vez)"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                tipo = current_app.config.get('PUBSUB_BACKEND', 'tabla')
+                if tipo == 'tabla':
+                    _backend = BackendTabla(current_app._get_current_object())
+                else:
+                    _backend = BackendMemoria()
+    return _backend
+
+
+def publicar(tipo, datos=None, usuarios=None, roles=None):
+    """Publica un mensaje; nunca rompe al productor si el canal falla"""
+    try:
+        obtener_backend().publicar(tipo, datos, usuarios, roles)
+    except Exception as e:
+        print(f"[PUBSUB] Error publicando {tipo}: {e}")
+
+
+def es_destinatario(mensaje, usuario_id, rol):
+    """True si el mensaje corresponde a este usuario"""
+    usuarios = mensaje.get('usuarios')
+    roles = mensaje.get('roles')
+    if usuarios is None and roles is None:
+        return True
+    return usuario_id in (usuarios or []) or rol in (roles or [])
+
+
+# ==================== PUBLICACIÓN AL CONFIRMAR ====================
+# Los cambios se detectan en after_flush y se publican recién en after_commit,
+# para que ningún cliente reciba un aviso de algo que terminó en rollback
+# (también si lo que se deshizo fue solo un savepoint, ver pendientes_sesion).
+
+def publicar_al_confirmar(session, tipo, datos=None, usuarios=None, roles=None):
+    agregar_pendiente(session, 'pubsub', (tipo, datos, usuarios, roles))
+
+
+def _mensajes_evento(session, evento):
+    """Aviso de Kanban si el evento es nuevo o cambió de estado/comercial"""
+    from sqlalchemy.orm.attributes import get_history
+    estado = get_history(evento, 'estado')
+    comercial = get_history(evento, 'comercial_id')
+    if evento not in session.new and not estado.has_changes() and not comercial.has_changes():
+        return
+
+    estado_anterior = estado.deleted[0] if estado.deleted else None
+    comerciales = {c for c in (comercial.deleted or []) + (comercial.added or []) + (comercial.unchanged or []) if c}
+    # CONSULTA_ENTRANTE es visible para todos los comerciales
+    roles = ['admin', 'comercial'] if evento.estado == 'CONSULTA_ENTRANTE' else ['admin']
+    publicar_al_confirmar(session, 'kanban', {
+        'evento_id': evento.id,
+        'estado': evento.estado,
+        'estado_anterior': estado_anterior,
+    }, usuarios=sorted(comerciales), roles=roles)
+
+
+def _mensaje_wa(session, mensaje):
+    from app.models_whatsapp import WAConversacion
+    with session.no_autoflush:
+        conversacion = session.get(WAConversacion, mensaje.conversacion_id)
+    publicar_al_confirmar(session, 'whatsapp', {
+        'conversacion_id': mensaje.conversacion_id,
+        'mensaje_id': mensaje.id,
+        'es_enviado': mensaje.es_enviado,
+    }, usuarios=[conversacion.usuario_id] if conversacion and conversacion.usuario_id else [], roles=['admin'])
+
+
+def _mensaje_pago(session, pago):
+    from sqlalchemy.orm.attributes import get_history
+    if pago.estado != 'REVISION':
+        return
+    if pago not in session.new and not get_history(pago, 'estado').has_changes():
+        return
+    publicar_al_confirmar(session, 'tesoreria', {
+        'pago_id': pago.id,
+        'evento_id': pago.evento_id,
+        'estado': pago.estado,
+    }, roles=['admin', 'tesoreria'])
+
+
+@event.listens_for(Session, 'after_flush')
+def _detectar_mensajes(session, flush_context):
+    for obj in list(session.new) + list(session.dirty):
+        nombre = type(obj).__name__
+        if nombre == 'Evento':
+            _mensajes_evento(session, obj)
+        elif nombre == 'WAMensaje' and obj in session.new:
+            _mensaje_wa(session, obj)
+        elif nombre == 'PrecheckPago':
+            _mensaje_pago(session, obj)
+
+
+@event.listens_for(Session, 'after_commit')
+def _publicar_pendientes(session):
+    for tipo, datos, usuarios, roles in tomar_pendientes(session, 'pubsub'):
+        publicar(tipo, datos, usuarios, roles)
@@ -2,6 +2,7 @@
 Configuración y cálculo de SLA (Service Level Agreement) para eventos.
 Define umbrales por estado y calcula si un evento está en alerta o crítico.
 """
+from datetime import timedelta
 from app.utils.timezone import ahora_argentina
 
 # Umbrales SLA por estado (en segundos)
@@ -17,9 +18,31 @@ SLA_CONFIG = {
 ESTADOS_SIN_SLA = ['APROBADO', 'RECHAZADO', 'CONCLUIDO', 'ELIMINADO', 'MULTIRESERVA']
 
 
+def calcular_vencimientos_sla(estado, fecha_ref):
+    """
+    Momentos en que un evento entra en alerta y en crítico.
+
+    Args:
+        estado: Estado actual del evento
+        fecha_ref: Último cambio de estado (o creación)
+
+    Returns:
+        (sla_alerta_at, sla_critico_at) o (None, None) si el estado no tiene SLA
+    """
+    config = SLA_CONFIG.get(estado)
+    if not config or not fecha_ref:
+        return None, None
+    return (
+        fecha_ref + timedelta(seconds=config['alerta']),
+        fecha_ref + timedelta(seconds=config['critico']),
+    )
+
+
 def calcular_sla_evento(evento):
     """
     Calcula el estado SLA de un evento.
+    Usa los vencimientos guardados (sla_alerta_at / sla_critico_at) y solo
+    recalcula desde SLA_CONFIG si el evento todavía no los tiene.
 
     Args:
         evento: Objeto Evento (SQLAlchemy)
@@ -35,11 +58,16 @@ def calcular_sla_evento(evento):
     if not fecha_ref:
         return None
 
-    segundos = (ahora_argentina() - fecha_ref).total_seconds()
+    alerta_at, critico_at = evento.sla_alerta_at, evento.sla_critico_at
+    if not alerta_at or not critico_at:
+        alerta_at, critico_at = calcular_vencimientos_sla(evento.estado, fecha_ref)
+
+    ahora = ahora_argentina()
+    segundos = (ahora - fecha_ref).total_seconds()
 
-    if segundos >= config['critico']:
+    if ahora >= critico_at:
         status = 'critico'
-    elif segundos >= config['alerta']:
+    elif ahora >= alerta_at:
         status = 'alerta'
     else:
         status = 'ok'
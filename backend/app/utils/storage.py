@@ -1,48 +1,350 @@
 """
-Utilidades para Google Cloud Storage
-Manejo de comprobantes con signed URLs
+Almacenamiento de comprobantes con signed URLs
+
+El backend se elige con STORAGE_BACKEND (config) y todos implementan
+StorageBackend (subir / leer / eliminar / firmar / stream):
+- 'gcs':   Google Cloud Storage (producción)
+- 'local': directorio STORAGE_LOCAL_DIR. Las URLs firmadas (HMAC con
+           SECRET_KEY) apuntan a /api/archivos, que sirve el archivo con
+           lecturas mmap. Para desarrollo, pruebas de carga y benchmarks.
+- 'fake':  en memoria, sin red ni disco (tests)
+
+Las signed URLs se cachean por blob path y se reusan hasta MARGEN_RENOVACION
+antes de que venzan: en Cloud Run cada firma es un round trip a IAM
+signBlob. Para listas, generar_signed_urls() firma lo que falta en paralelo
+con un pool acotado de hilos.
+
+Las librerías de Google se importan recién al usar StorageGCS: los backends
+'local' y 'fake' funcionan sin google-cloud-storage instalado.
 """
-from google.cloud import storage
-from google.auth import default as google_auth_default
-from google.auth.transport import requests as google_auth_requests
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
+from urllib.parse import quote
+from flask import current_app
+import hashlib
+import hmac
+import mmap
+import shutil
+import tempfile
+import threading
+import time
 import os
 
+from app.utils.cache import CacheTTL
+
 GCP_BUCKET_NAME = os.environ.get('GCP_BUCKET_COMPROBANTES', 'crm-eventos-comprobantes')
 
-# Cache del cliente y credenciales para no recrearlos en cada request
-_storage_client = None
-_signing_credentials = None
+# Validez por defecto de una signed URL y margen antes del vencimiento en el
+# que deja de reusarse la cacheada
+EXPIRACION_MINUTOS = 30
+MARGEN_RENOVACION = timedelta(minutes=5)
+
+# Las subidas de más de esto van por upload resumable en chunks de este
+# tamaño (múltiplo de 256 KB): nunca hay más de un chunk en memoria
+TAMANO_CHUNK_SUBIDA = 8 * 1024 * 1024
+
+# Tamaño de cada pedazo al servir o descargar en streaming
+TAMANO_CHUNK_LECTURA = 1024 * 1024
+
+# Los blobs de comprobantes no cambian (nombre con uuid): el navegador puede cachearlos
+CACHE_CONTROL_COMPROBANTES = 'private, max-age=86400'
+
+# Firmas simultáneas como máximo al firmar una lista
+FIRMA_WORKERS = int(os.environ.get('STORAGE_FIRMA_WORKERS', '8'))
+
+# blob path -> (signed URL, vence_en en time.monotonic())
+cache_signed_urls = CacheTTL(
+    'signed_urls', maximo=5000,
+    ttl=int(timedelta(minutes=EXPIRACION_MINUTOS).total_seconds() - MARGEN_RENOVACION.total_seconds())
+)
+
+
+class StorageBackend(ABC):
+    """
+    Interfaz de los backends. Los blob paths llegan ya normalizados
+    (ej: 'comprobantes/216/4_abc.jpeg'); los errores se propagan.
+    """
+
+    @abstractmethod
+    def subir(self, file, blob_path, content_type=None, cache_control=None):
+        """Guarda el contenido de `file` desde su posición actual"""
+
+    @abstractmethod
+    def leer(self, blob_path):
+        """Contenido completo (bytes)"""
+
+    @abstractmethod
+    def stream(self, blob_path, tamano_chunk=TAMANO_CHUNK_LECTURA):
+        """Iterador de pedazos de hasta `tamano_chunk` bytes"""
+
+    @abstractmethod
+    def eliminar(self, blob_path):
+        """Borra el blob"""
+
+    @abstractmethod
+    def firmar(self, blob_path, expiration_minutes):
+        """URL temporal de lectura"""
+
+    def preparar_firmas(self):
+        """Se llama antes de firmar en paralelo (ej: refrescar credenciales una vez)"""
+
+
+class StorageGCS(StorageBackend):
+    """Google Cloud Storage; en Cloud Run firma con IAM signBlob"""
+
+    def __init__(self, bucket_name):
+        self.bucket_name = bucket_name
+        # Cache del cliente y credenciales para no recrearlos en cada request
+        self._client = None
+        self._signing_credentials = None
+        # Los hilos de firma comparten cliente y credenciales
+        self._lock = threading.Lock()
+
+    def get_client(self):
+        with self._lock:
+            if self._client is None:
+                from google.cloud import storage
+                self._client = storage.Client()
+        return self._client
+
+    def _get_signing_credentials(self):
+        """
+        Obtiene credenciales para firmar URLs.
+        En Cloud Run no hay clave privada local, así que usamos
+        IAM signBlob API via service_account_email + access_token.
+        Refresca automáticamente si el token expiró.
+        """
+        from google.auth import default as google_auth_default
+        from google.auth.transport import requests as google_auth_requests
+
+        with self._lock:
+            if self._signing_credentials is None:
+                credentials, project = google_auth_default()
+                self._signing_credentials = credentials
+            # Refrescar si no tiene token o si expiró
+            if not self._signing_credentials.valid:
+                auth_request = google_auth_requests.Request()
+                self._signing_credentials.refresh(auth_request)
+            return self._signing_credentials
+
+    def _blob(self, blob_path, **kwargs):
+        return self.get_client().bucket(self.bucket_name).blob(blob_path, **kwargs)
+
+    def subir(self, file, blob_path, content_type=None, cache_control=None):
+        # Con el tamaño, GCS sube hasta 8 MB en un request y el resto resumable por chunks
+        inicio = file.tell()
+        file.seek(0, os.SEEK_END)
+        size = file.tell() - inicio
+        file.seek(inicio)
 
+        blob = self._blob(blob_path, chunk_size=TAMANO_CHUNK_SUBIDA)
+        blob.cache_control = cache_control
+        blob.upload_from_file(file, content_type=content_type, size=size)
 
-def get_storage_client():
-    global _storage_client
-    if _storage_client is None:
-        _storage_client = storage.Client()
-    return _storage_client
+    def leer(self, blob_path):
+        return self._blob(blob_path).download_as_bytes()
 
+    def stream(self, blob_path, tamano_chunk=TAMANO_CHUNK_LECTURA):
+        with self._blob(blob_path, chunk_size=TAMANO_CHUNK_SUBIDA).open('rb') as lector:
+            while True:
+                pedazo = lector.read(tamano_chunk)
+                if not pedazo:
+                    break
+                yield pedazo
 
-def _get_signing_credentials():
+    def eliminar(self, blob_path):
+        self._blob(blob_path).delete()
+
+    def firmar(self, blob_path, expiration_minutes):
+        # Obtener credenciales con service_account_email para Cloud Run
+        signing_creds = self._get_signing_credentials()
+
+        return self._blob(blob_path).generate_signed_url(
+            version='v4',
+            expiration=timedelta(minutes=expiration_minutes),
+            method='GET',
+            service_account_email=signing_creds.service_account_email,
+            access_token=signing_creds.token,
+        )
+
+    def preparar_firmas(self):
+        # Cliente y token listos antes de repartir: los hilos no compiten por refrescarlos
+        self.get_client()
+        self._get_signing_credentials()
+
+
+class StorageLocal(StorageBackend):
     """
-    Obtiene credenciales para firmar URLs.
-    En Cloud Run no hay clave privada local, así que usamos
-    IAM signBlob API via service_account_email + access_token.
-    Refresca automáticamente si el token expiró.
+    Directorio local. Las subidas se escriben a un temporal y se renombran
+    (un lector nunca ve un archivo a medias); las lecturas usan mmap, sin
+    copiar el archivo a memoria del proceso.
     """
-    global _signing_credentials
-    if _signing_credentials is None:
-        credentials, project = google_auth_default()
-        _signing_credentials = credentials
-    # Refrescar si no tiene token o si expiró
-    if not _signing_credentials.valid:
-        auth_request = google_auth_requests.Request()
-        _signing_credentials.refresh(auth_request)
-    return _signing_credentials
-
-
-def generar_signed_url(blob_path, expiration_minutes=30):
+
+    def __init__(self, raiz, clave_firma, url_base='/api/archivos'):
+        self.raiz = os.path.abspath(raiz)
+        self.clave_firma = clave_firma.encode() if isinstance(clave_firma, str) else clave_firma
+        self.url_base = url_base.rstrip('/')
+        os.makedirs(self.raiz, exist_ok=True)
+
+    def ruta(self, blob_path):
+        """Ruta en disco del blob; no deja salir de la raíz"""
+        ruta = os.path.abspath(os.path.join(self.raiz, blob_path))
+        if os.path.commonpath([ruta, self.raiz]) != self.raiz or ruta == self.raiz:
+            raise ValueError(f'Blob path inválido: {blob_path}')
+        return ruta
+
+    def subir(self, file, blob_path, content_type=None, cache_control=None):
+        ruta = self.ruta(blob_path)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        fd, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), prefix='.subiendo-')
+        try:
+            with os.fdopen(fd, 'wb') as destino:
+                shutil.copyfileobj(file, destino, TAMANO_CHUNK_SUBIDA)
+            os.replace(temporal, ruta)
+        except BaseException:
+            os.unlink(temporal)
+            raise
+
+    def tamano(self, blob_path):
+        return os.path.getsize(self.ruta(blob_path))
+
+    def leer(self, blob_path):
+        with open(self.ruta(blob_path), 'rb') as archivo:
+            if os.fstat(archivo.fileno()).st_size == 0:
+                return b''
+            with mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+                return mapa[:]
+
+    def stream(self, blob_path, tamano_chunk=TAMANO_CHUNK_LECTURA):
+        with open(self.ruta(blob_path), 'rb') as archivo:
+            total = os.fstat(archivo.fileno()).st_size
+            if total == 0:
+                return
+            with mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+                for inicio in range(0, total, tamano_chunk):
+                    yield mapa[inicio:inicio + tamano_chunk]
+
+    def eliminar(self, blob_path):
+        try:
+            os.remove(self.ruta(blob_path))
+        except FileNotFoundError:
+            pass
+
+    def _firma(self, blob_path, expira):
+        return hmac.new(self.clave_firma, f'{blob_path}:{expira}'.encode(), hashlib.sha256).hexdigest()
+
+    def firmar(self, blob_path, expiration_minutes):
+        expira = int(time.time()) + expiration_minutes * 60
+        return f'{self.url_base}/{quote(blob_path)}?expires={expira}&signature={self._firma(blob_path, expira)}'
+
+    def verificar_firma(self, blob_path, expira, firma):
+        """True si la firma corresponde al blob y no venció"""
+        try:
+            expira = int(expira)
+        except (TypeError, ValueError):
+            return False
+        if expira < time.time():
+            return False
+        return hmac.compare_digest(self._firma(blob_path, expira), firma or '')
+
+
+class StorageFalso(StorageBackend):
+    """
+    Backend en memoria para tests y pruebas offline. Firma con un hash local
+    (no hay red) y cuenta las firmas; latencia_firma simula el round trip a IAM.
+    """
+
+    def __init__(self, latencia_firma=0.0):
+        self.latencia_firma = latencia_firma
+        self.archivos = {}  # blob path -> (bytes, content_type)
+        self.firmas = 0
+        self._lock = threading.Lock()
+
+    def subir(self, file, blob_path, content_type=None, cache_control=None):
+        contenido = b''.join(iter(lambda: file.read(TAMANO_CHUNK_SUBIDA), b''))
+        with self._lock:
+            self.archivos[blob_path] = (contenido, content_type)
+
+    def leer(self, blob_path):
+        return self.archivos[blob_path][0]
+
+    def stream(self, blob_path, tamano_chunk=TAMANO_CHUNK_LECTURA):
+        contenido = self.leer(blob_path)
+        for inicio in range(0, len(contenido), tamano_chunk):
+            yield contenido[inicio:inicio + tamano_chunk]
+
+    def eliminar(self, blob_path):
+        with self._lock:
+            self.archivos.pop(blob_path, None)
+
+    def firmar(self, blob_path, expiration_minutes):
+        if self.latencia_firma:
+            time.sleep(self.latencia_firma)
+        with self._lock:
+            self.firmas += 1
+        expira = int(time.time()) + expiration_minutes * 60
+        firma = hashlib.sha256(f'{blob_path}:{expira}'.encode()).hexdigest()[:32]
+        return f'https://storage.fake/{GCP_BUCKET_NAME}/{blob_path}?expires={expira}&signature={firma}'
+
+
+def crear_storage(config):
+    """Backend según la config de la app ('gcs', 'local' o 'fake')"""
+    tipo = config.get('STORAGE_BACKEND', 'gcs')
+    if tipo == 'local':
+        return StorageLocal(config.get('STORAGE_LOCAL_DIR', 'storage_local'), config['SECRET_KEY'])
+    if tipo == 'fake':
+        return StorageFalso()
+    return StorageGCS(GCP_BUCKET_NAME)
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def obtener_storage():
+    """Backend del proceso según STORAGE_BACKEND (se crea una sola vez)"""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = crear_storage(current_app.config)
+    return _storage
+
+
+def _normalizar_blob_path(blob_path):
+    """Retrocompatibilidad: si es una URL completa, extraer el blob path"""
+    if blob_path.startswith('https://storage.googleapis.com/'):
+        blob_path = blob_path.split(f'{GCP_BUCKET_NAME}/')[-1]
+    return blob_path
+
+
+def _url_cacheada(blob_path):
+    """Signed URL cacheada si todavía le queda más que MARGEN_RENOVACION"""
+    cacheada = cache_signed_urls.obtener(blob_path)
+    if cacheada and cacheada[1] - MARGEN_RENOVACION.total_seconds() > time.monotonic():
+        return cacheada[0]
+    return None
+
+
+def _firmar_y_cachear(backend, blob_path, expiration_minutes):
+    """Firma y cachea; devuelve None si falla (se loguea)"""
+    vence = time.monotonic() + expiration_minutes * 60
+    try:
+        url = backend.firmar(blob_path, expiration_minutes)
+    except Exception as e:
+        import traceback
+        print(f"Error generando signed URL para {blob_path}: {e}")
+        traceback.print_exc()
+        return None
+    cache_signed_urls.guardar(blob_path, (url, vence))
+    return url
+
+
+def generar_signed_url(blob_path, expiration_minutes=EXPIRACION_MINUTOS):
     """
     Genera una signed URL temporal para un blob en el bucket.
+    Reusa la cacheada mientras le quede más que MARGEN_RENOVACION.
 
     En Cloud Run (sin clave privada local), usa IAM signBlob API.
     Requiere rol 'Service Account Token Creator' en la service account.
@@ -58,44 +360,54 @@ def generar_signed_url(blob_path, expiration_minutes=30):
     if not blob_path:
         return None
 
-    # Retrocompatibilidad: si es una URL completa, extraer el blob path
-    if blob_path.startswith('https://storage.googleapis.com/'):
-        blob_path = blob_path.split(f'{GCP_BUCKET_NAME}/')[-1]
+    blob_path = _normalizar_blob_path(blob_path)
+    return _url_cacheada(blob_path) or _firmar_y_cachear(obtener_storage(), blob_path, expiration_minutes)
 
-    try:
-        client = get_storage_client()
-        bucket = client.bucket(GCP_BUCKET_NAME)
-        blob = bucket.blob(blob_path)
 
-        # Obtener credenciales con service_account_email para Cloud Run
-        signing_creds = _get_signing_credentials()
+def generar_signed_urls(blob_paths, expiration_minutes=EXPIRACION_MINUTOS):
+    """
+    Signed URLs de varios blobs: los cacheados se reusan y el resto se firma
+    en paralelo con hasta FIRMA_WORKERS hilos.
 
-        url = blob.generate_signed_url(
-            version='v4',
-            expiration=timedelta(minutes=expiration_minutes),
-            method='GET',
-            service_account_email=signing_creds.service_account_email,
-            access_token=signing_creds.token,
-        )
-        return url
-    except Exception as e:
-        import traceback
-        print(f"Error generando signed URL para {blob_path}: {e}")
-        traceback.print_exc()
-        return None
+    Returns:
+        dict {path recibido: signed URL o None si falló}
+    """
+    normalizados = {path: _normalizar_blob_path(path) for path in set(blob_paths) if path}
+    urls = {}
+    faltan = set()
+    for blob_path in set(normalizados.values()):
+        url = _url_cacheada(blob_path)
+        if url:
+            urls[blob_path] = url
+        else:
+            faltan.add(blob_path)
+
+    # Los hilos del pool no tienen app context: el backend se resuelve acá
+    backend = obtener_storage() if faltan else None
+    if len(faltan) == 1:
+        blob_path = faltan.pop()
+        urls[blob_path] = _firmar_y_cachear(backend, blob_path, expiration_minutes)
+    elif faltan:
+        backend.preparar_firmas()
+        faltan = sorted(faltan)
+        with ThreadPoolExecutor(max_workers=min(FIRMA_WORKERS, len(faltan)), thread_name_prefix='firma-url') as pool:
+            firmadas = pool.map(lambda p: _firmar_y_cachear(backend, p, expiration_minutes), faltan)
+            for blob_path, url in zip(faltan, firmadas):
+                urls[blob_path] = url
+
+    return {path: urls.get(blob_path) for path, blob_path in normalizados.items()}
 
 
-def subir_archivo(file, filename, content_type=None):
+def subir_archivo(file, filename, content_type=None, cache_control=CACHE_CONTROL_COMPROBANTES):
     """
     Sube un archivo al bucket y retorna el blob path (NO la URL pública).
+    Lee el archivo desde su posición actual; hasta TAMANO_CHUNK_SUBIDA va en
+    un solo request, más grande en un upload resumable por chunks.
 
     Returns:
         str: blob path (ej: 'comprobantes/216/4_abc.jpeg')
     """
-    client = get_storage_client()
-    bucket = client.bucket(GCP_BUCKET_NAME)
-    blob = bucket.blob(filename)
-    blob.upload_from_file(file, content_type=content_type)
+    obtener_storage().subir(file, filename, content_type=content_type, cache_control=cache_control)
     return filename
 
 
@@ -109,29 +421,10 @@ def eliminar_archivo(blob_path):
     if not blob_path:
         return
 
-    # Retrocompatibilidad: si es una URL completa, extraer el blob path
-    if blob_path.startswith('https://storage.googleapis.com/'):
-        blob_path = blob_path.split(f'{GCP_BUCKET_NAME}/')[-1]
+    blob_path = _normalizar_blob_path(blob_path)
+    cache_signed_urls.invalidar(blob_path)
 
     try:
-        client = get_storage_client()
-        bucket = client.bucket(GCP_BUCKET_NAME)
-        blob = bucket.blob(blob_path)
-        blob.delete()
+        obtener_storage().eliminar(blob_path)
     except Exception as e:
         print(f"Error eliminando archivo {blob_path}: {e}")
-
-
-def enrich_pago_dict(pago_dict):
-    """
-    Enriquece un dict de pago con signed URL para el comprobante.
-    Reemplaza comprobante_url (blob path) por una signed URL temporal.
-    Si falla la generación, mantiene el valor original.
-    """
-    original_url = pago_dict.get('comprobante_url')
-    if original_url:
-        signed = generar_signed_url(original_url)
-        if signed:
-            pago_dict['comprobante_url'] = signed
-        # Si signed es None, mantener original_url (mejor URL rota que None)
-    return pago_dict
@@ -0,0 +1,315 @@
+"""
+Cola asíncrona del webhook de Evolution API.
+
+El webhook inserta el payload crudo en webhook_pendientes y responde 202.
+Un pool de workers (hilos del proceso, se arrancan en create_app con
+WHATSAPP_WORKERS_AL_INICIAR y si no con el primer payload) toma lotes con
+SELECT ... FOR UPDATE SKIP LOCKED, así varias instancias pueden drenar la
+misma cola sin pisarse. Los mensajes de todo el lote se guardan juntos con
+guardar_mensajes(); si eso falla, se procesa payload por payload en
+savepoints para aislar al culpable, que se reintenta hasta MAX_INTENTOS y
+después queda en 'error' para reprocesarlo con reencolar_fallidos(). Las
+métricas cuentan mensajes, no payloads.
+
+Cloud Run puede dejar los hilos sin CPU o escalar a cero: drenar_cola() lo
+llama un cron (POST /webhook/cola/drenar) para que lo que quedó en
+'pendiente' o 'procesando' tras un deploy no espere al próximo webhook.
+"""
+import threading
+import time
+from datetime import timedelta
+from flask import current_app
+from sqlalchemy import func
+from app import db
+from app.models_whatsapp import WAWebhookPendiente
+from app.utils.timezone import ahora_argentina
+from app.utils.whatsapp_ingesta import parsear_payload, guardar_mensajes
+
+TAMANO_LOTE = 50
+MAX_INTENTOS = 5
+
+# Un payload en 'procesando' por más de esto se considera abandonado (worker caído)
+TIMEOUT_PROCESANDO = timedelta(minutes=5)
+
+# Los procesados se purgan después de esto
+RETENCION_PROCESADOS = timedelta(days=7)
+
+# Espera entre sondeos cuando la cola está vacía (se despierta antes al encolar)
+INTERVALO_SONDEO = 2.0
+
+# Tiempo máximo que drenar_cola() procesa dentro de un request del cron
+PRESUPUESTO_DRENAJE_SEGUNDOS = 50
+
+# Con más pendientes que esto se reporta backpressure en las métricas
+UMBRAL_BACKPRESSURE = 1000
+
+
+class _Metricas:
+    """Contadores en memoria del proceso (se reinician al reiniciar)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.encolados = 0
+        self.procesados = 0
+        self.duplicados = 0
+        self.descartados = 0
+        self.reintentos = 0
+        self.fallidos = 0
+        self.lotes = 0
+        self.ultimo_lote_ms = None
+        self.ultimo_lote_at = None
+
+    def sumar(self, **valores):
+        with self._lock:
+            for campo, valor in valores.items():
+                setattr(self, campo, getattr(self, campo) + valor)
+
+    def registrar_lote(self, duracion_ms):
+        with self._lock:
+            self.lotes += 1
+            self.ultimo_lote_ms = round(duracion_ms, 1)
+            self.ultimo_lote_at = ahora_argentina()
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'encolados': self.encolados,
+                'procesados': self.procesados,
+                'duplicados': self.duplicados,
+                'descartados': self.descartados,
+                'reintentos': self.reintentos,
+                'fallidos': self.fallidos,
+                'lotes': self.lotes,
+                'ultimo_lote_ms': self.ultimo_lote_ms,
+                'ultimo_lote_at': self.ultimo_lote_at.isoformat() if self.ultimo_lote_at else None,
+            }
+
+
+metricas = _Metricas()
+
+_despertar = threading.Event()
+_workers_lock = threading.Lock()
+_workers = []
+
+
+def encolar(payload):
+    """Guarda el payload en la cola y despierta a los workers. Devuelve el id."""
+    pendiente = WAWebhookPendiente(
+        instancia=payload.get('instance'),
+        payload=payload,
+        estado='pendiente'
+    )
+    db.session.add(pendiente)
+    db.session.commit()
+
+    metricas.sumar(encolados=1)
+    iniciar_workers(current_app._get_current_object())
+    _despertar.set()
+    return pendiente.id
+
+
+def iniciar_workers(app):
+    """Arranca (una vez por proceso) WHATSAPP_WORKERS hilos que drenan la cola"""
+    with _workers_lock:
+        vivos = [w for w in _workers if w.is_alive()]
+        faltan = app.config.get('WHATSAPP_WORKERS', 2) - len(vivos)
+        for i in range(faltan):
+            hilo = threading.Thread(target=_loop_worker, args=(app,), name=f'whatsapp-cola-{len(vivos) + i}', daemon=True)
+            hilo.start()
+            vivos.append(hilo)
+        _workers[:] = vivos
+
+
+def _loop_worker(app):
+    ultima_limpieza = 0
+    while True:
+        procesados = 0
+        try:
+            with app.app_context():
+                try:
+                    if time.time() - ultima_limpieza > 60:
+                        liberar_abandonados()
+                        purgar_procesados()
+                        ultima_limpieza = time.time()
+                    procesados = procesar_lote()
+                finally:
+                    # Si un commit falló, los payloads quedan en 'procesando' y
+                    # liberar_abandonados() los devuelve a la cola
+                    db.session.remove()
+        except Exception as e:
+            print(f"[WHATSAPP COLA] Error en worker: {e}")
+
+        if procesados == 0:
+            _despertar.wait(INTERVALO_SONDEO)
+            _despertar.clear()
+
+
+def tomar_lote(limite=TAMANO_LOTE):
+    """Marca como 'procesando' hasta `limite` pendientes y los devuelve"""
+    lote = WAWebhookPendiente.query.filter_by(
+        estado='pendiente'
+    ).order_by(WAWebhookPendiente.id).limit(limite).with_for_update(skip_locked=True).all()
+
+    ahora = ahora_argentina()
+    ids = [pendiente.id for pendiente in lote]
+    for pendiente in lote:
+        pendiente.estado = 'procesando'
+        pendiente.tomado_at = ahora
+    db.session.commit()
+
+    # El commit expira los objetos: recargarlos juntos evita una query por fila
+    if not ids:
+        return []
+    return WAWebhookPendiente.query.filter(WAWebhookPendiente.id.in_(ids)).order_by(WAWebhookPendiente.id).all()
+
+
+def procesar_lote(limite=TAMANO_LOTE):
+    """Procesa un lote de la cola. Devuelve cuántos payloads tomó."""
+    lote = tomar_lote(limite)
+    if not lote:
+        return 0
+
+    t0 = time.perf_counter()
+    resultados = procesar_en_bloque(lote)
+    if resultados is None:
+        resultados = {}
+        for pendiente in lote:
+            for metrica, valor in procesar_pendiente(pendiente).items():
+                resultados[metrica] = resultados.get(metrica, 0) + valor
+    db.session.commit()
+
+    # Las métricas se suman recién con el lote confirmado
+    metricas.sumar(**resultados)
+    metricas.registrar_lote((time.perf_counter() - t0) * 1000)
+    return len(lote)
+
+
+def _guardar_payloads(pendientes):
+    """Parsea y guarda los mensajes de varios payloads con un solo guardar_mensajes()"""
+    validos, descartados = [], 0
+    for pendiente in pendientes:
+        datos, errores = parsear_payload(pendiente.payload or {})
+        validos.extend(datos)
+        descartados += len(errores)
+        if errores and not datos:
+            # Payload inválido o ignorado: no tiene sentido reintentarlo
+            pendiente.ultimo_error = errores[0][0].get('message') or errores[0][0].get('reason')
+
+    resultado = guardar_mensajes(validos) if validos else {'guardados': 0, 'duplicados': 0}
+    return {'procesados': resultado['guardados'], 'duplicados': resultado['duplicados'], 'descartados': descartados}
+
+
+def _marcar_procesados(pendientes):
+    ahora = ahora_argentina()
+    for pendiente in pendientes:
+        pendiente.estado = 'procesado'
+        pendiente.procesado_at = ahora
+
+
+def procesar_en_bloque(lote):
+    """
+    Guarda todos los mensajes del lote juntos. Devuelve las métricas o None
+    si falló (el savepoint se descarta y se procesa payload por payload).
+    """
+    try:
+        with db.session.begin_nested():
+            resultados = _guardar_payloads(lote)
+    except Exception as e:
+        print(f"[WHATSAPP COLA] Lote de {len(lote)} payloads falló, se procesan de a uno: {e}")
+        return None
+    _marcar_procesados(lote)
+    return resultados
+
+
+def procesar_pendiente(pendiente):
+    """
+    Procesa un payload dentro de un savepoint y actualiza su estado.
+    Devuelve las métricas a sumar.
+    """
+    try:
+        with db.session.begin_nested():
+            resultados = _guardar_payloads([pendiente])
+        _marcar_procesados([pendiente])
+        return resultados
+    except Exception as e:
+        pendiente.intentos = (pendiente.intentos or 0) + 1
+        pendiente.ultimo_error = str(e)[:2000]
+        if pendiente.intentos >= MAX_INTENTOS:
+            pendiente.estado = 'error'
+            print(f"[WHATSAPP COLA] Payload {pendiente.id} falló {pendiente.intentos} veces: {e}")
+            return {'fallidos': 1}
+        pendiente.estado = 'pendiente'
+        return {'reintentos': 1}
+
+
+def liberar_abandonados():
+    """Devuelve a 'pendiente' los payloads que quedaron en 'procesando'"""
+    limite = ahora_argentina() - TIMEOUT_PROCESANDO
+    liberados = WAWebhookPendiente.query.filter(
+        WAWebhookPendiente.estado == 'procesando',
+        WAWebhookPendiente.tomado_at < limite
+    ).update({'estado': 'pendiente'}, synchronize_session=False)
+    db.session.commit()
+    return liberados
+
+
+def purgar_procesados():
+    borrados = WAWebhookPendiente.query.filter(
+        WAWebhookPendiente.estado == 'procesado',
+        WAWebhookPendiente.procesado_at < ahora_argentina() - RETENCION_PROCESADOS
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return borrados
+
+
+def drenar_cola(presupuesto_segundos=PRESUPUESTO_DRENAJE_SEGUNDOS):
+    """
+    Libera los abandonados y procesa lotes en el request hasta vaciar la cola
+    o agotar el presupuesto. También (re)arranca los workers del proceso.
+    Devuelve {'liberados', 'payloads', 'lotes'}.
+    """
+    limite = time.perf_counter() + presupuesto_segundos
+    liberados = liberar_abandonados()
+    payloads, lotes = 0, 0
+    while time.perf_counter() < limite:
+        tomados = procesar_lote()
+        if not tomados:
+            break
+        payloads += tomados
+        lotes += 1
+    iniciar_workers(current_app._get_current_object())
+    return {'liberados': liberados, 'payloads': payloads, 'lotes': lotes}
+
+
+def reencolar_fallidos(ids=None):
+    """Vuelve a encolar payloads en 'error' (todos o los ids dados)"""
+    query = WAWebhookPendiente.query.filter(WAWebhookPendiente.estado == 'error')
+    if ids:
+        query = query.filter(WAWebhookPendiente.id.in_(ids))
+    reencolados = query.update({'estado': 'pendiente', 'intentos': 0}, synchronize_session=False)
+    db.session.commit()
+    if reencolados:
+        iniciar_workers(current_app._get_current_object())
+        _despertar.set()
+    return reencolados
+
+
+def estadisticas_cola():
+    """Conteo por estado, antigüedad del pendiente más viejo y métricas del proceso"""
+    por_estado = dict(db.session.query(
+        WAWebhookPendiente.estado, func.count(WAWebhookPendiente.id)
+    ).group_by(WAWebhookPendiente.estado).all())
+
+    mas_antiguo = db.session.query(func.min(WAWebhookPendiente.recibido_at)).filter(
+        WAWebhookPendiente.estado == 'pendiente'
+    ).scalar()
+
+    pendientes = por_estado.get('pendiente', 0)
+    return {
+        'por_estado': {estado: por_estado.get(estado, 0) for estado in ('pendiente', 'procesando', 'procesado', 'error')},
+        'demora_segundos': int((ahora_argentina() - mas_antiguo).total_seconds()) if mas_antiguo else 0,
+        'backpressure': pendientes > UMBRAL_BACKPRESSURE,
+        'umbral_backpressure': UMBRAL_BACKPRESSURE,
+        'workers_activos': sum(1 for w in _workers if w.is_alive()),
+        'proceso': metricas.to_dict(),
+    }
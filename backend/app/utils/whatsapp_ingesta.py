@@ -0,0 +1,565 @@
+"""
+Ingesta de mensajes de Evolution API (WhatsApp).
+
+Separa el parseo del payload (sin DB) del guardado (contacto, conversación,
+mensaje y contadores), para usarlo tanto desde el webhook sincrónico como
+desde los workers de la cola (app/utils/whatsapp_cola.py).
+
+guardar_mensajes() es el camino por lotes (history sync, payloads con varios
+mensajes y lotes de la cola): resuelve duplicados, contactos, conversaciones,
+mensajes y contadores con una cantidad fija de queries, sin importar cuántos
+mensajes traiga el lote.
+
+El vendedor de cada instancia y el id de contacto por número se resuelven
+con caches TTL/LRU del proceso (app/utils/cache.py) que se invalidan cuando
+se modifican usuarios o contactos por el ORM.
+"""
+from datetime import datetime
+from sqlalchemy import select, update, case, bindparam, event
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+from app import db
+from app.models import Usuario
+from app.models_whatsapp import WAContacto, WAConversacion, WAMensaje
+from app.utils.timezone import ahora_argentina, AR_TIMEZONE
+from app.utils.whatsapp_utils import normalizar_numero_argentino, whatsapp_jid_a_numero
+from app.utils.pubsub import publicar_al_confirmar
+from app.utils.cache import CacheTTL
+from app.utils.pendientes_sesion import agregar_pendiente, tomar_pendientes
+from app.models_whatsapp_stats import sumar_stats
+
+# Mapeo instancia Evolution API -> telefono del vendedor
+INSTANCIA_TELEFONO = {
+    'vendedora_juana': '5491122905495',
+    'vendedora_delfina': '5491140504258',
+    'vendedora_traiana': '5491131642113',
+    'vendedora_ignacio': '5491128394047',
+    'whatsapp_nuevo': '5491156574088',
+}
+
+# Máximo de valores por cláusula IN
+TAMANO_IN = 1000
+
+# instancia -> (telefono_vendedor, usuario_id, nombre_usuario)
+cache_vendedores = CacheTTL('vendedores_por_instancia', maximo=64, ttl=300)
+
+# numero_normalizado -> contacto_id (solo contactos ya confirmados en la DB)
+cache_contactos = CacheTTL('contactos_por_numero', maximo=20000, ttl=600)
+
+
+def _cargar_vendedor(instance):
+    telefono = INSTANCIA_TELEFONO.get(instance)
+    if not telefono:
+        return None, None, None
+    usuario = Usuario.query.filter_by(telefono=telefono).first()
+    return telefono, (usuario.id if usuario else None), (usuario.nombre if usuario else None)
+
+
+def resolver_vendedor(instance):
+    """(telefono_vendedor, usuario_id, nombre) del vendedor CRM de la instancia"""
+    return cache_vendedores.obtener_o_cargar(instance, _cargar_vendedor)
+
+
+def resolver_contactos(numeros):
+    """
+    {numero_normalizado: contacto_id} de los números que ya existen.
+    Los que no están en cache se buscan juntos con un IN.
+    """
+    encontrados = {}
+    faltan = []
+    for numero in set(numeros):
+        contacto_id = cache_contactos.obtener(numero)
+        if contacto_id is None:
+            faltan.append(numero)
+        else:
+            encontrados[numero] = contacto_id
+
+    for bloque in _en_bloques(faltan):
+        filas = db.session.execute(
+            select(WAContacto.numero_normalizado, WAContacto.id).where(WAContacto.numero_normalizado.in_(bloque))
+        ).all()
+        encontrados.update(filas)
+        _cachear_al_confirmar(filas)
+    return encontrados
+
+
+def _cachear_al_confirmar(filas):
+    # Un contacto recién insertado puede desaparecer con un rollback: se cachea al confirmar
+    session = db.session()
+    for fila in filas:
+        agregar_pendiente(session, 'contactos', tuple(fila))
+
+
+def estadisticas_caches():
+    return [cache_vendedores.estadisticas(), cache_contactos.estadisticas()]
+
+
+def mensajes_del_payload(payload):
+    """
+    Lista de mensajes de un payload de Evolution API. `data` puede ser un
+    mensaje, una lista de mensajes o {'messages': [...]} (messages.set).
+    """
+    data = payload.get('data') or {}
+    if isinstance(data, list):
+        return data
+    if isinstance(data.get('messages'), list):
+        return data['messages']
+    return [data]
+
+
+def extraer_contenido(message):
+    """(texto, tipo_mensaje, tiene_multimedia) según el tipo de mensaje"""
+    if 'conversation' in message:
+        return message['conversation'], 'text', False
+    if 'extendedTextMessage' in message:
+        return message['extendedTextMessage'].get('text', ''), 'text', False
+    if 'imageMessage' in message:
+        return message['imageMessage'].get('caption', '[Imagen]'), 'image', True
+    if 'audioMessage' in message:
+        return '[Audio]', 'audio', True
+    if 'videoMessage' in message:
+        return message['videoMessage'].get('caption', '[Video]'), 'video', True
+    if 'documentMessage' in message:
+        return message['documentMessage'].get('fileName', '[Documento]'), 'document', True
+    if 'stickerMessage' in message:
+        return '[Sticker]', 'sticker', False
+    if 'contactMessage' in message:
+        return '[Contacto]', 'contact', False
+    if 'locationMessage' in message:
+        return '[Ubicación]', 'location', False
+    return None, 'text', False
+
+
+def parsear_mensaje(instance, message_data):
+    """
+    Valida y normaliza un mensaje de messages.upsert (sin tocar la DB).
+
+    Returns:
+        (datos, None) si el mensaje es válido, o
+        (None, (respuesta_dict, status_http)) si se ignora o es inválido
+    """
+    key = message_data.get('key', {})
+    remote_jid = key.get('remoteJid')
+    from_me = key.get('fromMe', False)
+    mensaje_id = key.get('id')
+
+    # Validar datos mínimos
+    if not remote_jid or not mensaje_id:
+        return None, ({'status': 'error', 'message': 'Missing remoteJid or mensaje_id'}, 400)
+
+    # Ignorar mensajes de grupos (terminan en @g.us)
+    if remote_jid.endswith('@g.us'):
+        return None, ({'status': 'ignored', 'reason': 'group message'}, 200)
+
+    texto, tipo_mensaje, tiene_multimedia = extraer_contenido(message_data.get('message') or {})
+
+    # Timestamp
+    timestamp = message_data.get('messageTimestamp', 0)
+    if isinstance(timestamp, str):
+        timestamp = int(timestamp)
+    fecha_mensaje = datetime.fromtimestamp(timestamp, tz=AR_TIMEZONE).replace(tzinfo=None) if timestamp else ahora_argentina()
+
+    # Normalizar número
+    numero = whatsapp_jid_a_numero(remote_jid)
+    numero_normalizado = normalizar_numero_argentino(numero)
+
+    if not numero_normalizado:
+        return None, ({'status': 'error', 'message': 'Could not normalize phone number'}, 400)
+
+    return {
+        'instance': instance,
+        'remote_jid': remote_jid,
+        'from_me': from_me,
+        'mensaje_id': mensaje_id,
+        'texto': texto,
+        'tipo_mensaje': tipo_mensaje,
+        'tiene_multimedia': tiene_multimedia,
+        'multimedia_url': None,
+        'timestamp': timestamp,
+        'fecha_mensaje': fecha_mensaje,
+        'numero': numero,
+        'numero_normalizado': numero_normalizado,
+        'message_data': message_data,
+    }, None
+
+
+def parsear_payload(payload):
+    """
+    Parsea todos los mensajes de un payload.
+
+    Returns:
+        (lista de datos válidos, lista de (respuesta_dict, status_http) descartados)
+    """
+    instance = payload.get('instance', 'whatsapp_nuevo')
+    validos, descartados = [], []
+    for message_data in mensajes_del_payload(payload):
+        datos, error = parsear_mensaje(instance, message_data or {})
+        if error:
+            descartados.append(error)
+        else:
+            validos.append(datos)
+    return validos, descartados
+
+
+def guardar_mensaje(datos):
+    """
+    Guarda un mensaje parseado: contacto, conversación, mensaje y contadores.
+    No hace commit (lo decide quien llama).
+
+    Returns:
+        dict con el resultado ('success' o 'duplicate')
+    """
+    instance = datos['instance']
+    remote_jid = datos['remote_jid']
+
+    # 1. Buscar o crear contacto (id cacheado por número)
+    contacto_id = resolver_contactos([datos['numero_normalizado']]).get(datos['numero_normalizado'])
+
+    if not contacto_id:
+        contacto = WAContacto(
+            numero_original=datos['numero'],
+            numero_normalizado=datos['numero_normalizado'],
+            numero_whatsapp=remote_jid,
+            estado='nuevo'
+        )
+        db.session.add(contacto)
+        db.session.flush()
+        contacto_id = contacto.id
+        _cachear_al_confirmar([(datos['numero_normalizado'], contacto_id)])
+
+    # 2. Identificar vendedor CRM por instancia (cacheado)
+    telefono_vendedor, usuario_id, usuario_nombre = resolver_vendedor(instance)
+
+    # 3. Buscar o crear conversación (clave: contacto + remote_jid + instancia)
+    conversacion = WAConversacion.query.filter_by(
+        contacto_id=contacto_id,
+        remote_jid=remote_jid,
+        instancia_nombre=instance
+    ).first()
+
+    if not conversacion:
+        conversacion = WAConversacion(
+            contacto_id=contacto_id,
+            remote_jid=remote_jid,
+            instancia_nombre=instance,
+            usuario_id=usuario_id,
+            vendedor_numero=telefono_vendedor or '',
+            vendedor_nombre=usuario_nombre or 'Vendedor',
+            ultima_actividad=datos['fecha_mensaje']
+        )
+        db.session.add(conversacion)
+        db.session.flush()
+
+    # 4. Verificar si el mensaje ya existe (evitar duplicados)
+    mensaje_existente = WAMensaje.query.filter_by(mensaje_id=datos['mensaje_id']).first()
+
+    if mensaje_existente:
+        return {'status': 'duplicate', 'mensaje_id': datos['mensaje_id']}
+
+    # 5. Guardar mensaje
+    nuevo_mensaje = WAMensaje(
+        conversacion_id=conversacion.id,
+        mensaje_id=datos['mensaje_id'],
+        texto=datos['texto'],
+        tipo_mensaje=datos['tipo_mensaje'],
+        es_enviado=datos['from_me'],
+        from_me=datos['from_me'],
+        numero_remitente=remote_jid,
+        timestamp=datos['timestamp'],
+        fecha_mensaje=datos['fecha_mensaje'],
+        tiene_multimedia=datos['tiene_multimedia'],
+        multimedia_url=datos['multimedia_url'],
+        mensaje_completo_json=datos['message_data']
+    )
+    db.session.add(nuevo_mensaje)
+
+    # 6. Actualizar contadores de conversación (incremento atómico en SQL)
+    sumar_contadores({conversacion.id: {
+        'enviados': 1 if datos['from_me'] else 0,
+        'recibidos': 0 if datos['from_me'] else 1,
+        'ultima_actividad': datos['fecha_mensaje'],
+    }})
+    db.session.expire(conversacion, ['total_mensajes', 'mensajes_enviados', 'mensajes_recibidos',
+                                     'ultima_actividad', 'fecha_actualizacion'])
+
+    return {
+        'status': 'success',
+        'contacto_id': contacto_id,
+        'conversacion_id': conversacion.id,
+        'mensaje_id': datos['mensaje_id'],
+        'tipo': datos['tipo_mensaje'],
+        'from_me': datos['from_me']
+    }
+
+
+def _en_bloques(valores):
+    valores = list(valores)
+    for i in range(0, len(valores), TAMANO_IN):
+        yield valores[i:i + TAMANO_IN]
+
+
+def _insertar_ignorando(tabla, filas, index_elements):
+    """
+    INSERT multi-fila que ignora las filas que chocan con una clave única.
+    Devuelve cuántas filas se insertaron realmente.
+    """
+    if db.session.get_bind().dialect.name == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(tabla).prefix_with('IGNORE')
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(tabla).on_conflict_do_nothing(index_elements=index_elements)
+    return db.session.execute(stmt, filas).rowcount
+
+
+def sumar_contadores(deltas):
+    """
+    Suma en SQL los contadores de cada conversación (sin leerlos antes):
+    UPDATE ... SET total_mensajes = total_mensajes + n es atómico, así dos
+    entregas simultáneas del mismo chat no pierden cuentas.
+    deltas: {conversacion_id: {'enviados', 'recibidos', 'ultima_actividad'}}
+    ultima_actividad solo avanza: un mensaje viejo (history sync) no la atrasa.
+    Las filas van ordenadas por id para que dos workers tomen los locks en el
+    mismo orden y no se bloqueen mutuamente.
+    """
+    if not deltas:
+        return
+    tabla = WAConversacion.__table__
+    fecha = bindparam('b_fecha')
+    stmt = update(tabla).where(tabla.c.id == bindparam('b_id')).values(
+        total_mensajes=db.func.coalesce(tabla.c.total_mensajes, 0) + bindparam('b_enviados') + bindparam('b_recibidos'),
+        mensajes_enviados=db.func.coalesce(tabla.c.mensajes_enviados, 0) + bindparam('b_enviados'),
+        mensajes_recibidos=db.func.coalesce(tabla.c.mensajes_recibidos, 0) + bindparam('b_recibidos'),
+        ultima_actividad=case((tabla.c.ultima_actividad < fecha, fecha), else_=tabla.c.ultima_actividad),
+        fecha_actualizacion=ahora_argentina(),
+    )
+    db.session.execute(stmt, [
+        {'b_id': conversacion_id, 'b_enviados': d['enviados'], 'b_recibidos': d['recibidos'], 'b_fecha': d['ultima_actividad']}
+        for conversacion_id, d in sorted(deltas.items())
+    ])
+
+
+def guardar_mensajes(lista_datos):
+    """
+    Guarda un lote de mensajes parseados (ver parsear_mensaje).
+    No hace commit (lo decide quien llama).
+
+    1. Un IN para descartar los mensaje_id que ya existen
+    2. Un upsert multi-fila de contactos y otro de conversaciones
+    3. Un INSERT multi-fila de mensajes por conversación y sentido
+    4. Contadores agregados por conversación, con lo realmente insertado
+
+    Returns:
+        dict con guardados, duplicados y conversaciones afectadas
+    """
+    # Duplicados dentro del mismo lote: se queda el primero
+    unicos = {}
+    for datos in lista_datos:
+        unicos.setdefault(datos['mensaje_id'], datos)
+
+    existentes = set()
+    for bloque in _en_bloques(unicos):
+        existentes.update(db.session.execute(
+            select(WAMensaje.mensaje_id).where(WAMensaje.mensaje_id.in_(bloque))
+        ).scalars())
+
+    nuevos = [datos for mensaje_id, datos in unicos.items() if mensaje_id not in existentes]
+    resultado = {
+        'status': 'success',
+        'guardados': len(nuevos),
+        'duplicados': len(lista_datos) - len(nuevos),
+        'conversaciones': [],
+    }
+    if not nuevos:
+        return resultado
+
+    ahora = ahora_argentina()
+
+    # 1. Contactos (clave única numero_normalizado); los existentes no se tocan
+    contacto_ids = resolver_contactos(d['numero_normalizado'] for d in nuevos)
+    contactos = {}
+    for datos in nuevos:
+        if datos['numero_normalizado'] in contacto_ids:
+            continue
+        contactos.setdefault(datos['numero_normalizado'], {
+            'numero_original': datos['numero'],
+            'numero_normalizado': datos['numero_normalizado'],
+            'numero_whatsapp': datos['remote_jid'],
+            'estado': 'nuevo',
+            'es_cliente': False,
+            'fecha_creacion': ahora,
+            'fecha_actualizacion': ahora,
+        })
+    stats = {}
+    if contactos:
+        insertados = _insertar_ignorando(WAContacto.__table__, list(contactos.values()), ['numero_normalizado'])
+        stats.update(contactos_total=insertados, contactos_nuevos=insertados)
+        contacto_ids.update(resolver_contactos(contactos))
+
+    # 3. Conversaciones (clave: contacto + remote_jid + instancia)
+    conversaciones = {}
+    for datos in nuevos:
+        clave = (contacto_ids[datos['numero_normalizado']], datos['remote_jid'], datos['instance'])
+        if clave in conversaciones:
+            continue
+        # 2. Vendedor CRM de la instancia (cacheado)
+        telefono_vendedor, usuario_id, usuario_nombre = resolver_vendedor(datos['instance'])
+        conversaciones[clave] = {
+            'contacto_id': clave[0],
+            'remote_jid': clave[1],
+            'instancia_nombre': clave[2],
+            'usuario_id': usuario_id,
+            'vendedor_numero': telefono_vendedor or '',
+            'vendedor_nombre': usuario_nombre or 'Vendedor',
+            'estado': 'abierta',
+            'ultima_actividad': datos['fecha_mensaje'],
+            'total_mensajes': 0,
+            'mensajes_recibidos': 0,
+            'mensajes_enviados': 0,
+            'fecha_creacion': ahora,
+            'fecha_actualizacion': ahora,
+        }
+    insertadas = _insertar_ignorando(WAConversacion.__table__, list(conversaciones.values()),
+                                     ['contacto_id', 'remote_jid', 'instancia_nombre'])
+    stats.update(conversaciones_total=insertadas, conversaciones_abiertas=insertadas)
+
+    conversacion_ids = {}
+    usuario_por_conversacion = {}
+    for bloque in _en_bloques({clave[0] for clave in conversaciones}):
+        filas = db.session.execute(
+            select(WAConversacion.contacto_id, WAConversacion.remote_jid, WAConversacion.instancia_nombre,
+                   WAConversacion.id, WAConversacion.usuario_id)
+            .where(WAConversacion.contacto_id.in_(bloque))
+        ).all()
+        for contacto_id, remote_jid, instancia, conversacion_id, usuario_id in filas:
+            conversacion_ids[(contacto_id, remote_jid, instancia)] = conversacion_id
+            usuario_por_conversacion[conversacion_id] = usuario_id
+
+    # 4. Mensajes (IGNORE por si otro worker insertó el mismo mensaje_id en
+    # paralelo). Un INSERT por conversación y sentido: su rowcount dice
+    # cuántos entraron de verdad, y solo eso se suma a los contadores.
+    grupos = {}
+    for datos in nuevos:
+        conversacion_id = conversacion_ids[(contacto_ids[datos['numero_normalizado']], datos['remote_jid'], datos['instance'])]
+        grupos.setdefault((conversacion_id, bool(datos['from_me'])), []).append({
+            'conversacion_id': conversacion_id,
+            'mensaje_id': datos['mensaje_id'],
+            'texto': datos['texto'],
+            'tipo_mensaje': datos['tipo_mensaje'],
+            'es_enviado': datos['from_me'],
+            'from_me': datos['from_me'],
+            'numero_remitente': datos['remote_jid'],
+            'timestamp': datos['timestamp'],
+            'fecha_mensaje': datos['fecha_mensaje'],
+            'fecha_creacion_bd': ahora,
+            'tiene_multimedia': datos['tiene_multimedia'],
+            'multimedia_url': datos['multimedia_url'],
+            'mensaje_completo_json': datos['message_data'],
+        })
+    deltas = {}
+    for (conversacion_id, enviado), filas in sorted(grupos.items()):
+        insertados = _insertar_ignorando(WAMensaje.__table__, filas, ['mensaje_id'])
+        if not insertados:
+            continue
+        delta = deltas.setdefault(conversacion_id, {'enviados': 0, 'recibidos': 0, 'ultima_actividad': filas[0]['fecha_mensaje']})
+        delta['enviados' if enviado else 'recibidos'] += insertados
+        delta['ultima_actividad'] = max(delta['ultima_actividad'], *(f['fecha_mensaje'] for f in filas))
+
+    guardados = sum(d['enviados'] + d['recibidos'] for d in deltas.values())
+    resultado['guardados'] = guardados
+    resultado['duplicados'] = len(lista_datos) - guardados
+
+    # 5. Contadores: un UPDATE por conversación con los totales del lote
+    sumar_contadores(deltas)
+
+    # Contadores globales de /stats (el INSERT multi-fila no pasa por el listener del ORM)
+    stats['mensajes_enviados'] = sum(d['enviados'] for d in deltas.values())
+    stats['mensajes_recibidos'] = sum(d['recibidos'] for d in deltas.values())
+    stats['mensajes_total'] = stats['mensajes_enviados'] + stats['mensajes_recibidos']
+    sumar_stats(db.session.connection(), stats)
+
+    # El INSERT multi-fila no pasa por los listeners del ORM: un aviso por conversación
+    for conversacion_id, delta in deltas.items():
+        usuario_id = usuario_por_conversacion.get(conversacion_id)
+        publicar_al_confirmar(db.session(), 'whatsapp', {
+            'conversacion_id': conversacion_id,
+            'mensajes': delta['enviados'] + delta['recibidos'],
+        }, usuarios=[usuario_id] if usuario_id else [], roles=['admin'])
+
+    resultado['conversaciones'] = sorted(deltas)
+    return resultado
+
+
+def reconciliar_contadores():
+    """
+    Recalcula los contadores de las conversaciones desde mensajes (red de
+    seguridad por si algún camino de escritura se desvió).
+
+    Una query agrupada detecta las conversaciones desfasadas y un UPDATE con
+    subconsultas correlacionadas las corrige: el conteo se hace en el momento
+    del UPDATE, así no pisa mensajes que entraron mientras tanto.
+
+    Returns:
+        list de {'conversacion_id', 'antes', 'despues'} corregidas
+    """
+    conteos = select(
+        WAMensaje.conversacion_id.label('conversacion_id'),
+        db.func.count(WAMensaje.id).label('total'),
+        db.func.sum(case((WAMensaje.from_me == True, 1), else_=0)).label('enviados'),
+    ).group_by(WAMensaje.conversacion_id).subquery()
+
+    total = db.func.coalesce(conteos.c.total, 0)
+    enviados = db.func.coalesce(conteos.c.enviados, 0)
+    desfasadas = db.session.execute(
+        select(
+            WAConversacion.id, WAConversacion.total_mensajes, WAConversacion.mensajes_enviados,
+            WAConversacion.mensajes_recibidos, total, enviados,
+        ).outerjoin(conteos, conteos.c.conversacion_id == WAConversacion.id).where(db.or_(
+            db.func.coalesce(WAConversacion.total_mensajes, -1) != total,
+            db.func.coalesce(WAConversacion.mensajes_enviados, -1) != enviados,
+            db.func.coalesce(WAConversacion.mensajes_recibidos, -1) != total - enviados,
+        ))
+    ).all()
+    if not desfasadas:
+        return []
+
+    ids = [fila[0] for fila in desfasadas]
+    tabla = WAConversacion.__table__
+    mensajes = WAMensaje.__table__
+
+    def contar(*condiciones):
+        return select(db.func.count(mensajes.c.id)).where(
+            mensajes.c.conversacion_id == tabla.c.id, *condiciones
+        ).scalar_subquery()
+
+    for bloque in _en_bloques(ids):
+        db.session.execute(update(tabla).where(tabla.c.id.in_(bloque)).values(
+            total_mensajes=contar(),
+            mensajes_enviados=contar(mensajes.c.from_me == True),
+            mensajes_recibidos=contar(mensajes.c.from_me == False),
+        ))
+
+    return [{
+        'conversacion_id': conversacion_id,
+        'antes': {'total': total_antes, 'enviados': enviados_antes, 'recibidos': recibidos_antes},
+        'despues': {'total': total_nuevo, 'enviados': int(enviados_nuevo), 'recibidos': total_nuevo - int(enviados_nuevo)},
+    } for conversacion_id, total_antes, enviados_antes, recibidos_antes, total_nuevo, enviados_nuevo in desfasadas]
+
+
+# ==================== INVALIDACIÓN DE CACHES ====================
+
+@event.listens_for(Session, 'after_flush')
+def _invalidar_caches(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Usuario):
+            # Pocas instancias: ante cualquier cambio de usuarios se vacía entero
+            cache_vendedores.invalidar()
+        elif isinstance(obj, WAContacto) and obj not in session.new:
+            for numero in [obj.numero_normalizado] + list(get_history(obj, 'numero_normalizado').deleted or []):
+                cache_contactos.invalidar(numero)
+
+
+@event.listens_for(Session, 'after_commit')
+def _cachear_contactos(session):
+    for numero, contacto_id in tomar_pendientes(session, 'contactos'):
+        cache_contactos.guardar(numero, contacto_id)
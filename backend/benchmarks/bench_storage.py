@@ -0,0 +1,107 @@
+"""
+Benchmark: throughput de subida y descarga de comprobantes contra cada
+backend de app/utils/storage.py (local y GCS).
+
+Sube --archivos archivos de --mb MB con --hilos subidas en paralelo, los
+lee completos (leer) y en streaming (stream, pedazos de 1 MB) y mide MB/s
+de cada operación. Al final borra todo lo que subió.
+
+Uso:
+    python benchmarks/bench_storage.py                       # local, en un directorio temporal
+    python benchmarks/bench_storage.py --dir /mnt/disco --archivos 50 --mb 8 --hilos 4
+    BENCH_GCS_BUCKET=crm-bench python benchmarks/bench_storage.py --backends local,gcs
+
+Para GCS usa las credenciales por defecto (gcloud auth application-default
+login). NUNCA apuntar al bucket de producción: el script escribe y borra
+bajo bench/<uuid>/.
+"""
+import sys
+import os
+import io
+import time
+import uuid
+import shutil
+import tempfile
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.utils.storage import StorageLocal, StorageGCS, GCP_BUCKET_NAME
+
+
+def crear_backend(nombre, args):
+    """(backend, función de limpieza)"""
+    if nombre == 'local':
+        if args.dir:
+            return StorageLocal(args.dir, 'bench'), None
+        raiz = tempfile.mkdtemp(prefix='bench_storage_')
+        return StorageLocal(raiz, 'bench'), lambda: shutil.rmtree(raiz, ignore_errors=True)
+
+    bucket = os.getenv('BENCH_GCS_BUCKET')
+    if not bucket:
+        sys.exit('Para --backends gcs definir BENCH_GCS_BUCKET')
+    if bucket == GCP_BUCKET_NAME:
+        sys.exit(f'BENCH_GCS_BUCKET no puede ser el bucket de producción ({GCP_BUCKET_NAME})')
+    return StorageGCS(bucket), None
+
+
+def medir(operacion, paths, hilos):
+    """Segundos que tarda aplicar `operacion` a todos los paths con `hilos` en paralelo"""
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        list(pool.map(operacion, paths))
+    return time.perf_counter() - t0
+
+
+def correr(nombre, backend, args):
+    contenido = os.urandom(args.mb * 1024 * 1024)
+    prefijo = f'bench/{uuid.uuid4().hex}'
+    paths = [f'{prefijo}/{i}.bin' for i in range(args.archivos)]
+    total_mb = args.mb * args.archivos
+
+    def subir(path):
+        backend.subir(io.BytesIO(contenido), path, content_type='application/octet-stream')
+
+    def leer(path):
+        assert len(backend.leer(path)) == len(contenido)
+
+    def stream(path):
+        assert sum(len(pedazo) for pedazo in backend.stream(path)) == len(contenido)
+
+    resultados = {}
+    try:
+        for operacion, funcion in (('subir', subir), ('leer', leer), ('stream', stream)):
+            segundos = medir(funcion, paths, args.hilos)
+            resultados[operacion] = (segundos, total_mb / segundos)
+    finally:
+        for path in paths:
+            try:
+                backend.eliminar(path)
+            except Exception:
+                pass
+
+    for operacion, (segundos, mb_s) in resultados.items():
+        print(f'{nombre:<6} {operacion:<7} {total_mb:>6} MB  {segundos:8.2f} s  {mb_s:9.1f} MB/s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backends', default='local', help='lista separada por comas: local,gcs')
+    parser.add_argument('--archivos', type=int, default=20)
+    parser.add_argument('--mb', type=int, default=4, help='tamaño de cada archivo en MB')
+    parser.add_argument('--hilos', type=int, default=1, help='operaciones en paralelo')
+    parser.add_argument('--dir', help='raíz del backend local (default: directorio temporal)')
+    args = parser.parse_args()
+
+    print(f'{args.archivos} archivos de {args.mb} MB, {args.hilos} hilo(s)')
+    for nombre in args.backends.split(','):
+        backend, limpiar = crear_backend(nombre.strip(), args)
+        try:
+            correr(nombre.strip(), backend, args)
+        finally:
+            if limpiar:
+                limpiar()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Migración: Índices FULLTEXT para la búsqueda (/api/busqueda)
+- mensajes.ft_mensajes_texto (texto)
+- conversacion_mail.ft_conversacion_mail_asunto_mensaje (asunto, mensaje)
+
+MATCH ... AGAINST necesita un índice FULLTEXT con exactamente esas columnas.
+En tablas grandes el ALTER tarda (InnoDB reconstruye el índice completo).
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import create_app, db
+from sqlalchemy import text
+
+INDICES = {
+    'mensajes': {
+        'ft_mensajes_texto': '(texto)',
+    },
+    'conversacion_mail': {
+        'ft_conversacion_mail_asunto_mensaje': '(asunto, mensaje)',
+    },
+}
+
+app = create_app()
+
+with app.app_context():
+    with db.engine.connect() as conn:
+        for tabla, indices in INDICES.items():
+            # Verificar qué índices ya existen
+            result = conn.execute(text(
+                "SELECT DISTINCT INDEX_NAME FROM INFORMATION_SCHEMA.STATISTICS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :tabla"
+            ), {'tabla': tabla})
+            existing = {row[0] for row in result}
+
+            for nombre, columnas in indices.items():
+                if nombre not in existing:
+                    conn.execute(text(f"ALTER TABLE {tabla} ADD FULLTEXT INDEX {nombre} {columnas}"))
+                    print(f"[OK] Índice FULLTEXT '{nombre}' agregado en {tabla}")
+                else:
+                    print(f"[-] Índice FULLTEXT '{nombre}' ya existe en {tabla}")
+
+        conn.commit()
+        print("Migracion completada.")
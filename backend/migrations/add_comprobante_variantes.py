@@ -0,0 +1,40 @@
+"""
+Migración: Agregar columnas para las versiones reducidas del comprobante
+- comprobante_preview (VARCHAR(500)): blob path del JPEG comprimido
+- comprobante_thumb (VARCHAR(500)): blob path de la miniatura
+
+Los comprobantes subidos antes quedan sin variantes y se sirven completos.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import create_app, db
+from sqlalchemy import text
+
+app = create_app()
+
+with app.app_context():
+    with db.engine.connect() as conn:
+        # Verificar si las columnas ya existen
+        result = conn.execute(text(
+            "SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'precheck_pagos' "
+            "AND COLUMN_NAME IN ('comprobante_preview', 'comprobante_thumb')"
+        ))
+        existing = [row[0] for row in result]
+
+        if 'comprobante_preview' not in existing:
+            conn.execute(text("ALTER TABLE precheck_pagos ADD COLUMN comprobante_preview VARCHAR(500) NULL AFTER comprobante_nombre"))
+            print("[OK] Columna 'comprobante_preview' agregada")
+        else:
+            print("[-] Columna 'comprobante_preview' ya existe")
+
+        if 'comprobante_thumb' not in existing:
+            conn.execute(text("ALTER TABLE precheck_pagos ADD COLUMN comprobante_thumb VARCHAR(500) NULL AFTER comprobante_preview"))
+            print("[OK] Columna 'comprobante_thumb' agregada")
+        else:
+            print("[-] Columna 'comprobante_thumb' ya existe")
+
+        conn.commit()
+        print("Migracion completada.")
@@ -0,0 +1,36 @@
+"""
+Migración: Índice para la bandeja de WhatsApp (/webhook/conversaciones)
+- conversaciones.idx_conversaciones_estado_actividad (estado, ultima_actividad, id)
+
+El listado filtra por estado y pagina por (ultima_actividad DESC, id DESC);
+con este índice cada página lee solo sus filas en lugar de ordenar la tabla.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import create_app, db
+from sqlalchemy import text
+
+app = create_app()
+
+with app.app_context():
+    with db.engine.connect() as conn:
+        # Verificar si el índice ya existe
+        result = conn.execute(text(
+            "SELECT DISTINCT INDEX_NAME FROM INFORMATION_SCHEMA.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'conversaciones'"
+        ))
+        existing = {row[0] for row in result}
+
+        if 'idx_conversaciones_estado_actividad' not in existing:
+            conn.execute(text(
+                "ALTER TABLE conversaciones ADD INDEX idx_conversaciones_estado_actividad "
+                "(estado, ultima_actividad, id)"
+            ))
+            print("[OK] Índice 'idx_conversaciones_estado_actividad' agregado")
+        else:
+            print("[-] Índice 'idx_conversaciones_estado_actividad' ya existe")
+
+        conn.commit()
+        print("Migracion completada.")
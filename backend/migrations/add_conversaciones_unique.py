@@ -0,0 +1,73 @@
+"""
+Migración: Clave única en conversaciones (contacto_id, remote_jid, instancia_nombre)
+- Fusiona conversaciones duplicadas en la más antigua (mueve sus mensajes)
+- Recalcula los contadores de las conversaciones fusionadas
+- uq_conversaciones_contacto_jid_instancia UNIQUE (contacto_id, remote_jid, instancia_nombre)
+
+Necesaria para el upsert de la ingesta por lotes del webhook de WhatsApp.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import create_app, db
+from sqlalchemy import text
+
+app = create_app()
+
+with app.app_context():
+    with db.engine.connect() as conn:
+        # Verificar si el índice ya existe
+        result = conn.execute(text(
+            "SELECT DISTINCT INDEX_NAME FROM INFORMATION_SCHEMA.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'conversaciones'"
+        ))
+        existing = {row[0] for row in result}
+
+        if 'uq_conversaciones_contacto_jid_instancia' not in existing:
+            conn.execute(text(
+                "CREATE TEMPORARY TABLE conversaciones_fusion AS "
+                "SELECT c.id AS duplicada_id, MIN(previa.id) AS conservada_id "
+                "FROM conversaciones c "
+                "JOIN conversaciones previa ON previa.contacto_id = c.contacto_id "
+                "AND previa.remote_jid = c.remote_jid "
+                "AND previa.instancia_nombre = c.instancia_nombre AND previa.id < c.id "
+                "GROUP BY c.id"
+            ))
+
+            result = conn.execute(text(
+                "UPDATE mensajes m JOIN conversaciones_fusion f ON f.duplicada_id = m.conversacion_id "
+                "SET m.conversacion_id = f.conservada_id"
+            ))
+            print(f"[OK] {result.rowcount} mensajes movidos a la conversación conservada")
+
+            conn.execute(text(
+                "UPDATE conversaciones c JOIN ("
+                "  SELECT conversacion_id, COUNT(*) AS total, "
+                "  SUM(CASE WHEN from_me THEN 1 ELSE 0 END) AS enviados, "
+                "  MAX(fecha_mensaje) AS ultima "
+                "  FROM mensajes WHERE conversacion_id IN (SELECT DISTINCT conservada_id FROM conversaciones_fusion) "
+                "  GROUP BY conversacion_id"
+                ") m ON m.conversacion_id = c.id "
+                "SET c.total_mensajes = m.total, c.mensajes_enviados = m.enviados, "
+                "c.mensajes_recibidos = m.total - m.enviados, "
+                "c.ultima_actividad = GREATEST(c.ultima_actividad, m.ultima)"
+            ))
+
+            result = conn.execute(text(
+                "DELETE c FROM conversaciones c JOIN conversaciones_fusion f ON f.duplicada_id = c.id"
+            ))
+            print(f"[OK] {result.rowcount} conversaciones duplicadas fusionadas")
+
+            conn.execute(text("DROP TEMPORARY TABLE conversaciones_fusion"))
+
+            conn.execute(text(
+                "ALTER TABLE conversaciones ADD UNIQUE INDEX uq_conversaciones_contacto_jid_instancia "
+                "(contacto_id, remote_jid, instancia_nombre)"
+            ))
+            print("[OK] Índice único 'uq_conversaciones_contacto_jid_instancia' agregado")
+        else:
+            print("[-] Índice único 'uq_conversaciones_contacto_jid_instancia' ya existe")
+
+        conn.commit()
+        print("Migracion completada.")
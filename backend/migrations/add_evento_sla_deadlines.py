@@ -0,0 +1,59 @@
+"""
+Migración: Vencimientos SLA precalculados en eventos
+- sla_alerta_at (DATETIME, indexada)
+- sla_critico_at (DATETIME, indexada)
+
+Además recalcula ambos campos para todos los eventos según SLA_CONFIG.
+Volver a correrla si se cambian los umbrales de app/utils/sla.py.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import create_app, db
+from app.utils.sla import SLA_CONFIG
+from sqlalchemy import text
+
+COLUMNAS = {
+    'sla_alerta_at': 'ix_eventos_sla_alerta_at',
+    'sla_critico_at': 'ix_eventos_sla_critico_at',
+}
+
+app = create_app()
+
+with app.app_context():
+    with db.engine.connect() as conn:
+        # Verificar si las columnas ya existen
+        result = conn.execute(text(
+            "SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'eventos' "
+            "AND COLUMN_NAME IN ('sla_alerta_at', 'sla_critico_at')"
+        ))
+        existing = [row[0] for row in result]
+
+        for columna, indice in COLUMNAS.items():
+            if columna not in existing:
+                conn.execute(text(f"ALTER TABLE eventos ADD COLUMN {columna} DATETIME NULL"))
+                conn.execute(text(f"ALTER TABLE eventos ADD INDEX {indice} ({columna})"))
+                print(f"[OK] Columna '{columna}' agregada")
+            else:
+                print(f"[-] Columna '{columna}' ya existe")
+
+        # Backfill: un UPDATE por estado con SLA y uno para limpiar el resto
+        for estado, umbrales in SLA_CONFIG.items():
+            result = conn.execute(text(
+                "UPDATE eventos SET "
+                "sla_alerta_at = DATE_ADD(COALESCE(fecha_ultimo_cambio_estado, created_at), INTERVAL :alerta SECOND), "
+                "sla_critico_at = DATE_ADD(COALESCE(fecha_ultimo_cambio_estado, created_at), INTERVAL :critico SECOND) "
+                "WHERE estado = :estado"
+            ), {'estado': estado, 'alerta': umbrales['alerta'], 'critico': umbrales['critico']})
+            print(f"[OK] {estado}: {result.rowcount} eventos")
+
+        result = conn.execute(text(
+            "UPDATE eventos SET sla_alerta_at = NULL, sla_critico_at = NULL "
+            "WHERE estado NOT IN :estados AND (sla_alerta_at IS NOT NULL OR sla_critico_at IS NOT NULL)"
+        ).bindparams(db.bindparam('estados', expanding=True)), {'estados': list(SLA_CONFIG.keys())})
+        print(f"[OK] Sin SLA: {result.rowcount} eventos limpiados")
+
+        conn.commit()
+        print("Migracion completada.")
@@ -0,0 +1,44 @@
+"""
+Migración: Índices compuestos en eventos para queries de reportes
+- idx_eventos_estado_created_at (estado, created_at)
+- idx_eventos_estado_fecha_evento (estado, fecha_evento)
+- idx_eventos_local_created_at (local_id, created_at)
+- idx_eventos_comercial_estado (comercial_id, estado)
+
+Requiere que los filtros de fecha sean sargables (ver app/utils/filtros.py),
+si no MySQL no puede usar el rango sobre created_at/fecha_evento.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import create_app, db
+from sqlalchemy import text
+
+INDICES = {
+    'idx_eventos_estado_created_at': '(estado, created_at)',
+    'idx_eventos_estado_fecha_evento': '(estado, fecha_evento)',
+    'idx_eventos_local_created_at': '(local_id, created_at)',
+    'idx_eventos_comercial_estado': '(comercial_id, estado)',
+}
+
+app = create_app()
+
+with app.app_context():
+    with db.engine.connect() as conn:
+        # Verificar qué índices ya existen
+        result = conn.execute(text(
+            "SELECT DISTINCT INDEX_NAME FROM INFORMATION_SCHEMA.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'eventos'"
+        ))
+        existing = {row[0] for row in result}
+
+        for nombre, columnas in INDICES.items():
+            if nombre not in existing:
+                conn.execute(text(f"ALTER TABLE eventos ADD INDEX {nombre} {columnas}"))
+                print(f"[OK] Índice '{nombre}' agregado")
+            else:
+                print(f"[-] Índice '{nombre}' ya existe")
+
+        conn.commit()
+        print("Migracion completada.")
@@ -0,0 +1,42 @@
+"""
+Migración: Clave única en sla_violations (evento_id, estado)
+- Elimina duplicados previos (se conserva la violación más antigua)
+- uq_sla_violations_evento_estado UNIQUE (evento_id, estado)
+
+Necesaria para el INSERT IGNORE ... SELECT de /api/sla/check-violations.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import create_app, db
+from sqlalchemy import text
+
+app = create_app()
+
+with app.app_context():
+    with db.engine.connect() as conn:
+        # Verificar si el índice ya existe
+        result = conn.execute(text(
+            "SELECT DISTINCT INDEX_NAME FROM INFORMATION_SCHEMA.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'sla_violations'"
+        ))
+        existing = {row[0] for row in result}
+
+        if 'uq_sla_violations_evento_estado' not in existing:
+            result = conn.execute(text(
+                "DELETE v FROM sla_violations v "
+                "JOIN sla_violations previa ON previa.evento_id = v.evento_id "
+                "AND previa.estado = v.estado AND previa.id < v.id"
+            ))
+            print(f"[OK] {result.rowcount} violaciones duplicadas eliminadas")
+
+            conn.execute(text(
+                "ALTER TABLE sla_violations ADD UNIQUE INDEX uq_sla_violations_evento_estado (evento_id, estado)"
+            ))
+            print("[OK] Índice único 'uq_sla_violations_evento_estado' agregado")
+        else:
+            print("[-] Índice único 'uq_sla_violations_evento_estado' ya existe")
+
+        conn.commit()
+        print("Migracion completada.")
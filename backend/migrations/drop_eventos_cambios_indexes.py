@@ -0,0 +1,42 @@
+"""
+Migración: Quitar los índices del feed incremental viejo del Kanban
+- eventos.idx_eventos_updated_at
+- eventos.idx_eventos_ultimo_cambio_estado
+- evento_transiciones.idx_transiciones_created_at
+
+/api/eventos/cambios ahora lee cambios_tablero en lugar de filtrar eventos
+por "modificado desde X"; los índices solo encarecían cada escritura.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import create_app, db
+from sqlalchemy import text
+
+INDICES = {
+    'eventos': ['idx_eventos_updated_at', 'idx_eventos_ultimo_cambio_estado'],
+    'evento_transiciones': ['idx_transiciones_created_at'],
+}
+
+app = create_app()
+
+with app.app_context():
+    with db.engine.connect() as conn:
+        for tabla, indices in INDICES.items():
+            # Verificar qué índices existen
+            result = conn.execute(text(
+                "SELECT DISTINCT INDEX_NAME FROM INFORMATION_SCHEMA.STATISTICS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :tabla"
+            ), {'tabla': tabla})
+            existing = {row[0] for row in result}
+
+            for nombre in indices:
+                if nombre in existing:
+                    conn.execute(text(f"ALTER TABLE {tabla} DROP INDEX {nombre}"))
+                    print(f"[OK] Índice '{nombre}' eliminado de {tabla}")
+                else:
+                    print(f"[-] Índice '{nombre}' no existe en {tabla}")
+
+        conn.commit()
+        print("Migracion completada.")
@@ -0,0 +1,33 @@
+"""
+Migración: Registro de cambios del tablero
+- cambios_tablero la crea db.create_all al iniciar la app
+- Elimina revision_tablero (contador único, reemplazado por MAX(cambios_tablero.id))
+
+Los tokens de /api/eventos/cambios emitidos con el contador viejo quedan
+inválidos: el Kanban recarga una vez y sigue con los nuevos.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import create_app, db
+from sqlalchemy import text
+
+app = create_app()
+
+with app.app_context():
+    with db.engine.connect() as conn:
+        result = conn.execute(text(
+            "SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'revision_tablero'"
+        ))
+        existing = {row[0] for row in result}
+
+        if 'revision_tablero' in existing:
+            conn.execute(text("DROP TABLE revision_tablero"))
+            print("[OK] Tabla 'revision_tablero' eliminada")
+        else:
+            print("[-] Tabla 'revision_tablero' ya no existe")
+
+        conn.commit()
+        print("Migracion completada.")
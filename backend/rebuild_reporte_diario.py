@@ -0,0 +1,14 @@
+"""
+Script para reconstruir el rollup reporte_diario desde la tabla eventos.
+Usar para el backfill inicial o si se sospecha que el rollup quedó desfasado
+(por ejemplo, tras ediciones hechas directamente en la base de datos).
+Ejecutar: python rebuild_reporte_diario.py
+"""
+from app import create_app
+from app.models_reportes import reconstruir_reporte_diario
+
+app = create_app()
+
+with app.app_context():
+    filas = reconstruir_reporte_diario()
+    print(f"reporte_diario reconstruido: {filas} filas.")
@@ -0,0 +1,67 @@
+"""
+Fixtures de los tests del backend.
+
+Cada test corre contra una app nueva con SQLite en memoria y el storage en
+memoria (STORAGE_BACKEND='fake', PUBSUB_BACKEND='memoria'), así no hace
+falta MySQL ni GCS.
+
+Uso:
+    pip install pytest
+    cd backend && python -m pytest tests
+"""
+import sys
+import os
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import jwt
+import pytest
+
+from app.config import Config
+
+
+@pytest.fixture
+def app(monkeypatch):
+    # create_app lee Config y crea las tablas en el momento
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', 'sqlite://')
+    monkeypatch.setattr(Config, 'STORAGE_BACKEND', 'fake')
+    monkeypatch.setattr(Config, 'PUBSUB_BACKEND', 'memoria')
+    # Sin hilos de la cola: los tests la procesan con procesar_lote()/drenar
+    monkeypatch.setattr(Config, 'WHATSAPP_WORKERS_AL_INICIAR', False)
+    from app import create_app
+    from app.utils import pubsub, storage
+    monkeypatch.setattr(pubsub, '_backend', None)
+    monkeypatch.setattr(storage, '_storage', None)
+    storage.cache_signed_urls.invalidar()
+    # Los caches del proceso guardan ids de la base del test anterior
+    from app.utils.whatsapp_ingesta import cache_contactos, cache_vendedores
+    cache_contactos.invalidar()
+    cache_vendedores.invalidar()
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def crear_usuario(app):
+    """Crea un usuario y devuelve (usuario, headers con su JWT)"""
+    from app import db
+    from app.models import Usuario
+
+    def crear(rol='admin', nombre='Test'):
+        usuario = Usuario(nombre=nombre, email=f'{nombre.lower()}_{rol}@test', rol=rol, password_hash='x')
+        db.session.add(usuario)
+        db.session.commit()
+        token = jwt.encode({
+            'user_id': usuario.id,
+            'exp': datetime.utcnow() + timedelta(hours=1)
+        }, app.config['SECRET_KEY'], algorithm='HS256')
+        return usuario, {'Authorization': f'Bearer {token}'}
+
+    return crear
@@ -0,0 +1,102 @@
+"""
+calcular_monto_cerrado (una query agregada) contra el cálculo original
+evento por evento de calcular_kpis.
+"""
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import and_, func
+
+from app import db
+from app.models import Usuario, Cliente, Evento
+from app.models_precheck import PrecheckConcepto, PrecheckAdicional
+from app.routes.reportes import calcular_monto_cerrado
+from app.utils.filtros import filtro_rango_fechas
+
+DESDE = date(2026, 3, 1)
+HASTA = date(2026, 3, 31)
+
+
+def monto_cerrado_por_evento(filtro_periodo):
+    """El loop que reemplazó calcular_monto_cerrado (dos SUM por evento)"""
+    eventos_cerrados = Evento.query.filter(
+        filtro_periodo,
+        Evento.estado.in_(['APROBADO', 'CONCLUIDO'])
+    ).all()
+
+    monto_cerrado = Decimal('0')
+    for evento in eventos_cerrados:
+        total_conceptos = db.session.query(
+            func.sum(PrecheckConcepto.cantidad * PrecheckConcepto.precio_unitario)
+        ).filter(PrecheckConcepto.evento_id == evento.id).scalar() or Decimal('0')
+
+        total_adicionales = db.session.query(
+            func.sum(PrecheckAdicional.monto)
+        ).filter(PrecheckAdicional.evento_id == evento.id).scalar() or Decimal('0')
+
+        subtotal_precheck = Decimal(str(total_conceptos)) + Decimal(str(total_adicionales))
+
+        if subtotal_precheck > 0:
+            iva = subtotal_precheck * Decimal('0.21') if evento.facturada else Decimal('0')
+            monto_cerrado += subtotal_precheck + iva
+        elif evento.presupuesto:
+            monto_cerrado += Decimal(str(evento.presupuesto))
+    return monto_cerrado
+
+
+def crear_evento(estado='APROBADO', fecha=date(2026, 3, 10), facturada=False, presupuesto=None,
+                 conceptos=(), adicionales=()):
+    """conceptos: [(cantidad, precio_unitario)], adicionales: [monto]"""
+    comercial = Usuario.query.first()
+    cliente = Cliente(nombre='Cliente', telefono=f'11{Evento.query.count():06d}')
+    db.session.add(cliente)
+    db.session.flush()
+    evento = Evento(cliente_id=cliente.id, comercial_id=comercial.id, estado=estado, fecha_evento=fecha,
+                    facturada=facturada, presupuesto=presupuesto)
+    db.session.add(evento)
+    db.session.flush()
+    for cantidad, precio in conceptos:
+        db.session.add(PrecheckConcepto(evento_id=evento.id, categoria='Gastronomía', descripcion='x',
+                                        cantidad=cantidad, precio_unitario=precio))
+    for monto in adicionales:
+        db.session.add(PrecheckAdicional(evento_id=evento.id, categoria='Otros', descripcion='x', monto=monto))
+    return evento
+
+
+def filtro_marzo():
+    return and_(filtro_rango_fechas(Evento.fecha_evento, DESDE, HASTA), Evento.estado != 'ELIMINADO')
+
+
+def test_igual_al_calculo_por_evento(crear_usuario):
+    crear_usuario(rol='comercial')
+
+    # Con precheck: conceptos, adicionales o ambos, con y sin IVA
+    crear_evento(conceptos=[(2, '1500.50'), (1, '999.99')], facturada=True)
+    crear_evento(estado='CONCLUIDO', conceptos=[('3.5', '120.10')], presupuesto='50000')
+    crear_evento(adicionales=['700.00', '0.33'], facturada=True, presupuesto='1')
+    crear_evento(conceptos=[(10, '45.00')], adicionales=['250.00'], facturada=None)
+    # Sin precheck: presupuesto, o nada si el presupuesto es NULL
+    crear_evento(presupuesto='80000.00')
+    crear_evento(estado='CONCLUIDO', presupuesto='12345.67', facturada=True)
+    crear_evento(presupuesto=None)
+    crear_evento(estado='CONCLUIDO', presupuesto=None, facturada=True)
+    # Subtotal <= 0 (descuento como adicional negativo): cae al presupuesto
+    crear_evento(conceptos=[(1, '100.00')], adicionales=['-100.00'], presupuesto='3000.00')
+    # Fuera del cálculo: otros estados y otras fechas
+    crear_evento(estado='PERDIDO', conceptos=[(1, '999.00')], presupuesto='999.00')
+    crear_evento(estado='ELIMINADO', presupuesto='999.00')
+    crear_evento(fecha=date(2026, 4, 2), conceptos=[(1, '999.00')])
+    db.session.commit()
+
+    esperado = monto_cerrado_por_evento(filtro_marzo())
+    assert esperado > 0
+    assert calcular_monto_cerrado(filtro_marzo()) == esperado
+
+
+def test_sin_eventos_cerrados(crear_usuario):
+    crear_usuario(rol='comercial')
+    crear_evento(estado='CONSULTA_ENTRANTE', presupuesto='1000.00')
+    db.session.commit()
+
+    assert calcular_monto_cerrado(filtro_marzo()) == Decimal('0')
+    assert monto_cerrado_por_evento(filtro_marzo()) == Decimal('0')
@@ -0,0 +1,30 @@
+"""
+Tests del token del canal push (/api/stream).
+
+El JWT de sesión no debe viajar en la query string: /api/stream solo acepta
+el token corto de POST /api/stream/token, y ese token no sirve como sesión.
+"""
+
+
+def test_stream_rechaza_jwt_de_sesion(client, crear_usuario):
+    _, headers = crear_usuario('admin', 'Admin')
+    token_sesion = headers['Authorization'].split(' ')[1]
+
+    resp = client.get(f'/api/stream?token={token_sesion}')
+    assert resp.status_code == 401
+
+
+def test_token_de_stream_no_sirve_como_sesion(client, crear_usuario):
+    _, headers = crear_usuario('comercial', 'Ana')
+
+    resp = client.post('/api/stream/token', headers=headers)
+    assert resp.status_code == 200
+    token_stream = resp.get_json()['token']
+
+    resp = client.get('/api/auth/me', headers={'Authorization': f'Bearer {token_stream}'})
+    assert resp.status_code == 401
+
+
+def test_token_de_stream_requiere_sesion(client):
+    resp = client.post('/api/stream/token')
+    assert resp.status_code == 401
@@ -0,0 +1,114 @@
+"""
+Registro de cambios del tablero (cambios_tablero): revisión para el ETag del
+Kanban y el calendario, y patch de /api/eventos/cambios.
+"""
+from datetime import timedelta
+
+from app import db
+from app.models import Cliente, Evento
+from app.models_revision import CambioTablero, obtener_revision
+from app.utils.timezone import ahora_argentina
+
+
+def crear_evento(estado='ASIGNADO', telefono='1100000001'):
+    cliente = Cliente.query.filter_by(telefono=telefono).first() or Cliente(nombre='Cliente', telefono=telefono)
+    evento = Evento(cliente=cliente, estado=estado)
+    db.session.add(evento)
+    db.session.commit()
+    return evento
+
+
+def test_la_revision_avanza_solo_al_confirmar(app):
+    assert obtener_revision() == 0
+    evento = crear_evento()
+    revision = obtener_revision()
+    assert revision > 0
+    assert CambioTablero.query.get(revision).cambios['Evento'] == [evento.id]
+
+    evento.estado = 'CONTACTADO'
+    db.session.flush()
+    db.session.rollback()
+    assert obtener_revision() == revision
+
+    # Cambios que no tocan el tablero no registran nada
+    db.session.commit()
+    assert obtener_revision() == revision
+
+
+def test_etag_del_kanban(client, crear_usuario):
+    _, headers = crear_usuario(rol='admin')
+    evento = crear_evento()
+
+    respuesta = client.get('/api/eventos', headers=headers)
+    etag = respuesta.headers['ETag']
+    assert client.get('/api/eventos', headers={**headers, 'If-None-Match': etag}).status_code == 304
+
+    evento.cliente.nombre = 'Otro nombre'
+    db.session.commit()
+    assert client.get('/api/eventos', headers={**headers, 'If-None-Match': etag}).status_code == 200
+
+
+def pedir_cambios(client, headers, desde):
+    respuesta = client.get('/api/eventos/cambios', query_string={'desde': desde}, headers=headers)
+    assert respuesta.status_code == 200
+    return respuesta.get_json()
+
+
+def test_cambios_incluye_clientes_precheck_y_borrados(client, crear_usuario):
+    from app.models_precheck import PrecheckConcepto
+
+    _, headers = crear_usuario(rol='admin')
+    renombrado = crear_evento(telefono='1100000001')
+    con_precheck = crear_evento(estado='APROBADO', telefono='1100000002')
+    borrado = crear_evento(telefono='1100000003')
+    sin_cambios = crear_evento(telefono='1100000004')
+    # Fuera del margen de relectura de /cambios
+    db.session.execute(db.update(CambioTablero).values(created_at=ahora_argentina() - timedelta(hours=1)))
+    db.session.commit()
+    desde = client.get('/api/eventos', headers=headers).get_json()['cambios_desde']
+
+    datos = pedir_cambios(client, headers, desde)
+    assert datos['upsert'] == [] and datos['eliminar'] == []
+
+    renombrado.cliente.nombre = 'Nombre nuevo'
+    db.session.add(PrecheckConcepto(evento_id=con_precheck.id, categoria='Venue', descripcion='Salón',
+                                    cantidad=1, precio_unitario=1000))
+    db.session.delete(borrado)
+    db.session.commit()
+
+    datos = pedir_cambios(client, headers, desde)
+    upsert = {e['id']: e for e in datos['upsert']}
+    assert upsert[renombrado.id]['cliente']['nombre'] == 'Nombre nuevo'
+    assert upsert[con_precheck.id]['tiene_precheck'] is True
+    assert datos['eliminar'] == [borrado.id]
+    assert sin_cambios.id not in upsert
+
+    # Con el token nuevo no hay nada pendiente
+    datos = pedir_cambios(client, headers, datos['hasta'])
+    assert datos['upsert'] == [] and datos['eliminar'] == []
+
+
+def test_cambios_relee_filas_confirmadas_tarde(client, crear_usuario):
+    """Una fila con id menor que el token que se hizo visible después no se pierde"""
+    from app.models_revision import registrar_cambios
+
+    _, headers = crear_usuario(rol='admin')
+    evento = crear_evento()
+    desde = client.get('/api/eventos', headers=headers).get_json()['cambios_desde']
+    revision = obtener_revision()
+
+    # Simula la fila en vuelo: quedó con el id del token pero no se había leído
+    CambioTablero.query.filter_by(id=revision).delete()
+    db.session.commit()
+    registrar_cambios({'Evento': [evento.id]})
+    db.session.execute(db.update(CambioTablero).where(CambioTablero.id == obtener_revision()).values(id=revision))
+    registrar_cambios({'Evento': []})
+    db.session.commit()
+
+    datos = pedir_cambios(client, headers, desde)
+    assert [e['id'] for e in datos['upsert']] == [evento.id]
+
+
+def test_token_invalido_pide_recargar(client, crear_usuario):
+    _, headers = crear_usuario(rol='admin')
+    assert pedir_cambios(client, headers, 'no-es-un-token')['recargar'] is True
@@ -0,0 +1,153 @@
+"""
+Listas de tesorería (pendientes, validados, rechazados): cantidad de queries
+constante, paginación por cursor y validación de filtros.
+"""
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app import db
+from app.models import Usuario, Cliente, Local, Evento
+from app.models_precheck import PrecheckPago
+from app.utils.timezone import ahora_argentina
+
+LISTAS = {
+    '/api/tesoreria/pagos-pendientes': 'REVISION',
+    '/api/tesoreria/pagos-validados': 'VALIDADO',
+    '/api/tesoreria/pagos-rechazados': 'RECHAZADO',
+}
+
+# token_required carga el usuario con una query propia
+QUERIES_AUTH = 1
+# Página de pagos (con evento, cliente, local, comercial y validador) + total/monto
+QUERIES_LISTA = 2
+
+
+def sembrar(tesorero_id, n, inicio=0):
+    """n eventos, cada uno con su comercial, cliente y local y un pago por estado"""
+    for i in range(inicio, inicio + n):
+        comercial = Usuario(nombre=f'Comercial {i}', email=f'comercial{i}@test', rol='comercial', password_hash='x')
+        cliente = Cliente(nombre=f'Cliente {i}', telefono=f'11{i:06d}')
+        local = Local(nombre=f'Local {i}', color='azul')
+        db.session.add_all([comercial, cliente, local])
+        db.session.flush()
+        evento = Evento(cliente_id=cliente.id, comercial_id=comercial.id, local_id=local.id, estado='APROBADO')
+        db.session.add(evento)
+        db.session.flush()
+        for estado in LISTAS.values():
+            validado = estado != 'REVISION'
+            db.session.add(PrecheckPago(
+                evento_id=evento.id,
+                metodo_pago='Transferencia',
+                monto=100 + i,
+                # Fechas repetidas: el desempate por id tiene que funcionar
+                fecha_pago=date(2026, 1, 1) + timedelta(days=i % 5),
+                fecha_deposito=date(2026, 1, 1) + timedelta(days=i % 5),
+                estado=estado,
+                validado_por_id=tesorero_id if validado else None,
+                fecha_validacion=ahora_argentina() - timedelta(hours=i % 7) if validado else None,
+                comprobante_url=f'comprobantes/{evento.id}/{i}.jpg',
+            ))
+    db.session.commit()
+
+
+@pytest.fixture
+def tesoreria(crear_usuario):
+    return crear_usuario(rol='tesoreria', nombre='Tesorero')
+
+
+@pytest.fixture
+def contar_queries(app):
+    contador = {'n': 0}
+
+    def contar(*args, **kwargs):
+        contador['n'] += 1
+
+    event.listen(db.engine, 'before_cursor_execute', contar)
+    yield contador
+    event.remove(db.engine, 'before_cursor_execute', contar)
+
+
+@pytest.mark.parametrize('url', LISTAS)
+def test_cantidad_de_queries_no_depende_de_las_filas(client, tesoreria, contar_queries, url):
+    tesorero, headers = tesoreria
+    tesorero_id = tesorero.id
+
+    queries = []
+    for cantidad in (5, 25):
+        sembrar(tesorero_id, cantidad, inicio=len(queries) * 5)
+        # Sin objetos en el identity map: cada relación sin eager sería una query
+        db.session.expunge_all()
+        contar_queries['n'] = 0
+        respuesta = client.get(f'{url}?limit=200', headers=headers)
+        assert respuesta.status_code == 200
+        datos = respuesta.get_json()
+        assert len(datos['pagos']) == datos['total']
+        assert all(p['cliente_nombre'] and p['local_nombre'] and p['comercial_nombre'] for p in datos['pagos'])
+        queries.append(contar_queries['n'])
+
+    assert queries == [QUERIES_AUTH + QUERIES_LISTA] * 2
+
+
+@pytest.mark.parametrize('url', LISTAS)
+def test_paginacion_sin_duplicados(client, tesoreria, url):
+    tesorero, headers = tesoreria
+    sembrar(tesorero.id, 23)
+
+    ids, cursor = [], None
+    while True:
+        respuesta = client.get(url, query_string={'limit': 5, 'cursor': cursor or ''}, headers=headers)
+        assert respuesta.status_code == 200
+        datos = respuesta.get_json()
+        assert datos['total'] == 23
+        ids += [p['id'] for p in datos['pagos']]
+        cursor = datos['siguiente_cursor']
+        if not cursor:
+            break
+
+    assert len(ids) == len(set(ids)) == 23
+    esperados = PrecheckPago.query.filter_by(estado=LISTAS[url]).count()
+    assert len(ids) == esperados
+
+
+@pytest.mark.parametrize('params', [
+    {'cursor': 'no-es-un-cursor'},
+    {'deposito_desde': 'ayer'},
+    {'validacion_hasta': '2026-13-01'},
+])
+def test_filtro_o_cursor_invalido(client, tesoreria, params):
+    _, headers = tesoreria
+    for url in LISTAS:
+        respuesta = client.get(url, query_string=params, headers=headers)
+        assert respuesta.status_code == 400
+        assert 'inválido' in respuesta.get_json()['error']
+
+
+def test_solo_admin_y_tesoreria(client, crear_usuario):
+    _, headers = crear_usuario(rol='comercial')
+    for url in LISTAS:
+        assert client.get(url, headers=headers).status_code == 403
+
+
+def test_link_de_comprobante_firmado(client, tesoreria):
+    tesorero, headers = tesoreria
+    sembrar(tesorero.id, 1)
+
+    pago = client.get('/api/tesoreria/pagos-pendientes', headers=headers).get_json()['pagos'][0]
+    link = pago['comprobante_url']
+    assert 'signature=' in link and 'token=' not in link
+
+    # El link se autoriza solo (<img> no manda headers)
+    respuesta = client.get(link)
+    assert respuesta.status_code == 302
+    assert respuesta.headers['Location'].startswith('https://storage.fake/')
+
+    # Firma alterada o de otro pago: no sirve
+    assert client.get(link[:-4] + '0000').status_code == 401
+    otro = link.replace(f"/comprobante/{pago['id']}?", f"/comprobante/{pago['id'] + 1}?")
+    assert client.get(otro).status_code == 401
+
+    # El JWT de sesión ya no se acepta en la query string
+    token = headers['Authorization'].split(' ')[1]
+    assert client.get(f"/api/precheck/comprobante/{pago['id']}?token={token}").status_code == 401
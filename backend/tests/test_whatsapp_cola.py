@@ -0,0 +1,104 @@
+"""
+Tests de la cola del webhook de WhatsApp (app/utils/whatsapp_cola.py).
+
+Los workers no arrancan en los tests (WHATSAPP_WORKERS_AL_INICIAR=False): la
+cola se procesa en el request con POST /webhook/cola/drenar.
+"""
+from datetime import timedelta
+
+from app import db
+from app.models_whatsapp import WAWebhookPendiente, WAMensaje
+from app.utils.timezone import ahora_argentina
+
+
+def payload_mensaje(i, jid='5491124395923@s.whatsapp.net'):
+    return {
+        'event': 'messages.upsert',
+        'instance': 'vendedora_test',
+        'data': {
+            'key': {'remoteJid': jid, 'fromMe': False, 'id': f'MSG{i}'},
+            'message': {'conversation': f'hola {i}'},
+            'messageTimestamp': 1707398765 + i,
+        },
+    }
+
+
+def test_drenar_procesa_pendientes_y_abandonados(client, monkeypatch):
+    from app.utils import whatsapp_cola
+    # El endpoint también arranca los workers: en el test no hacen falta
+    monkeypatch.setattr(whatsapp_cola, 'iniciar_workers', lambda app: None)
+
+    db.session.add(WAWebhookPendiente(payload=payload_mensaje(1), estado='pendiente'))
+    # Quedó tomado por un worker de la instancia anterior al deploy
+    db.session.add(WAWebhookPendiente(
+        payload=payload_mensaje(2), estado='procesando',
+        tomado_at=ahora_argentina() - timedelta(minutes=30)
+    ))
+    db.session.commit()
+
+    resp = client.post('/webhook/cola/drenar')
+    assert resp.status_code == 200
+    datos = resp.get_json()
+    assert datos['liberados'] == 1
+    assert datos['payloads'] == 2
+    assert datos['cola']['procesado'] == 2
+    assert datos['cola']['pendiente'] == 0
+    assert WAMensaje.query.count() == 2
+
+
+def test_lote_mixto_no_pierde_avisos_ni_cache_de_los_buenos(app, monkeypatch):
+    """
+    Un payload que falla en el fallback de a uno deshace solo su savepoint:
+    los avisos y contactos a cachear de los payloads buenos se aplican al
+    confirmar el lote, y nada se aplica al liberar un savepoint.
+    """
+    from app.models_whatsapp import WAContacto, WAConversacion
+    from app.utils import whatsapp_cola
+    from app.utils.pubsub import obtener_backend
+    from app.utils.whatsapp_ingesta import cache_contactos
+
+    guardar_original = whatsapp_cola.guardar_mensajes
+    avisos_antes_del_commit = []
+
+    def guardar_que_falla(datos):
+        resultado = guardar_original(datos)
+        # El payload malo alcanza a dejar pendientes antes de fallar
+        if any(d['mensaje_id'] == 'MSG2' for d in datos):
+            avisos_antes_del_commit.append(cola.qsize())
+            raise RuntimeError('falla del payload 2')
+        return resultado
+
+    monkeypatch.setattr(whatsapp_cola, 'guardar_mensajes', guardar_que_falla)
+    cache_contactos.invalidar()
+    backend = obtener_backend()
+    cola = backend.suscribir()
+
+    for i, numero in enumerate(['5491111111111', '5491122222222', '5491133333333'], start=1):
+        db.session.add(WAWebhookPendiente(
+            payload=payload_mensaje(i, jid=f'{numero}@s.whatsapp.net'), estado='pendiente'
+        ))
+    db.session.commit()
+
+    try:
+        assert whatsapp_cola.procesar_lote() == 3
+        avisos = []
+        while not cola.empty():
+            avisos.append(cola.get_nowait())
+    finally:
+        backend.desuscribir(cola)
+
+    estados = [p.estado for p in WAWebhookPendiente.query.order_by(WAWebhookPendiente.id)]
+    assert estados == ['procesado', 'pendiente', 'procesado']
+
+    # Liberar el savepoint del payload 1 no publicó nada todavía
+    assert avisos_antes_del_commit and all(n == 0 for n in avisos_antes_del_commit)
+
+    conversaciones = {c.id for c in WAConversacion.query.all()}
+    assert len(conversaciones) == 2
+    assert {a['datos']['conversacion_id'] for a in avisos if a['tipo'] == 'whatsapp'} == conversaciones
+
+    contactos = WAContacto.query.all()
+    assert len(contactos) == 2
+    assert cache_contactos.estadisticas()['entradas'] == 2
+    for contacto in contactos:
+        assert cache_contactos.obtener(contacto.numero_normalizado) == contacto.id
@@ -0,0 +1,58 @@
+"""
+Tests de los contadores de /webhook/stats (app/models_whatsapp_stats.py).
+
+La ingesta suma en un shard por hilo; GET /stats suma las filas sin
+escribir y POST /webhook/stats/reconciliar deja la fila base exacta.
+"""
+from app import db
+from app.models_whatsapp import WAWebhookPendiente
+from app.models_whatsapp_stats import WAStats, CLAVE_STATS, SHARDS_STATS
+from app.utils.whatsapp_cola import procesar_lote
+
+
+def ingestar(*mensajes):
+    for i, jid, enviado in mensajes:
+        db.session.add(WAWebhookPendiente(payload={
+            'event': 'messages.upsert',
+            'instance': 'vendedora_test',
+            'data': {
+                'key': {'remoteJid': jid, 'fromMe': enviado, 'id': f'MSG{i}'},
+                'message': {'conversation': f'hola {i}'},
+                'messageTimestamp': 1707398765 + i,
+            },
+        }, estado='pendiente'))
+    db.session.commit()
+    procesar_lote()
+
+
+def test_stats_suma_shards_y_reconcilia(client):
+    ingestar((1, '5491111111111@s.whatsapp.net', False))
+    # La primera lectura crea la fila base y los shards con los totales reales
+    resp = client.get('/webhook/stats')
+    assert resp.get_json()['mensajes'] == {'total': 1, 'recibidos': 1, 'enviados': 0}
+    assert WAStats.query.count() == SHARDS_STATS + 1
+
+    ingestar((2, '5491111111111@s.whatsapp.net', True), (3, '5491122222222@s.whatsapp.net', False))
+    datos = client.get('/webhook/stats').get_json()
+    assert datos['mensajes'] == {'total': 3, 'recibidos': 2, 'enviados': 1}
+    assert datos['contactos']['total'] == 2
+    assert datos['conversaciones']['total'] == 2
+    # Los deltas quedaron en los shards, no en la fila base
+    assert db.session.get(WAStats, CLAVE_STATS).mensajes_total == 1
+
+    resp = client.post('/webhook/stats/reconciliar')
+    assert resp.status_code == 200
+    assert resp.get_json()['stats']['mensajes'] == datos['mensajes']
+    db.session.expire_all()
+    assert db.session.get(WAStats, CLAVE_STATS).mensajes_total == 3
+    assert client.get('/webhook/stats').get_json()['mensajes'] == datos['mensajes']
+
+
+def test_get_stats_no_escribe(client):
+    client.get('/webhook/stats')
+    antes = {s.clave: s.updated_at for s in WAStats.query.all()}
+
+    # ?exact=1 ya no recalcula en un GET (se usa POST /webhook/stats/reconciliar)
+    client.get('/webhook/stats?exact=1')
+    db.session.expire_all()
+    assert {s.clave: s.updated_at for s in WAStats.query.all()} == antes
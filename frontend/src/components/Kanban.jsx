@@ -1,5 +1,6 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { eventosApi, usuariosApi } from '../services/api';
+import { suscribirStream } from '../services/stream';
 import { useAuth } from '../context/AuthContext';
 import EventoCard from './EventoCard';
 import EventoModal from './EventoModal';
@@ -48,6 +49,9 @@ const getColorHex = (color) => {
   return COLOR_MAP[color.toLowerCase()] || '#6b7280';
 };
 
+// Tarjetas por página de cada columna (CONCLUIDO/RECHAZADO crecen sin límite)
+const TAMANO_PAGINA = 50;
+
 // Claves de localStorage
 const STORAGE_KEYS = {
   FILTROS_GLOBALES: 'crm_filtros_globales',
@@ -84,6 +88,13 @@ export default function Kanban({ busquedaGlobal = '', eventoIdDesdeNotif = null,
 
   const [kanban, setKanban] = useState({});
   const [totales, setTotales] = useState({});
+  // Cursor de la página siguiente de cada columna (null = columna completa)
+  const [cursores, setCursores] = useState({});
+  // Copia para los callbacks del canal push (se registran una sola vez)
+  const cursoresRef = useRef({});
+  const [cargandoColumna, setCargandoColumna] = useState(null);
+  // Token para pedir solo los cambios desde la última carga
+  const cambiosDesde = useRef(null);
   const [loading, setLoading] = useState(true);
   const [eventoSeleccionado, setEventoSeleccionado] = useState(null);
   const [showNuevoModal, setShowNuevoModal] = useState(false);
@@ -142,6 +153,11 @@ export default function Kanban({ busquedaGlobal = '', eventoIdDesdeNotif = null,
     }
   }, [isAdmin]);
 
+  // Movimientos del Kanban hechos por otros usuarios llegan por el canal push
+  useEffect(() => {
+    return suscribirStream('kanban', () => actualizarEventos());
+  }, []);
+
   // Persistir cambios en localStorage
   useEffect(() => {
     saveToStorage(STORAGE_KEYS.FILTROS_GLOBALES, filtrosGlobales);
@@ -170,9 +186,12 @@ export default function Kanban({ busquedaGlobal = '', eventoIdDesdeNotif = null,
 
   const cargarEventos = async () => {
     try {
-      const response = await eventosApi.listar();
+      const response = await eventosApi.listar({ limit: TAMANO_PAGINA });
       setKanban(response.data.kanban);
       setTotales(response.data.totales);
+      cursoresRef.current = response.data.cursores || {};
+      setCursores(cursoresRef.current);
+      cambiosDesde.current = response.data.cambios_desde || null;
     } catch (error) {
       console.error('Error cargando eventos:', error);
     } finally {
@@ -180,6 +199,85 @@ export default function Kanban({ busquedaGlobal = '', eventoIdDesdeNotif = null,
     }
   };
 
+  // Página siguiente de una columna
+  const cargarMasColumna = async (estadoId) => {
+    if (!cursores[estadoId] || cargandoColumna) return;
+    setCargandoColumna(estadoId);
+    try {
+      const response = await eventosApi.listarColumna({
+        columna: estadoId,
+        limit: TAMANO_PAGINA,
+        cursor: cursores[estadoId],
+      });
+      const pagina = response.data.kanban[estadoId] || [];
+      setKanban(prev => {
+        const cargados = new Set((prev[estadoId] || []).map(e => e.id));
+        return { ...prev, [estadoId]: [...(prev[estadoId] || []), ...pagina.filter(e => !cargados.has(e.id))] };
+      });
+      cursoresRef.current = { ...cursoresRef.current, [estadoId]: response.data.cursores[estadoId] };
+      setCursores(cursoresRef.current);
+      setTotales(response.data.totales);
+    } catch (error) {
+      console.error('Error cargando más eventos:', error);
+    } finally {
+      setCargandoColumna(null);
+    }
+  };
+
+  // Orden del backend en cada columna: created_at DESC, id DESC
+  const compararEventos = (a, b) => {
+    const fechaA = a.created_at || '';
+    const fechaB = b.created_at || '';
+    if (fechaA !== fechaB) return fechaA < fechaB ? 1 : -1;
+    return b.id - a.id;
+  };
+
+  // Aplica el patch de /eventos/cambios: quita los ids eliminados o movidos
+  // y agrega los eventos actualizados en su posición dentro de la columna.
+  // Si la columna tiene más páginas y el evento cae después de la última
+  // tarjeta cargada, queda para "Cargar más".
+  const aplicarCambios = (patch) => {
+    setKanban(prev => {
+      const quitar = new Set([...patch.eliminar, ...patch.upsert.map(e => e.id)]);
+      const nuevo = {};
+      Object.keys(prev).forEach(estadoId => {
+        nuevo[estadoId] = (prev[estadoId] || []).filter(e => !quitar.has(e.id));
+      });
+      patch.upsert.forEach(evento => {
+        const columna = nuevo[evento.estado] || [];
+        const ultimo = columna[columna.length - 1];
+        if (cursoresRef.current[evento.estado] && ultimo && compararEventos(evento, ultimo) > 0) {
+          nuevo[evento.estado] = columna;
+          return;
+        }
+        const posicion = columna.findIndex(e => compararEventos(evento, e) < 0);
+        nuevo[evento.estado] = posicion === -1
+          ? [...columna, evento]
+          : [...columna.slice(0, posicion), evento, ...columna.slice(posicion)];
+      });
+      return nuevo;
+    });
+    if (patch.totales) setTotales(patch.totales);
+  };
+
+  // Refresco incremental; si no hay token o el backend pide recargar, carga completa
+  const actualizarEventos = async () => {
+    if (!cambiosDesde.current) {
+      return cargarEventos();
+    }
+    try {
+      const response = await eventosApi.cambios(cambiosDesde.current);
+      if (response.data.recargar) {
+        return cargarEventos();
+      }
+      aplicarCambios(response.data);
+      cambiosDesde.current = response.data.hasta;
+    } catch (error) {
+      console.error('Error actualizando eventos:', error);
+      cargarEventos();
+    }
+  };
+
   const cargarComerciales = async () => {
     try {
       const response = await usuariosApi.listar();
@@ -397,16 +495,16 @@ export default function Kanban({ busquedaGlobal = '', eventoIdDesdeNotif = null,
   };
 
   const handleEventoUpdated = () => {
-    cargarEventos();
+    actualizarEventos();
     setEventoSeleccionado(null);
   };
 
   const handleEventoRefresh = () => {
-    cargarEventos();
+    actualizarEventos();
   };
 
   const handleNuevoEvento = () => {
-    cargarEventos();
+    actualizarEventos();
     setShowNuevoModal(false);
   };
 
@@ -420,7 +518,7 @@ export default function Kanban({ busquedaGlobal = '', eventoIdDesdeNotif = null,
       });
       setEventoAEliminar(null);
       setMotivoEliminacion('');
-      cargarEventos();
+      actualizarEventos();
     } catch (error) {
       console.error('Error eliminando evento:', error);
       alert(error.response?.data?.error || 'Error al eliminar evento');
@@ -492,8 +590,17 @@ export default function Kanban({ busquedaGlobal = '', eventoIdDesdeNotif = null,
     acc.monto += filtrados.reduce((sum, e) => sum + (e.presupuesto || 0), 0);
     return acc;
   }, { eventos: 0, monto: 0 });
-  const totalEventos = totalesCalculados.eventos;
-  const totalMonto = totalesCalculados.monto;
+  // Con columnas paginadas las tarjetas cargadas no son todas: sin filtros
+  // se muestran los totales del backend
+  const hayFiltrosCliente = hayFiltrosGlobalesActivos || !!busquedaGlobal ||
+    Object.values(filtrosColumna).some(v => v);
+  const totalesBackend = estadosVisibles.reduce((acc, estado) => {
+    acc.eventos += totales[estado.id]?.cantidad || 0;
+    acc.monto += totales[estado.id]?.monto || 0;
+    return acc;
+  }, { eventos: 0, monto: 0 });
+  const totalEventos = hayFiltrosCliente ? totalesCalculados.eventos : totalesBackend.eventos;
+  const totalMonto = hayFiltrosCliente ? totalesCalculados.monto : totalesBackend.monto;
 
   if (loading) {
     return <div className="loading">Cargando eventos...</div>;
@@ -784,7 +891,11 @@ export default function Kanban({ busquedaGlobal = '', eventoIdDesdeNotif = null,
                     ${eventosFiltrados.reduce((sum, e) => sum + (e.presupuesto || 0), 0).toLocaleString()}
                   </span>
                   <span className="stat-separator">·</span>
-                  <span className="stat-count">{eventosFiltrados.length} eventos</span>
+                  <span className="stat-count">
+                    {cursores[estado.id]
+                      ? `${eventosFiltrados.length} de ${totales[estado.id]?.cantidad ?? '?'} eventos`
+                      : `${eventosFiltrados.length} eventos`}
+                  </span>
                 </div>
               </div>
 
@@ -799,6 +910,15 @@ export default function Kanban({ busquedaGlobal = '', eventoIdDesdeNotif = null,
                     onEliminar={() => setEventoAEliminar(evento)}
                   />
                 ))}
+                {cursores[estado.id] && (
+                  <button
+                    className="btn-cargar-mas-columna"
+                    onClick={() => cargarMasColumna(estado.id)}
+                    disabled={cargandoColumna === estado.id}
+                  >
+                    {cargandoColumna === estado.id ? 'Cargando...' : 'Cargar más'}
+                  </button>
+                )}
               </div>
             </div>
           );
@@ -1,5 +1,6 @@
 import { useState, useEffect, useRef } from 'react';
 import { slaApi } from '../services/api';
+import { suscribirStream, escucharEstadoStream } from '../services/stream';
 import './NotificationBell.css';
 
 const SEEN_KEY = 'crm_sla_seen_ids';
@@ -41,10 +42,26 @@ export default function NotificationBell({ onEventoClick }) {
     }
   };
 
+  // Con el canal push conectado se recarga solo cuando cambia un estado SLA;
+  // el polling cada 60s queda como respaldo mientras el canal está caído
   useEffect(() => {
     fetchNotificaciones();
-    const interval = setInterval(fetchNotificaciones, 60000);
-    return () => clearInterval(interval);
+    let interval = null;
+    const dejarDeEscuchar = escucharEstadoStream((conectado) => {
+      if (conectado) {
+        clearInterval(interval);
+        interval = null;
+        fetchNotificaciones();
+      } else if (!interval) {
+        interval = setInterval(fetchNotificaciones, 60000);
+      }
+    });
+    const desuscribir = suscribirStream('sla', fetchNotificaciones);
+    return () => {
+      clearInterval(interval);
+      dejarDeEscuchar();
+      desuscribir();
+    };
   }, []);
 
   // Cerrar dropdown al hacer click fuera
@@ -1,5 +1,5 @@
 import { useState, useEffect } from 'react';
-import { precheckApi } from '../services/api';
+import { precheckApi, urlComprobante } from '../services/api';
 import './PreCheckTab.css';
 
 const CATEGORIAS = ['Gastronomía', 'Venue', 'Técnica', 'Servicios', 'Otros'];
@@ -43,7 +43,7 @@ export default function PreCheckTab({ eventoId, estado, onPrecheckChange }) {
   });
   const [comprobanteFile, setComprobanteFile] = useState(null);
   const [comprobantePreview, setComprobantePreview] = useState(null);
-  const [lightboxUrl, setLightboxUrl] = useState(null);
+  const [lightbox, setLightbox] = useState(null); // { src: preview, original }
 
   const [guardando, setGuardando] = useState(false);
 
@@ -720,13 +720,16 @@ export default function PreCheckTab({ eventoId, estado, onPrecheckChange }) {
                       <div className="comprobante-cell-view">
                         {/\.(jpg|jpeg|png|gif|webp)/i.test(p.comprobante_nombre || p.comprobante_url.split('?')[0]) ? (
                           <img
-                            src={p.comprobante_url}
+                            src={urlComprobante(p.comprobante_thumb || p.comprobante_url)}
                             alt="Comprobante"
                             className="comprobante-thumb"
-                            onClick={() => setLightboxUrl(p.comprobante_url)}
+                            onClick={() => setLightbox({
+                              src: urlComprobante(p.comprobante_preview || p.comprobante_url),
+                              original: urlComprobante(p.comprobante_url)
+                            })}
                           />
                         ) : (
-                          <a href={p.comprobante_url} target="_blank" rel="noopener noreferrer" className="comprobante-link">
+                          <a href={urlComprobante(p.comprobante_url)} target="_blank" rel="noopener noreferrer" className="comprobante-link">
                             📎 {p.comprobante_nombre || 'Ver PDF'}
                           </a>
                         )}
@@ -882,13 +885,13 @@ export default function PreCheckTab({ eventoId, estado, onPrecheckChange }) {
       </section>
 
       {/* Lightbox para ver comprobantes */}
-      {lightboxUrl && (
-        <div className="comprobante-lightbox" onClick={() => setLightboxUrl(null)}>
+      {lightbox && (
+        <div className="comprobante-lightbox" onClick={() => setLightbox(null)}>
           <div className="lightbox-content" onClick={(e) => e.stopPropagation()}>
-            <button className="lightbox-close" onClick={() => setLightboxUrl(null)}>&times;</button>
-            <img src={lightboxUrl} alt="Comprobante" className="lightbox-img" />
+            <button className="lightbox-close" onClick={() => setLightbox(null)}>&times;</button>
+            <img src={lightbox.src} alt="Comprobante" className="lightbox-img" />
             <a
-              href={lightboxUrl}
+              href={lightbox.original}
               target="_blank"
               rel="noopener noreferrer"
               className="lightbox-open-new"
@@ -21,6 +21,23 @@ const formatearFecha = (fechaStr) => {
   return `${fecha.getDate()} ${meses[fecha.getMonth()]}`;
 };
 
+// Formatear el inicio de período según la agrupación (mensual/trimestral muestran mes o trimestre)
+const formatearPeriodo = (fechaStr, agrupacion) => {
+  if (!fechaStr) return '-';
+  const fecha = new Date(fechaStr + 'T00:00:00');
+  const meses = ['Ene', 'Feb', 'Mar', 'Abr', 'May', 'Jun', 'Jul', 'Ago', 'Sep', 'Oct', 'Nov', 'Dic'];
+  if (agrupacion === 'mensual') return `${meses[fecha.getMonth()]} ${fecha.getFullYear()}`;
+  if (agrupacion === 'trimestral') return `T${Math.floor(fecha.getMonth() / 3) + 1} ${fecha.getFullYear()}`;
+  return formatearFecha(fechaStr);
+};
+
+// Formatear horas: 5.5 -> 5.5 h, 50 -> 2.1 d
+const formatearHoras = (horas) => {
+  if (horas == null) return '-';
+  if (horas >= 48) return `${(horas / 24).toFixed(1)} d`;
+  return `${horas} h`;
+};
+
 export default function Reportes() {
   const [loading, setLoading] = useState(true);
   const [data, setData] = useState(null);
@@ -123,6 +140,8 @@ export default function Reportes() {
             >
               <option value="diario">Por día</option>
               <option value="semanal">Por semana</option>
+              <option value="mensual">Por mes</option>
+              <option value="trimestral">Por trimestre</option>
             </select>
           </div>
           <button className="btn-aplicar" onClick={aplicarFiltros}>
@@ -196,7 +215,7 @@ export default function Reportes() {
         <div className="seccion-header">
           <h2>Volumen de Solicitudes</h2>
           <p className="seccion-desc">
-            Muestra cuántas consultas ingresaron cada {filtros.agrupacion === 'semanal' ? 'semana' : 'día'} y en qué estado se encuentran actualmente.
+            Muestra cuántas consultas ingresaron cada {{ semanal: 'semana', mensual: 'mes', trimestral: 'trimestre' }[filtros.agrupacion] || 'día'} y en qué estado se encuentran actualmente.
           </p>
         </div>
         <div className="tabla-container">
@@ -222,7 +241,7 @@ export default function Reportes() {
               ) : (
                 volumen_periodo.filas.map((fila, idx) => (
                   <tr key={idx}>
-                    <td className="fecha">{formatearFecha(fila.fecha)}</td>
+                    <td className="fecha">{formatearPeriodo(fila.fecha, data.filtros.agrupacion)}</td>
                     <td className="total">{fila.total}</td>
                     <td>{fila.consulta_entrante}</td>
                     <td>{fila.asignado}</td>
@@ -290,6 +309,8 @@ export default function Reportes() {
                 <th className="col-danger">Rechazado</th>
                 <th>% Cierre</th>
                 <th>Part.</th>
+                <th>Presup. prom.</th>
+                <th>Mediana a cotizar</th>
                 <th className="col-bar">Composición</th>
               </tr>
             </thead>
@@ -309,6 +330,8 @@ export default function Reportes() {
                     <td className="danger">{fila.rechazado}</td>
                     <td className="tasa-cierre">{tasaCierre !== '-' ? `${tasaCierre}%` : '-'}</td>
                     <td className="porcentaje">{fila.participacion}%</td>
+                    <td>{fila.presupuesto_promedio != null ? formatearMonto(fila.presupuesto_promedio) : '-'}</td>
+                    <td>{formatearHoras(fila.mediana_horas_cotizado)}</td>
                     <td className="col-bar">
                       {fila.total > 0 && (
                         <div className="bar-container">
@@ -346,6 +369,8 @@ export default function Reportes() {
                     <td className="danger">{comerciales.totales.rechazado}</td>
                     <td className="tasa-cierre">{tasaCierreTotal !== '-' ? `${tasaCierreTotal}%` : '-'}</td>
                     <td>100%</td>
+                    <td>{comerciales.totales.presupuesto_promedio != null ? formatearMonto(comerciales.totales.presupuesto_promedio) : '-'}</td>
+                    <td>{formatearHoras(comerciales.totales.mediana_horas_cotizado)}</td>
                     <td></td>
                   </tr>
                 );
@@ -380,7 +405,7 @@ export default function Reportes() {
               <tbody>
                 {locales.filas.map((fila, idx) => (
                   <tr key={idx}>
-                    <td className="fecha">{formatearFecha(fila.fecha)}</td>
+                    <td className="fecha">{formatearPeriodo(fila.fecha, data.filtros.agrupacion)}</td>
                     {locales.columnas.map((col) => {
                       const cant = fila.locales[String(col.id)] || 0;
                       return (
@@ -1,7 +1,23 @@
 import { useState, useEffect, useCallback } from 'react';
-import { tesoreriaApi } from '../services/api';
+import { tesoreriaApi, urlComprobante } from '../services/api';
 import './Tesoreria.css';
 
+const OBTENER_POR_TAB = {
+  pendientes: tesoreriaApi.obtenerPagosPendientes,
+  validados: tesoreriaApi.obtenerPagosValidados,
+  rechazados: tesoreriaApi.obtenerPagosRechazados,
+};
+
+// Filtros de fecha que resuelve el backend (el resto se aplica sobre lo cargado)
+const PARAMS_FECHA = {
+  fechaDepositoDesde: 'deposito_desde',
+  fechaDepositoHasta: 'deposito_hasta',
+  fechaAcreditacionDesde: 'acreditacion_desde',
+  fechaAcreditacionHasta: 'acreditacion_hasta',
+  fechaCargaDesde: 'carga_desde',
+  fechaCargaHasta: 'carga_hasta',
+};
+
 const FILTROS_INICIALES = {
   fechaDepositoDesde: '',
   fechaDepositoHasta: '',
@@ -17,46 +33,66 @@ const FILTROS_INICIALES = {
 export default function Tesoreria() {
   const [tab, setTab] = useState('pendientes');
   const [pagos, setPagos] = useState([]);
+  const [cursor, setCursor] = useState(null);
+  const [resumen, setResumen] = useState({ total: 0, monto_total: 0 });
+  const [cargandoMas, setCargandoMas] = useState(false);
   const [loading, setLoading] = useState(true);
   const [formPago, setFormPago] = useState(null); // { tipo: 'validar'|'rechazar', pago }
   const [formData, setFormData] = useState({});
   const [formError, setFormError] = useState('');
   const [submitting, setSubmitting] = useState(false);
   const [counts, setCounts] = useState({ pendientes: 0, validados: 0, rechazados: 0 });
-  const [lightboxUrl, setLightboxUrl] = useState(null);
+  const [lightbox, setLightbox] = useState(null); // { src: preview, original }
   const [filtros, setFiltros] = useState(FILTROS_INICIALES);
   const [mostrarFiltros, setMostrarFiltros] = useState(false);
 
+  // Los filtros de fecha van como query params; cambiar uno recarga desde la primera página
+  const paramsFecha = Object.fromEntries(
+    Object.entries(PARAMS_FECHA)
+      .filter(([campo]) => filtros[campo])
+      .map(([campo, param]) => [param, filtros[campo]])
+  );
+  const claveParamsFecha = JSON.stringify(paramsFecha);
+
   const cargarPagos = useCallback(async () => {
     setLoading(true);
     try {
-      let response;
-      if (tab === 'pendientes') {
-        response = await tesoreriaApi.obtenerPagosPendientes();
-      } else if (tab === 'validados') {
-        response = await tesoreriaApi.obtenerPagosValidados();
-      } else {
-        response = await tesoreriaApi.obtenerPagosRechazados();
-      }
+      const response = await OBTENER_POR_TAB[tab](JSON.parse(claveParamsFecha));
       setPagos(response.data.pagos || []);
+      setCursor(response.data.siguiente_cursor || null);
+      setResumen({ total: response.data.total || 0, monto_total: response.data.monto_total || 0 });
 
-      // Cargar conteos en paralelo
+      // Conteos de las pestañas: alcanza con el total de una página de 1
       const [pend, val, rech] = await Promise.all([
-        tesoreriaApi.obtenerPagosPendientes(),
-        tesoreriaApi.obtenerPagosValidados(),
-        tesoreriaApi.obtenerPagosRechazados(),
+        tesoreriaApi.obtenerPagosPendientes({ limit: 1 }),
+        tesoreriaApi.obtenerPagosValidados({ limit: 1 }),
+        tesoreriaApi.obtenerPagosRechazados({ limit: 1 }),
       ]);
       setCounts({
-        pendientes: pend.data.total_pendientes || pend.data.pagos?.length || 0,
-        validados: val.data.pagos?.length || 0,
-        rechazados: rech.data.pagos?.length || 0,
+        pendientes: pend.data.total || 0,
+        validados: val.data.total || 0,
+        rechazados: rech.data.total || 0,
       });
     } catch (error) {
       console.error('Error cargando pagos:', error);
     } finally {
       setLoading(false);
     }
-  }, [tab]);
+  }, [tab, claveParamsFecha]);
+
+  const cargarMas = async () => {
+    if (!cursor) return;
+    setCargandoMas(true);
+    try {
+      const response = await OBTENER_POR_TAB[tab]({ ...paramsFecha, cursor });
+      setPagos(prev => [...prev, ...(response.data.pagos || [])]);
+      setCursor(response.data.siguiente_cursor || null);
+    } catch (error) {
+      console.error('Error cargando más pagos:', error);
+    } finally {
+      setCargandoMas(false);
+    }
+  };
 
   useEffect(() => {
     cargarPagos();
@@ -171,20 +207,9 @@ export default function Tesoreria() {
 
   const limpiarFiltros = () => setFiltros(FILTROS_INICIALES);
 
-  // Filtrar pagos en memoria
+  // Las fechas ya las filtró el backend; local, método y N° Oppen se filtran en memoria
+  const filtrosEnMemoria = Boolean(filtros.local || filtros.metodo || filtros.numeroOppen);
   const pagosFiltrados = pagos.filter(p => {
-    if (filtros.fechaDepositoDesde && (!p.fecha_deposito || p.fecha_deposito < filtros.fechaDepositoDesde)) return false;
-    if (filtros.fechaDepositoHasta && (!p.fecha_deposito || p.fecha_deposito > filtros.fechaDepositoHasta)) return false;
-    if (filtros.fechaAcreditacionDesde && (!p.fecha_acreditacion || p.fecha_acreditacion < filtros.fechaAcreditacionDesde)) return false;
-    if (filtros.fechaAcreditacionHasta && (!p.fecha_acreditacion || p.fecha_acreditacion > filtros.fechaAcreditacionHasta)) return false;
-    if (filtros.fechaCargaDesde && p.created_at) {
-      const carga = p.created_at.split('T')[0];
-      if (carga < filtros.fechaCargaDesde) return false;
-    }
-    if (filtros.fechaCargaHasta && p.created_at) {
-      const carga = p.created_at.split('T')[0];
-      if (carga > filtros.fechaCargaHasta) return false;
-    }
     if (filtros.local && p.local_nombre !== filtros.local) return false;
     if (filtros.metodo && p.metodo_pago !== filtros.metodo) return false;
     if (filtros.numeroOppen && p.numero_oppen) {
@@ -195,9 +220,11 @@ export default function Tesoreria() {
     return true;
   });
 
-  const totalMontoPendientes = pagosFiltrados
-    .filter(() => tab === 'pendientes')
-    .reduce((sum, p) => sum + (p.monto || 0), 0);
+  // Sin filtros en memoria, los totales del backend cubren también las páginas no cargadas
+  const cantidadPendientes = filtrosEnMemoria ? pagosFiltrados.length : resumen.total;
+  const totalMontoPendientes = filtrosEnMemoria
+    ? pagosFiltrados.reduce((sum, p) => sum + (p.monto || 0), 0)
+    : resumen.monto_total;
 
   return (
     <div className="tesoreria-container">
@@ -236,7 +263,7 @@ export default function Tesoreria() {
         {tab === 'pendientes' && pagosFiltrados.length > 0 && (
           <div className="tesoreria-summary">
             <div className="summary-card pendiente">
-              <span className="summary-valor">{pagosFiltrados.length}</span>
+              <span className="summary-valor">{cantidadPendientes}</span>
               <span className="summary-label">Pagos por revisar</span>
             </div>
             <div className="summary-card pendiente">
@@ -248,7 +275,7 @@ export default function Tesoreria() {
       </div>
 
       {/* Filtros */}
-      {pagos.length > 0 && (
+      {(pagos.length > 0 || filtrosActivos) && (
         <div className="tesoreria-filtros-wrapper">
           <button
             className={`btn-toggle-filtros ${filtrosActivos ? 'activos' : ''}`}
@@ -422,14 +449,17 @@ export default function Tesoreria() {
                     {pago.comprobante_url ? (
                       /\.(jpg|jpeg|png|gif|webp)/i.test(pago.comprobante_nombre || pago.comprobante_url.split('?')[0]) ? (
                         <img
-                          src={pago.comprobante_url}
+                          src={urlComprobante(pago.comprobante_thumb || pago.comprobante_url)}
                           alt="Comprobante"
                           className="comprobante-thumb-tes"
-                          onClick={() => setLightboxUrl(pago.comprobante_url)}
+                          onClick={() => setLightbox({
+                            src: urlComprobante(pago.comprobante_preview || pago.comprobante_url),
+                            original: urlComprobante(pago.comprobante_url)
+                          })}
                         />
                       ) : (
                         <a
-                          href={pago.comprobante_url}
+                          href={urlComprobante(pago.comprobante_url)}
                           target="_blank"
                           rel="noopener noreferrer"
                           className="comprobante-link"
@@ -483,6 +513,13 @@ export default function Tesoreria() {
               ))}
             </tbody>
           </table>
+          {cursor && (
+            <div className="tesoreria-cargar-mas">
+              <button className="btn-cargar-mas" onClick={cargarMas} disabled={cargandoMas}>
+                {cargandoMas ? 'Cargando...' : `Cargar más (${pagos.length} de ${resumen.total})`}
+              </button>
+            </div>
+          )}
         </div>
       )}
 
@@ -587,13 +624,13 @@ export default function Tesoreria() {
       )}
 
       {/* Lightbox para ver comprobantes */}
-      {lightboxUrl && (
-        <div className="comprobante-lightbox-tes" onClick={() => setLightboxUrl(null)}>
+      {lightbox && (
+        <div className="comprobante-lightbox-tes" onClick={() => setLightbox(null)}>
           <div className="lightbox-content-tes" onClick={(e) => e.stopPropagation()}>
-            <button className="lightbox-close-tes" onClick={() => setLightboxUrl(null)}>&times;</button>
-            <img src={lightboxUrl} alt="Comprobante" className="lightbox-img-tes" />
+            <button className="lightbox-close-tes" onClick={() => setLightbox(null)}>&times;</button>
+            <img src={lightbox.src} alt="Comprobante" className="lightbox-img-tes" />
             <a
-              href={lightboxUrl}
+              href={lightbox.original}
               target="_blank"
               rel="noopener noreferrer"
               className="lightbox-link-tes"
@@ -36,9 +36,22 @@ api.interceptors.response.use(
   }
 );
 
+// Link de un comprobante (/api/precheck/comprobante/<id>?expires=&signature=,
+// redirige a una signed URL). Ya viene firmado por el backend: solo se
+// resuelve contra el origen de la API
+export const urlComprobante = (link) => {
+  if (!link) return link;
+  return new URL(link, new URL(API_URL, window.location.origin)).href;
+};
+
 // Eventos
 export const eventosApi = {
-  listar: () => api.get('/eventos'),
+  // Primera página de cada columna: { limit } (sin params, el tablero completo)
+  listar: (params) => api.get('/eventos', { params }),
+  // Página de una columna del Kanban: { columna, limit, cursor }
+  listarColumna: (params) => api.get('/eventos', { params }),
+  // Patch incremental del Kanban desde el token `cambios_desde`
+  cambios: (desde) => api.get('/eventos/cambios', { params: { desde } }),
   obtener: (id) => api.get(`/eventos/${id}`),
   crear: (data) => api.post('/eventos', data),
   actualizar: (id, data) => api.put(`/eventos/${id}`, data),
@@ -68,12 +81,19 @@ const WEBHOOK_URL = import.meta.env.VITE_API_URL?.replace('/api', '') || 'https:
 export const whatsappApi = {
   obtenerConversacionPorNumero: (numero, params = {}) =>
     axios.get(`${WEBHOOK_URL}/webhook/conversacion-por-numero/${encodeURIComponent(numero)}`, { params }),
-  obtenerConversacion: (conversacionId) =>
-    axios.get(`${WEBHOOK_URL}/webhook/conversacion/${conversacionId}`),
+  // params: { limit, before } -> página de mensajes más nuevos primero
+  obtenerConversacion: (conversacionId, params = {}) =>
+    axios.get(`${WEBHOOK_URL}/webhook/conversacion/${conversacionId}`, { params }),
   obtenerMensajes: (conversacionId, limit = 100) =>
     axios.get(`${WEBHOOK_URL}/webhook/conversacion/${conversacionId}/mensajes`, { params: { limit } }),
 };
 
+// Búsqueda de texto completo (WhatsApp + Gmail)
+// params: { q, origen, comercial_id, instancia, desde, hasta, limit, pagina }
+export const busquedaApi = {
+  buscar: (params) => api.get('/busqueda', { params }),
+};
+
 // Gmail / Conversacion Mail
 export const gmailApi = {
   obtenerConversacion: (threadId) => api.get(`/conversacion-mail/${threadId}`),
@@ -126,9 +146,10 @@ export const localesApi = {
 
 // Tesorería
 export const tesoreriaApi = {
-  obtenerPagosPendientes: () => api.get('/tesoreria/pagos-pendientes'),
-  obtenerPagosValidados: () => api.get('/tesoreria/pagos-validados'),
-  obtenerPagosRechazados: () => api.get('/tesoreria/pagos-rechazados'),
+  // params: { limit, cursor, deposito_desde, deposito_hasta, acreditacion_desde, ... }
+  obtenerPagosPendientes: (params = {}) => api.get('/tesoreria/pagos-pendientes', { params }),
+  obtenerPagosValidados: (params = {}) => api.get('/tesoreria/pagos-validados', { params }),
+  obtenerPagosRechazados: (params = {}) => api.get('/tesoreria/pagos-rechazados', { params }),
   validarPago: (pagoId, data) => api.put(`/tesoreria/pagos/${pagoId}/validar`, data),
   rechazarPago: (pagoId, data) => api.put(`/tesoreria/pagos/${pagoId}/rechazar`, data),
 };
@@ -139,6 +160,11 @@ export const slaApi = {
   obtenerViolaciones: (params) => api.get('/sla/violations', { params }),
 };
 
+// Canal push: token corto para abrir /stream (EventSource no manda el header Authorization)
+export const streamApi = {
+  token: () => api.post('/stream/token'),
+};
+
 // Auth
 export const authApi = {
   login: async (email, password) => {
@@ -0,0 +1,113 @@
+// Canal push del backend (/api/stream, Server-Sent Events).
+// Una sola conexión por pestaña compartida por todos los componentes.
+// EventSource no manda headers: en vez del JWT de sesión se pide un token
+// corto de un solo propósito (POST /stream/token) para cada conexión.
+
+import { streamApi } from './api';
+
+const API_URL = import.meta.env.VITE_API_URL || 'https://crm-eventos-backend-656730419070.us-central1.run.app/api';
+
+// Espera antes de pedir un token nuevo si la conexión se cerró
+const REINTENTO_MS = 5000;
+
+let source = null;
+let abriendo = false;
+let reintento = null;
+const handlers = {}; // tipo -> Set de callbacks
+const estadoListeners = new Set();
+let conectado = false;
+
+const setConectado = (valor) => {
+  conectado = valor;
+  estadoListeners.forEach(cb => cb(valor));
+};
+
+const registrarTipo = (tipo) => {
+  source.addEventListener(tipo, (e) => {
+    let datos = null;
+    try {
+      datos = JSON.parse(e.data);
+    } catch {
+      // Ignorar mensajes mal formados
+    }
+    (handlers[tipo] || []).forEach(cb => cb(datos));
+  });
+};
+
+const hayInteresados = () =>
+  Object.values(handlers).some(set => set.size > 0) || estadoListeners.size > 0;
+
+const reintentar = () => {
+  if (reintento) return;
+  reintento = setTimeout(() => {
+    reintento = null;
+    if (hayInteresados()) abrir();
+  }, REINTENTO_MS);
+};
+
+const abrir = async () => {
+  if (source || abriendo || !localStorage.getItem('token') || typeof EventSource === 'undefined') return;
+
+  abriendo = true;
+  let token;
+  try {
+    const response = await streamApi.token();
+    token = response.data.token;
+  } catch {
+    abriendo = false;
+    reintentar();
+    return;
+  }
+  abriendo = false;
+  // Todos se desuscribieron mientras se pedía el token
+  if (source || !hayInteresados()) return;
+
+  const actual = new EventSource(`${API_URL}/stream?token=${encodeURIComponent(token)}`);
+  source = actual;
+  actual.onopen = () => setConectado(true);
+  actual.onerror = () => {
+    // Mientras tanto los componentes vuelven a hacer polling
+    setConectado(false);
+    // EventSource reintenta solo con la misma URL; cuando el token ya venció
+    // el backend responde 401 y la conexión queda cerrada: pedir otro token
+    if (actual.readyState === EventSource.CLOSED && source === actual) {
+      source = null;
+      reintentar();
+    }
+  };
+  Object.keys(handlers).forEach(registrarTipo);
+};
+
+const cerrarSiNoHayHandlers = () => {
+  if (!hayInteresados() && source) {
+    source.close();
+    source = null;
+    setConectado(false);
+  }
+};
+
+// Suscribirse a un tipo de mensaje ('kanban', 'whatsapp', 'tesoreria', 'sla').
+// Devuelve la función para desuscribirse.
+export const suscribirStream = (tipo, callback) => {
+  if (!handlers[tipo]) {
+    handlers[tipo] = new Set();
+    if (source) registrarTipo(tipo);
+  }
+  handlers[tipo].add(callback);
+  abrir();
+  return () => {
+    handlers[tipo].delete(callback);
+    cerrarSiNoHayHandlers();
+  };
+};
+
+// Notifica si el canal está conectado (para apagar/encender el polling de respaldo)
+export const escucharEstadoStream = (callback) => {
+  estadoListeners.add(callback);
+  callback(conectado);
+  abrir();
+  return () => {
+    estadoListeners.delete(callback);
+    cerrarSiNoHayHandlers();
+  };
+};